@@ -2,9 +2,14 @@ import logging
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
 from homeassistant.helpers.aiohttp_client import async_get_clientsession # DODAJ TO
+from homeassistant.helpers.dispatcher import async_dispatcher_send
 
 from .const import DOMAIN, CONF_USERNAME, CONF_PASSWORD
 from .coordinator import StokerCloudV16Coordinator
+from .seed import pop_seed
+from .storage import StokerStateStore
+from .services import async_register_services, async_unload_services
+from .websocket import async_register_websocket, signal_entry_unloaded
 from stokercloud_v16.client import StokerCloudClientV16 # Upewnij się, że ten import działa
 
 _LOGGER = logging.getLogger(__name__)
@@ -18,27 +23,54 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     # 1. Tworzymy sesję aiohttp (standard w HA)
     session = async_get_clientsession(hass)
 
-    # 2. Tworzymy klienta API
-    client = StokerCloudClientV16(username, password, session)
+    # 2. Klient API - zalogowany klient i payload z kreatora, jeśli wpis właśnie powstał
+    client, seed = pop_seed(hass, username, password)
+    if client is None:
+        client = StokerCloudClientV16(username, password, session)
+
+    # Stan learnerów i akumulatorów z poprzedniego uruchomienia
+    state_store = StokerStateStore(hass, entry.entry_id)
+    await state_store.async_load()
 
     # 3. Tworzymy koordynatora i przekazujemy mu klienta
     # Zakładam, że Twój koordynator przyjmuje (hass, client) w __init__
-    coordinator = StokerCloudV16Coordinator(hass, client)
+    coordinator = StokerCloudV16Coordinator(hass, client, state_store, seed=seed)
 
     # 4. Pierwsze odświeżenie danych
     await coordinator.async_config_entry_first_refresh()
 
+    # Dławiony checkpoint stanu po każdym cyklu koordynatora i zapis przy zamknięciu HA
+    state_store.async_listen_final_write()
+    entry.async_on_unload(coordinator.async_add_listener(state_store.async_schedule_save))
+    entry.async_on_unload(coordinator.async_start_listeners())
+
     # 5. Zapisujemy koordynatora
     hass.data.setdefault(DOMAIN, {})[entry.entry_id] = coordinator
 
     # 6. Rejestrujemy platformy
     await hass.config_entries.async_forward_entry_setups(entry, ["sensor", "binary_sensor", "number", "switch"])
 
+    # 7. Usługi domeny (np. stokercloud_v16.simulate) i subskrypcja telemetrii przez websocket
+    async_register_services(hass)
+    async_register_websocket(hass)
+
+    # 8. Jednorazowy import historii do statystyk długoterminowych (w tle)
+    if coordinator.history and not coordinator.history.done:
+        entry.async_on_unload(coordinator.history.async_cancel)
+        entry.async_create_background_task(
+            hass, coordinator.history.async_backfill(), f"{DOMAIN}_backfill_{entry.entry_id}"
+        )
+
     return True
 
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Obsługa usuwania integracji."""
     unload_ok = await hass.config_entries.async_unload_platforms(entry, ["sensor", "binary_sensor", "number", "switch"])
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        coordinator = hass.data[DOMAIN].pop(entry.entry_id)
+        await coordinator.state_store.async_close()
+        # Subskrypcje websocket tego wpisu dostają błąd zamiast milknąć
+        async_dispatcher_send(hass, signal_entry_unloaded(entry.entry_id))
+        if not hass.data[DOMAIN]:
+            async_unload_services(hass)
     return unload_ok
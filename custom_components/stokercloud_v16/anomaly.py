@@ -0,0 +1,90 @@
+"""Strumieniowy detektor anomalii z odporną, kroczącą linią bazową."""
+from __future__ import annotations
+import math
+from collections import deque
+
+
+class StreamingAnomalyDetector:
+    """Linia bazowa EWMA (średnia i wariancja) aktualizowana w O(1) na próbkę.
+
+    Próbka wpływa na bazę po winsoryzacji do średnia +- z_limit*sigma, więc
+    pojedyncze skoki nie przesuwają linii bazowej. Ostatnie próbki trzymane są
+    w buforze o stałym rozmiarze (rozgrzewka i diagnostyka).
+    """
+
+    def __init__(self, window: int = 288, z_limit: float = 3.0, min_samples: int = 24) -> None:
+        self.window = window
+        self.alpha = 2.0 / (window + 1)
+        self.z_limit = z_limit
+        self.min_samples = min_samples
+        self.samples: deque = deque(maxlen=window)
+        self.mean: float | None = None
+        self.var = 0.0
+        self.last_ts: float | None = None
+        self.last_score = 0.0
+        self.last_baseline: float | None = None
+
+    @property
+    def ready(self) -> bool:
+        return len(self.samples) >= self.min_samples
+
+    @property
+    def sigma(self) -> float:
+        return math.sqrt(max(0.0, self.var))
+
+    def score(self, value: float) -> float:
+        """Odchylenie od bazy w jednostkach sigma (0 przed zebraniem bazy)."""
+        sigma = self.sigma
+        if self.mean is None or sigma <= 1e-9:
+            return 0.0
+        return (value - self.mean) / sigma
+
+    def update(self, ts: float, value: float) -> float:
+        """Dodaj próbkę; zwraca jej wynik względem bazy sprzed aktualizacji."""
+        self.last_score = self.score(value)
+        self.last_baseline = self.mean
+        if self.mean is None:
+            self.mean = value
+        else:
+            clipped = value
+            sigma = self.sigma
+            if self.ready and sigma > 0:
+                clipped = min(max(value, self.mean - self.z_limit * sigma), self.mean + self.z_limit * sigma)
+            diff = clipped - self.mean
+            incr = self.alpha * diff
+            self.mean += incr
+            self.var = (1.0 - self.alpha) * (self.var + diff * incr)
+        self.samples.append((ts, value))
+        self.last_ts = ts
+        return self.last_score
+
+    def is_anomalous(self, value: float, rel_threshold: float) -> bool:
+        """Anomalia: wynik >= z_limit i wartość wyższa od bazy o więcej niż rel_threshold."""
+        baseline = self.last_baseline
+        if not self.ready or baseline is None or baseline <= 0:
+            return False
+        return self.last_score >= self.z_limit and value > baseline * (1.0 + rel_threshold)
+
+    def as_dict(self) -> dict:
+        return {
+            "mean": self.mean,
+            "var": self.var,
+            "last_ts": self.last_ts,
+            "last_score": self.last_score,
+            "last_baseline": self.last_baseline,
+            "samples": [list(s) for s in self.samples],
+        }
+
+    def load_dict(self, data: dict) -> None:
+        self.mean = data.get("mean")
+        self.var = float(data.get("var") or 0.0)
+        self.last_ts = data.get("last_ts")
+        self.last_score = float(data.get("last_score") or 0.0)
+        self.last_baseline = data.get("last_baseline")
+        self.samples.clear()
+        for item in data.get("samples") or []:
+            try:
+                ts, value = item
+                self.samples.append((float(ts), float(value)))
+            except (TypeError, ValueError):
+                continue
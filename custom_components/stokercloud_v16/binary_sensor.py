@@ -5,8 +5,12 @@ from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.helpers.event import async_track_state_change_event
 
 from .entity import StokerEntity
+from .anomaly import StreamingAnomalyDetector
+from .capabilities import async_add_outputs, async_add_when_present
+from .zones import ALL_ZONES, discover_zones
 from .const import (
-    DOMAIN, BINARY_SENSORS_CONFIG, OUTPUT_SENSORS_CONFIG, WEATHER_ZONE_TRANSLATIONS
+    DOMAIN, BINARY_SENSORS_CONFIG, WEATHER_ZONE_TRANSLATIONS,
+    ANOMALY_WINDOW, ANOMALY_Z_LIMIT, ANOMALY_MIN_SAMPLES, ANOMALY_MIN_DEMAND,
 )
 
 _LOGGER = logging.getLogger(__name__)
@@ -17,12 +21,17 @@ async def async_setup_entry(hass, entry, async_add_entities):
 
     entities = []
     entities.extend([StokerBinarySensor(coordinator, u, *cfg) for cfg in BINARY_SENSORS_CONFIG])
-    entities.extend([StokerOutputBinarySensor(coordinator, u, *cfg) for cfg in OUTPUT_SENSORS_CONFIG])
-    entities.extend([StokerWeatherZoneSensor(coordinator, u, i) for i in range(1, 5)])
     entities.append(StokerAnomalyBinarySensor(coordinator, u))
 
     async_add_entities(entities, update_before_add=True)
 
+    # Wyjścia ON/OFF z indeksu schematu i strefy pogodowe, które sterownik ma (lub gdy się pojawią)
+    async_add_outputs(entry, coordinator, async_add_entities, True, lambda spec: StokerOutputBinarySensor(coordinator, u, spec))
+    async_add_when_present(entry, coordinator, async_add_entities, [
+        (lambda data, z=zone: z in discover_zones(data), lambda z=zone: [StokerWeatherZoneSensor(coordinator, u, z.number)])
+        for zone in ALL_ZONES
+    ])
+
 
 class StokerBaseBinary(StokerEntity, BinarySensorEntity): # Dziedziczymy po StokerEntity dla spójności device_info
     """Klasa bazowa dla sensorów binarnych."""
@@ -34,6 +43,9 @@ class StokerBaseBinary(StokerEntity, BinarySensorEntity): # Dziedziczymy po Stok
         # device_info jest już w StokerEntity, więc tutaj go nie powielamy
 
 class StokerBinarySensor(StokerBaseBinary):
+    # Praca/alarm kotła to stan chwilowy - w przerwie chmury encja jest niedostępna
+    _stale_tolerant = False
+
     def __init__(self, coordinator, username, uid, name, path, device_class):
         super().__init__(coordinator, username, uid, name)
         self.entity_id = f"binary_sensor.nbe_{uid}"
@@ -57,54 +69,88 @@ class StokerBinarySensor(StokerBaseBinary):
         return bool(val)
 
 class StokerAnomalyBinarySensor(StokerBaseBinary):
-    """Monitoruje drastyczne odchylenia od średniej wydajności."""
+    """Monitoruje drastyczne odchylenia obserwowanego indeksu domu od własnej, kroczącej linii bazowej.
+
+    Próbką jest indeks z pojedynczego okna uczenia (spalanie / ΔT x udział pompy),
+    a nie wygładzony współczynnik RLS, który zmiany pochłania stopniowo.
+    """
+
+    _persist_state = True
+
     def __init__(self, coordinator, username):
         super().__init__(coordinator, username, "efficiency_anomaly", "Anomalia wydajności domu")
         self.entity_id = "binary_sensor.nbe_efficiency_anomaly"
         self._attr_device_class = BinarySensorDeviceClass.PROBLEM
+        self._detector = StreamingAnomalyDetector(ANOMALY_WINDOW, ANOMALY_Z_LIMIT, ANOMALY_MIN_SAMPLES)
+        self._value = None
+        self._attr_is_on = False
+
+    def _dump_state(self) -> dict:
+        return {
+            "source": "observed", "detector": self._detector.as_dict(),
+            "value": self._value, "is_on": self._attr_is_on,
+        }
+
+    def _load_state(self, data: dict) -> None:
+        # Linia bazowa z wygładzonych współczynników (starszy zapis) nie pasuje do próbek z okien
+        if data.get("source") != "observed":
+            return
+        self._detector.load_dict(data["detector"])
+        self._value = data.get("value")
+        self._attr_is_on = bool(data.get("is_on", False))
+
+    def _handle_coordinator_update(self) -> None:
+        """Jedna próbka na krok uczenia modelu (nowe okno), bez odczytów przy każdym zapytaniu o stan."""
+        observed = self.coordinator.learner.observed_index("house", ANOMALY_MIN_DEMAND)
+        if observed is not None and observed[0] != self._detector.last_ts:
+            ts, self._value = observed
+            self._detector.update(ts, self._value)
+            # Próg z suwaka integracji, czytany raz na próbkę
+            threshold = self._get_value_safely("number.nbe_anomaly_threshold", 20.0) / 100
+            self._attr_is_on = self._detector.is_anomalous(self._value, threshold)
+        super()._handle_coordinator_update()
 
     @property
-    def is_on(self) -> bool:
-        try:
-            # Używamy helperów, aby bezpiecznie pobrać stany encji
-            s_now = self.hass.states.get("sensor.nbe_house_efficiency")
-            s_mean = self.hass.states.get("sensor.nbe_mean_house_efficiency")
-            s_thr = self.hass.states.get("number.nbe_anomaly_threshold")
-
-            if not all([s_now, s_mean, s_thr]): return False
-            
-            val_now = float(s_now.state)
-            val_mean = float(s_mean.state)
-            threshold = float(s_thr.state) / 100
-            
-            # Jeśli aktualna wydajność jest o X% wyższa od średniej (co sugeruje błąd/wyciek ciepła)
-            return val_now > (val_mean * (1 + threshold)) if val_mean > 0 else False
-        except (ValueError, TypeError):
-            return False
+    def extra_state_attributes(self):
+        det = self._detector
+        return {
+            "score": round(det.last_score, 2),
+            "efficiency": round(self._value, 3) if self._value is not None else None,
+            "baseline": round(det.mean, 3) if det.mean is not None else None,
+            "baseline_sigma": round(det.sigma, 4),
+            "baseline_ready": det.ready,
+            "samples": len(det.samples),
+        }
 
 class StokerOutputBinarySensor(StokerBaseBinary):
-    """Obsługuje wyjścia kotła (pompy, wentylatory, zawory)."""
-    def __init__(self, coordinator, username, output_id, name, icon, slug):
-        # uid budujemy z output_id, aby był unikalny
-        super().__init__(coordinator, username, f"output_{output_id}", name)
-        self.entity_id = f"binary_sensor.nbe_{slug}"
-        self._output_id = output_id
-        self._attr_icon = icon
+    """Wyjście ON/OFF kotła (pompy, wentylatory, zawory) z indeksu schematu wyjść."""
+
+    # Chwilowy stan wyjścia sprzed przerwy wprowadzałby w błąd
+    _stale_tolerant = False
+
+    def __init__(self, coordinator, username, spec):
+        # uid budujemy z output_id, aby był unikalny (lewa strona bez prefiksu - zgodność wstecz)
+        side = "" if spec.side == "leftoutput" else "right_"
+        super().__init__(coordinator, username, f"output_{side}{spec.output_id}", spec.name)
+        self.entity_id = f"binary_sensor.nbe_{spec.slug}"
+        self._spec = spec
+        self._attr_icon = spec.icon
 
     @property
     def is_on(self) -> bool:
-        # Korzystamy z ujednoliconej ścieżki kropkowej
-        val = self._resolve_path(f"leftoutput.{self._output_id}.val")
-        return str(val).upper() == "ON"
+        return self._spec.read(self.coordinator.data or {})
 
     @property
     def extra_state_attributes(self):
-        # Pobieramy cały obiekt wyjścia, aby mieć dostęp do 'name' i 'val'
-        data = self._resolve_path(f"leftoutput.{self._output_id}")
-        return data if isinstance(data, dict) else {}
+        # Cały obiekt wyjścia, aby mieć dostęp do 'name' i 'val'
+        return self._spec.item(self.coordinator.data or {})
 
 class StokerWeatherZoneSensor(StokerBaseBinary):                                   
     """Sensor aktywno..ci strefy pogodowej."""                                
+
+    # Chwilowa aktywność strefy z payloadu
+    _stale_tolerant = False
+
     def __init__(self, coordinator, username, zone):                   
         super().__init__(coordinator, username, f"weather_zone_{zone}", f"Strefa Pogodowa {zone}")
         self.entity_id = f"binary_sensor.nbe_weather_zone_{zone}"                                           
@@ -0,0 +1,68 @@
+"""Wykrywanie możliwości sterownika: encje tylko dla sekcji obecnych w danych."""
+from __future__ import annotations
+import logging
+from typing import Callable, Iterable
+
+from homeassistant.core import callback
+
+_LOGGER = logging.getLogger(__name__)
+
+# Kandydat: (predykat na danych koordynatora, fabryka listy encji)
+Candidate = tuple[Callable[[dict], bool], Callable[[], list]]
+
+
+def has_menu(data: dict, menu_key: str) -> bool:
+    """Niepuste menu ustawień (świeże albo z cache koordynatora)."""
+    menus = data.get("menus")
+    return isinstance(menus, dict) and bool(menus.get(menu_key))
+
+
+@callback
+def async_add_when_present(entry, coordinator, async_add_entities, candidates: Iterable[Candidate]) -> None:
+    """Dodaj encje kandydatów, których dane już są; resztę przy kolejnych cyklach.
+
+    Sprawdzenie odbywa się na pierwszej migawce (setup następuje po
+    async_config_entry_first_refresh), a potem po każdej aktualizacji
+    koordynatora, dopóki zostają kandydaci bez danych.
+    """
+    pending = list(candidates)
+
+    @callback
+    def _check() -> None:
+        if not pending:
+            return
+        data = coordinator.data or {}
+        ready = [cand for cand in pending if cand[0](data)]
+        if not ready:
+            return
+        entities = []
+        for cand in ready:
+            pending.remove(cand)
+            entities.extend(cand[1]())
+        if entities:
+            _LOGGER.debug("Nowe encje z wykrytych sekcji: %s", len(entities))
+            async_add_entities(entities)
+
+    _check()
+    if pending:
+        entry.async_on_unload(coordinator.async_add_listener(_check))
+
+
+@callback
+def async_add_outputs(entry, coordinator, async_add_entities, binary: bool, factory: Callable) -> None:
+    """Encje dla wyjść z indeksu schematu koordynatora (binarne albo liczbowe), także nowych."""
+    added: set[tuple[str, str]] = set()
+
+    @callback
+    def _check() -> None:
+        specs = [
+            spec for spec in coordinator.outputs.of_kind(binary)
+            if (spec.side, spec.output_id) not in added
+        ]
+        if not specs:
+            return
+        added.update((spec.side, spec.output_id) for spec in specs)
+        async_add_entities([factory(spec) for spec in specs])
+
+    _check()
+    entry.async_on_unload(coordinator.async_add_listener(_check))
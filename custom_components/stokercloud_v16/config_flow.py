@@ -3,6 +3,7 @@ import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from .const import DOMAIN, CONF_USERNAME, CONF_PASSWORD
+from .seed import async_validate, stash_seed
 from stokercloud_v16.client import StokerCloudClientV16
 
 _LOGGER = logging.getLogger(__name__)
@@ -23,7 +24,9 @@ class StokerCloudV16ConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             )
             
             try:
-                await client.fetch_data()
+                # Lekka próba logowania albo pełne pobranie zachowane jako pierwsza migawka
+                data = await async_validate(client)
+                stash_seed(self.hass, user_input[CONF_USERNAME], user_input[CONF_PASSWORD], client, data)
                 return self.async_create_entry(
                     title=f"Kocioł: {user_input[CONF_USERNAME]}", 
                     data=user_input
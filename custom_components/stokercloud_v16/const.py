@@ -14,10 +14,61 @@ DOMAIN: Final = "stokercloud_v16"
 CONF_USERNAME: Final = "username"
 CONF_PASSWORD: Final = "password"
 
+# --- TRWAŁY STAN (Store) ---
+STORAGE_VERSION: Final = 1
+STORAGE_KEY: Final = f"{DOMAIN}.state"
+STORAGE_SAVE_DELAY: Final = 300  # s, minimalny odstęp między zapisami
+
+# --- WARSTWY ODPYTYWANIA ---
+MENU_REFRESH_MINUTES: Final = 60        # menu konfiguracji (duża struktura) - raz na godzinę
+
+# --- MIGAWKA CYKLU / DELTY ---
+SNAPSHOT_COUNTERS: Final = {
+    # klucz: (ścieżka w payloadzie, maks. wiarygodne tempo przyrostu [kg/h])
+    # Tylko liczniki z fetch_data; serie stats.* przy nieudanym pobraniu mają 0,
+    # które wyglądałoby jak reset licznika
+    "pellet_total": ("hopperdata.4", 15.0),
+}
+WARMUP_SHIFT_DEFAULT_MIN: Final = 10.0  # min, bazowy czas stabilizacji strefy z przełącznikiem
+SNAPSHOT_MIN_WINDOW_S: Final = 600  # s, minimalne okno limitu skoku licznika
+SEED_MAX_AGE_S: Final = 300       # s, ważność payloadu walidacji z kreatora jako pierwszej migawki
+STALE_GRACE_MINUTES_DEFAULT: Final = 15  # min publikowania ostatnich danych w przerwie chmury
+
+# --- DZIENNIK ZDARZEŃ ---
+EVENT_JOURNAL_KEEP: Final = 100       # kodów (info/alarm/stan) w dzienniku
+EVENT_BOILER: Final = f"{DOMAIN}_event"  # zdarzenie szyny HA na każdą zmianę kodu
+
+# --- LOGOWANIE ---
+LOG_RATE_LIMIT_S: Final = 600         # s, najwyżej jeden wpis na klucz komunikatu w oknie
+
+# --- EKSPORT ---
+EXPORT_CHUNK_DAYS: Final = 1          # okno jednej porcji zapisu (ograniczenie pamięci)
+EXPORT_DEFAULT_DAYS: Final = 30       # domyślny zakres eksportu wstecz
+
+# --- HISTORIA / STATYSTYKI DŁUGOTERMINOWE ---
+BACKFILL_QUERIES: Final = ("months=12", "days=62", "hours=72")
+BACKFILL_REQUEST_DELAY: Final = 5.0   # s przerwy między zapytaniami do chmury
+BACKFILL_BATCH_SIZE: Final = 500      # wierszy na jeden import statystyk
+BACKFILL_RETRY_S: Final = 300         # s do ponowienia nieudanych zapytań backfillu (podwajane)
+BACKFILL_RETRY_MAX_S: Final = 3600    # s, górny limit odstępu ponowień
+STAT_SERIES: Final = {
+    # klucz: (indeks serii w get_consumption, nazwa)
+    "pellet_total": (0, "Zużycie pelletu"),
+    "pellet_dhw": (1, "Zużycie pelletu CWU"),
+}
+# Serie stref (pellet_<klucz strefy>) wyliczane są z podziału godzinowego, bez backfillu
+ZONE_STAT_NAME: Final = "Zużycie pelletu - {name}"
+HOURLY_ACTIVITY_KEEP: Final = 48      # godzin historii aktywności pomp do podziału
+HOURLY_GAP_MAX_HOURS: Final = 744     # maks. zakres (h) dociągany po przerwie dłuższej niż hours=24
+# Profil tygodniowy zużycia (7x24, osobno w przedziałach temperatury zewnętrznej)
+PROFILE_TEMP_BINS: Final = (-5.0, 5.0)  # °C, granice przedziałów
+PROFILE_HALF_LIFE: Final = 6.0        # obserwacji komórki (tygodni) do połowy wagi
+PROFILE_MIN_WEIGHT: Final = 2.0       # minimalna waga komórki uznanej za poznaną
+
 # --- ZEWNĘTRZNE ENCJE (ZALEŻNOŚCI) ---
 ENTITY_WEATHER: Final = "sensor.nbe_weather_stokercloud"
+ENTITY_WEATHER_FORECAST: Final = "weather.forecast_home"
 ENTITY_BOILER_STATUS: Final = "sensor.nbe_boiler_status"
-ENTITY_PUMP_HOUSE: Final = "binary_sensor.nbe_weather_pump_1"
 ENTITY_PUMP_OFFICE: Final = "binary_sensor.nbe_weather_pump_2"
 ENTITY_SWITCH_OFFICE: Final = "switch.nbe_office_logic"
 ENTITY_OFFICE_TIME_SHIFT: Final = "number.nbe_office_time_shift"
@@ -29,8 +80,20 @@ ENTITY_DHW_TANK_VOLUME: Final = "number.nbe_dhw_tank_volume"
 ENTITY_CALORIFIC: Final = "input_number.nbe_pellet_calorific_mj"
 ENTITY_PELLET_PRICE: Final = "number.nbe_pellet_price"
 ENTITY_PELLET_TOTAL: Final = "sensor.nbe_pellet_total_consumption"
-ENTITY_HOUSE_CONSUMPTION_DAILY: Final = "sensor.nbe_house_consumption_daily"
-ENTITY_OFFICE_CONSUMPTION_DAILY: Final = "sensor.nbe_office_consumption_daily"
+ENTITY_ZONE_CONSUMPTION_DAILY: Final = "sensor.nbe_{zone}_consumption_daily"
+ENTITY_STALE_GRACE: Final = "number.nbe_stale_grace"
+
+# --- STREFY GRZEWCZE (strefy pogodowe sterownika) ---
+DHW_PUMP_OUTPUT: Final = "output-1"
+# numer strefy: (klucz, nazwa, ikona, wyjście pompy lub None -> weathercomp.zoneNactive,
+#                encja temp. zadanej, domyślna temp. zadana, przełącznik uwzględniania lub None,
+#                startowy indeks efektywności kg/°C/24h)
+HEATING_ZONES: Final = {
+    1: ("house", "Dom", "mdi:home-lightning-bolt", "output-4", ENTITY_TARGET_HOUSE_TEMP, 22.0, None, 0.62, True),
+    2: ("office", "Biuro", "mdi:office-building-marker", "output-9", ENTITY_TARGET_OFFICE_TEMP, 10.0, ENTITY_SWITCH_OFFICE, 1.2, False),
+    3: ("zone3", "Strefa 3", "mdi:radiator", None, "number.nbe_zone3_target_temp", 20.0, None, 0.62, False),
+    4: ("zone4", "Strefa 4", "mdi:radiator", None, "number.nbe_zone4_target_temp", 20.0, None, 0.62, False),
+}
 
 
 # --- WEWNĘTRZNE ID SENSORÓW ---
@@ -46,6 +109,17 @@ SPECIFIC_HEAT_WATER_KWH: Final = 0.00116  # kWh/kg*K
 PELLET_CALORIFIC_KWH: Final = 4.8         # kWh z 1 kg
 BOILER_EFFICIENCY_DHW: Final = 0.85       # Sprawność grzania CWU
 TANK_VOLUME_LITERS_DEFAULT: Final = 200.0
+DHW_CYCLE_KEEP: Final = 200           # cykli CWU w buforze dziennika
+DHW_CLOCK_MAX_SKEW_S: Final = 900     # maks. odchyłka zegara kotła od HA, by go użyć
+ANOMALY_WINDOW: Final = 288           # próbek linii bazowej (~doba przy oknie 5 min)
+ANOMALY_Z_LIMIT: Final = 3.0
+ANOMALY_MIN_SAMPLES: Final = 24
+ANOMALY_MIN_DEMAND: Final = 1.0       # °C, min. ΔT domu x udział pracy pompy w oknie próbki
+FORECAST_HORIZON_HOURS: Final = 72
+FORECAST_REFRESH_MINUTES: Final = 30
+RANGE_HORIZON_DAYS: Final = 30
+SIMULATE_MAX_CELLS: Final = 200_000   # limit rozmiaru siatki usługi simulate
+SIMULATE_MAX_AXIS: Final = 1_000      # limit wartości jednej osi siatki
 
 # --- MAPOWANIE STANÓW STEROWNIKA (Przywrócone Twoje) ---
 STOKER_STATES: Final = {
@@ -180,20 +254,21 @@ BINARY_SENSORS_CONFIG = [
     ("boiler_alarm", "Alarm", "miscdata.alarm.value", BinarySensorDeviceClass.PROBLEM),
 ]
 
-OUTPUT_SENSORS_CONFIG = [
-    ("output-1", "Pompa CWU", "mdi:water-boiler", "dhw_pump"),
-    ("output-2", "Pompa Kotła", "mdi:pump", "boiler_pump"),
-    ("output-4", "Pompa Pogodowa 1", "mdi:heating-coil", "weather_pump_1"),
-    ("output-9", "Pompa Pogodowa 2", "mdi:heating-coil", "weather_pump_2"),
-]
+# Sekcje wyjść sterownika indeksowane przez outputs.OutputSchema
+OUTPUT_SIDES = ("leftoutput", "rightoutput")
 
-# Konfiguracja Wyjść (Outputs)
-STOKER_OUTPUTS_CONFIG = [
-    ("output-3", "Zawór pogodowy", "mdi:valve", "%"),
-    ("output-5", "Wentylator wyciągowy", "mdi:fan", "%"),
-    ("output-7", "Czyszczenie kotła", "mdi:broom", "kg"),
-    ("output-6", "Odpopielanie", "mdi:trash-can", None),
-]
+# Znane wyjścia (leftoutput): nazwa, ikona, slug encji (None = output_<id>), typ.
+# Pozostałe wyjścia dostają nazwę i typ z payloadu.
+OUTPUT_OVERRIDES = {
+    "output-1": ("Pompa CWU", "mdi:water-boiler", "dhw_pump", "onoff"),
+    "output-2": ("Pompa Kotła", "mdi:pump", "boiler_pump", "onoff"),
+    "output-4": ("Pompa Pogodowa 1", "mdi:heating-coil", "weather_pump_1", "onoff"),
+    "output-9": ("Pompa Pogodowa 2", "mdi:heating-coil", "weather_pump_2", "onoff"),
+    "output-3": ("Zawór pogodowy", "mdi:valve", None, "percent"),
+    "output-5": ("Wentylator wyciągowy", "mdi:fan", None, "percent"),
+    "output-7": ("Czyszczenie kotła", "mdi:broom", None, "kg"),
+    "output-6": ("Odpopielanie", "mdi:trash-can", None, "text"),
+}
 
 # Konfiguracja Menu Ustawień
 STOKER_SETTINGS_MENU_CONFIG = [
@@ -230,6 +305,7 @@ SIMPLE_NUMBERS_CONFIG = [
     ("office_time_shift", "Czas stabilizacji biura", 0, 60, 1, "min", "mdi:timer-sand", 10, "slider"),                              
     ("insulation_factor_house", "Charakterystyka strat - Dom", 0.05, 2, 0.01, "kg/°C/24h", "mdi:home-thermometer-outline", 0.6, "auto"),                                    
     ("insulation_factor_office", "Charakterystyka strat - Biuro", 0.05, 2, 0.01, "kg/°C/24h", "mdi:home-thermometer-outline", 1.2, "auto"),
+    ("stale_grace", "Tolerancja przerwy w danych", 0, 120, 5, "min", "mdi:cloud-clock", 15, "slider"),
 ]
 
 SENSOR_MAP: Final = [
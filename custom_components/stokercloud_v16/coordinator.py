@@ -2,20 +2,95 @@ import logging
 from datetime import timedelta, datetime
 import async_timeout
 import asyncio
+import time
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_track_state_change_event
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 
+from .estimator import EfficiencyLearner
+from .history import ConsumptionHistory
+from .forecast import HourlyForecastEngine
+from .intervals import PumpIntervalLog
+from .dhw import DhwCycleJournal
+from .core import OfficeWarmup, warmup_limit_min
+from .events import EventJournal, INFO, STATE, alarm_codes, info_codes, state_code
+from .logs import rate_limited
+from .outputs import OutputSchema
+from .profile import WeekHourProfile
+from .snapshot import Snapshot, TickDelta, diff
+from .zones import ALL_ZONES, ZONES_BY_KEY, discover_zones, pump_states
+from .const import (
+    DHW_CLOCK_MAX_SKEW_S,
+    DHW_CYCLE_KEEP,
+    ENTITY_DHW_TANK_VOLUME,
+    ENTITY_STALE_GRACE,
+    EVENT_BOILER,
+    EVENT_JOURNAL_KEEP,
+    MENU_REFRESH_MINUTES,
+    PELLET_CALORIFIC_KWH,
+    PROFILE_HALF_LIFE,
+    PROFILE_MIN_WEIGHT,
+    PROFILE_TEMP_BINS,
+    SNAPSHOT_COUNTERS,
+    SNAPSHOT_MIN_WINDOW_S,
+    STALE_GRACE_MINUTES_DEFAULT,
+    STOKER_INFO,
+    STOKER_STATES,
+    TANK_VOLUME_LITERS_DEFAULT,
+    WARMUP_SHIFT_DEFAULT_MIN,
+)
+
 _LOGGER = logging.getLogger(__name__)
+_RLOG = rate_limited(_LOGGER)
 
 class StokerCloudV16Coordinator(DataUpdateCoordinator):
     """Koordynator z inteligentnym cache i zabezpieczeniami NoneType."""
 
-    def __init__(self, hass, client):
+    def __init__(self, hass, client, state_store=None, seed=None):
         self.client = client
+        self.state_store = state_store
         self.username = client.username.lower()
         
         # Cache dla danych rzadko zmienianych (Konfiguracja)
         self._cached_menus = {"flat": {}, "raw": {}}
         self._last_menu_update = None
+        # Payload walidacji z kreatora - zastępuje fetch_data w pierwszym cyklu
+        self._seed = seed
+        # Czas ostatniego wywołania fetch_data (round trip HTTP razem z dekodowaniem w kliencie, bez rozbicia) [ms]
+        self.last_fetch_ms = None
+        # Czas przetwarzania cyklu w pętli zdarzeń (historia, dzienniki, migawka) [ms]
+        self.last_process_ms = None
+        self.max_process_ms = 0.0
+        # Numer generacji danych (klucz cache wartości encji)
+        self.generation = 0
+        # Ostatnie udane pobranie; w przerwie chmury publikowana jest ostatnia migawka (stale)
+        self.last_good_update: datetime | None = None
+        self.stale = False
+
+        # Wspólny model efektywności (RLS) dla wszystkich stref grzewczych
+        self.learner = EfficiencyLearner()
+        # Prognoza godzinowa (cache profilu + ostatnia prognoza pogody)
+        self.forecast = HourlyForecastEngine()
+        # Profil tygodniowy kg/h (dzień x godzina, przedziały temperatury) z zamkniętych godzin
+        self.profile = WeekHourProfile(PROFILE_TEMP_BINS, PROFILE_HALF_LIFE, PROFILE_MIN_WEIGHT)
+        # Dziennik przejść pomp stref (czas pracy ważony czasem)
+        self.pumps = PumpIntervalLog()
+        # Dziennik cykli grzania CWU
+        self.dhw = DhwCycleJournal(DHW_CYCLE_KEEP, DHW_CLOCK_MAX_SKEW_S, PELLET_CALORIFIC_KWH)
+        # Dziennik kodów info/alarm/stan (deduplikacja, zdarzenia na szynie HA)
+        self.events = EventJournal(EVENT_JOURNAL_KEEP)
+        # Indeks schematu wyjść (leftoutput/rightoutput) -> encje generowane automatycznie
+        self.outputs = OutputSchema()
+        # Migawka bieżącego cyklu, różnice względem poprzedniej i skumulowane przyrosty liczników
+        self.snapshot: Snapshot | None = None
+        self.delta = TickDelta()
+        self.counters: dict[str, float] = {}
+        # Rozruch stref z przełącznikiem (raz na cykl); w trakcie nauka modelu jest wstrzymana
+        self.warmups: dict[str, OfficeWarmup] = {
+            zone.key: OfficeWarmup() for zone in ALL_ZONES if zone.switch_entity
+        }
+        self.warmup_limits: dict[str, float] = {key: WARMUP_SHIFT_DEFAULT_MIN for key in self.warmups}
+        self.warming: dict[str, bool] = {}
         
         super().__init__(
             hass,
@@ -24,6 +99,84 @@ class StokerCloudV16Coordinator(DataUpdateCoordinator):
             update_interval=timedelta(seconds=60), 
         )
 
+        # Historia zużycia (backfill + synchronizacja godzinowa); wymaga Store
+        self.history = None
+        if state_store is not None:
+            self.learner.load_dict(state_store.get("learner"))
+            state_store.register("learner", self.learner.as_dict)
+            self.profile.load_dict(state_store.get("profile"))
+            state_store.register("profile", self.profile.as_dict)
+            self.pumps.load_dict(state_store.get("pumps"))
+            state_store.register("pumps", self.pumps.as_dict)
+            self.dhw.load_dict(state_store.get("dhw"))
+            state_store.register("dhw", self.dhw.as_dict)
+            self.events.load_dict(state_store.get("events"))
+            state_store.register("events", self.events.as_dict)
+            self._load_snapshot(state_store.get("snapshot"))
+            state_store.register("snapshot", self._dump_snapshot)
+            self._load_warmups(state_store.get("warmups"), state_store)
+            state_store.register("warmups", self._dump_warmups)
+            self.history = ConsumptionHistory(hass, self)
+        self._add_zones(discover_zones(None))
+
+    @property
+    def zones(self):
+        """Strefy grzewcze znane modelowi (wykryte w payloadzie, w kolejności modelu)."""
+        return tuple(ZONES_BY_KEY[key] for key in self.learner.zones if key in ZONES_BY_KEY)
+
+    def _add_zones(self, zones) -> None:
+        if self.learner.ensure_zones([(zone.key, zone.prior_index, zone.wind) for zone in zones]):
+            _LOGGER.info("Strefy grzewcze: %s", ", ".join(self.learner.zones))
+
+    def zone_deltas(self, temp_ext: float) -> dict[str, float]:
+        """ΔT (zadana - zewnętrzna, min. 1°C) dla każdej strefy."""
+        return {
+            zone.key: max(1.0, self._state_float(zone.target_entity, zone.default_target) - temp_ext)
+            for zone in self.zones
+        }
+
+    def footprint(self) -> dict:
+        """Rozmiary rosnących struktur i czasy cyklu (obserwacja długiego działania)."""
+        history = self.history.state if self.history else {}
+        return {
+            "listeners": len(self._listeners),
+            "pump_transitions": sum(map(len, self.pumps.channels.values())),
+            "learner_samples": len(self.learner.samples),
+            "profile_coverage": round(self.profile.coverage, 3),
+            "dhw_cycles": len(self.dhw.cycles),
+            "event_codes": len(self.events.entries),
+            "activity_hours": len(history.get("activity", {})),
+            "stat_series": len(history.get("series", {})),
+            "output_channels": len(self.outputs.specs),
+            "menus_cached": len(self._cached_menus.get("raw") or {}),
+            "fetch_ms": self.last_fetch_ms,
+            "process_ms": self.last_process_ms,
+            "max_process_ms": self.max_process_ms,
+            "stale": self.stale,
+            "data_age_s": self.data_age_s(),
+        }
+
+    def data_age_s(self) -> float | None:
+        """Wiek ostatnich udanych danych [s]."""
+        if self.last_good_update is None:
+            return None
+        return round((datetime.now() - self.last_good_update).total_seconds(), 1)
+
+    def _stale_data(self, err) -> dict | None:
+        """Ostatnia migawka z markerami `stale`/`data_age_s`, jeśli mieści się w tolerancji.
+
+        Generacja nie rośnie - encje i dzienniki nie widzą nowego cyklu,
+        a przyrosty liczników policzy pierwszy udany cykl po przerwie.
+        """
+        age = self.data_age_s()
+        grace = self._state_float(ENTITY_STALE_GRACE, STALE_GRACE_MINUTES_DEFAULT) * 60.0
+        if not self.data or age is None or age > grace:
+            return None
+        if not self.stale:
+            _LOGGER.warning("StokerCloud niedostępny (%s) - publikuję dane sprzed %s s", err, age)
+        self.stale = True
+        return {**self.data, "stale": True, "data_age_s": age}
+
     def _flatten_menu(self, menu_name: str, menu_data: dict | list | None) -> dict:
         """Spłaszcz menu do słownika z zabezpieczeniem przed błędami struktury."""
         flat = {}
@@ -44,6 +197,203 @@ class StokerCloudV16Coordinator(DataUpdateCoordinator):
             _LOGGER.debug("Błąd spłaszczania menu %s: %s", menu_name, e)
         return flat
 
+    def _state_float(self, entity_id: str, default: float) -> float:
+        state = self.hass.states.get(entity_id)
+        try:
+            return float(state.state) if state else default
+        except (ValueError, TypeError):
+            return default
+
+    @callback
+    def async_start_listeners(self):
+        """Zdarzenia stanu wpływające na dziennik pomp; zwraca funkcję odłączającą."""
+        gates = {zone.switch_entity: zone.key for zone in ALL_ZONES if zone.switch_entity}
+        for entity_id, key in gates.items():
+            switch = self.hass.states.get(entity_id)
+            if switch is not None:
+                self.pumps.set_enabled(switch.last_changed.timestamp(), key, switch.state != "off")
+
+        @callback
+        def _zone_switch_changed(event) -> None:
+            new_state = event.data.get("new_state")
+            if new_state is None:
+                return
+            self.pumps.set_enabled(
+                new_state.last_changed.timestamp(), gates[event.data["entity_id"]], new_state.state != "off"
+            )
+
+        return async_track_state_change_event(self.hass, list(gates), _zone_switch_changed)
+
+    @staticmethod
+    def _path_float(data: dict, path: str) -> float | None:
+        node = data
+        for part in path.split("."):
+            if not isinstance(node, dict):
+                return None
+            node = node.get(part)
+        try:
+            return float(str(node).replace(",", "."))
+        except (ValueError, TypeError):
+            return None
+
+    @staticmethod
+    def _clock_raw(data: dict):
+        clock = ((data.get("miscdata") or {}).get("clock") or {})
+        return clock.get("value") if isinstance(clock, dict) else clock
+
+    def _track_dhw(self, data: dict, now: datetime, on: bool) -> None:
+        """Migawka dla dziennika cykli CWU (zegar kotła, licznik kg, temperatura zasobnika)."""
+        if self.dhw.observe(
+            now,
+            self._clock_raw(data),
+            on,
+            self._path_float(data, "hopperdata.4") or 0.0,
+            self._path_float(data, "frontdata.dhw"),
+            self._state_float(ENTITY_DHW_TANK_VOLUME, TANK_VOLUME_LITERS_DEFAULT),
+        ):
+            _LOGGER.debug("Zamknięto cykl CWU: %s", self.dhw.last_cycle)
+
+    @staticmethod
+    def event_message(kind: str, code: str) -> str:
+        """Opis kodu zdarzenia z tabel sterownika (kod, gdy nieznany)."""
+        if kind == INFO:
+            try:
+                return STOKER_INFO.get(int(code), code)
+            except ValueError:
+                return code
+        if kind == STATE:
+            return STOKER_STATES.get(code, code)
+        return code
+
+    def _track_events(self, data: dict, now: datetime) -> None:
+        """Nowe, powtórzone i ustąpione kody oraz przejścia stanu -> jedno zdarzenie HA na zmianę."""
+        misc = data.get("miscdata") or {}
+        alarm = misc.get("alarm") or {}
+        state = misc.get("state") or {}
+        changes = self.events.observe(
+            self.dhw.snapshot_time(now, self._clock_raw(data)),
+            info_codes(data.get("infomessages")),
+            alarm_codes(alarm.get("value") if isinstance(alarm, dict) else alarm),
+            state_code(state.get("value") if isinstance(state, dict) else state),
+        )
+        for change in changes:
+            change["message"] = self.event_message(change["kind"], change["code"])
+            _LOGGER.debug("Zdarzenie kotła: %s", change)
+            self.hass.bus.async_fire(EVENT_BOILER, {"username": self.username, **change})
+
+    @property
+    def warming_up(self) -> bool:
+        """Czy któraś strefa z przełącznikiem jest w fazie rozruchu (nauka wstrzymana)."""
+        return any(self.warming.values())
+
+    def _load_warmups(self, data, state_store) -> None:
+        if not isinstance(data, dict):
+            # Migracja: rozruch był wcześniej stanem encji indeksu efektywności strefy
+            data = {}
+            for key in self.warmups:
+                legacy = state_store.get(f"entity:nbe_{self.username}_{key}_efficiency")
+                if isinstance(legacy, dict):
+                    data[key] = {
+                        "start_ts": legacy.get("office_start_ts"),
+                        "last_on_ts": legacy.get("office_last_pump_on_ts"),
+                    }
+        for key, row in data.items():
+            if key in self.warmups and isinstance(row, dict):
+                self.warmups[key] = OfficeWarmup(row.get("start_ts"), row.get("last_on_ts"))
+
+    def _dump_warmups(self) -> dict:
+        return {key: {"start_ts": w.start_ts, "last_on_ts": w.last_on_ts} for key, w in self.warmups.items()}
+
+    def _update_warmups(self, now_ts: float, states: dict, temp_ext: float) -> None:
+        """Rozruch stref z przełącznikiem (zone.switch_entity) - encje tylko czytają wynik."""
+        for zone in self.zones:
+            warmup = self.warmups.get(zone.key)
+            if warmup is None:
+                continue
+            switch = self.hass.states.get(zone.switch_entity)
+            switch_on = (switch.state != "off") if switch else True
+            pump_on = bool(states.get(zone.key))
+            warmup.update(now_ts, switch_on, pump_on)
+            limit = warmup_limit_min(self._state_float(zone.time_shift_entity, WARMUP_SHIFT_DEFAULT_MIN), temp_ext)
+            self.warmup_limits[zone.key] = limit
+            self.warming[zone.key] = warmup.warming_up(now_ts, switch_on and pump_on, limit)
+
+    def _load_snapshot(self, data) -> None:
+        if not isinstance(data, dict):
+            return
+        self.snapshot = Snapshot.from_dict(data.get("snapshot"))
+        counters = data.get("counters")
+        self.counters = {k: float(v) for k, v in counters.items()} if isinstance(counters, dict) else {}
+
+    def _dump_snapshot(self) -> dict:
+        return {"snapshot": self.snapshot.as_dict() if self.snapshot else None, "counters": self.counters}
+
+    def _advance_snapshot(self, data: dict, now: datetime, states: dict, generation: int) -> None:
+        """Nowa migawka cyklu i widok różnic względem poprzedniej (wspólny dla encji).
+
+        Liczniki z payloadu mają limit skoku; sumy zamkniętych godzin z historii
+        (sync_<klucz>) są już czyste i rosną monotonicznie, więc limitu nie mają.
+        """
+        counters = {key: self._path_float(data, path) for key, (path, _) in SNAPSHOT_COUNTERS.items()}
+        limits = {key: rate for key, (_, rate) in SNAPSHOT_COUNTERS.items()}
+        if self.history is not None:
+            counters.update({f"sync_{key}": float(v) for key, v in self.history.totals.items()})
+        snap = Snapshot(self.dhw.snapshot_time(now, self._clock_raw(data)), counters, dict(states))
+        self.delta = diff(self.snapshot, snap, generation, limits, SNAPSHOT_MIN_WINDOW_S)
+        if self.snapshot is not None:
+            for key in limits:
+                prev, cur = self.snapshot.counters.get(key), counters.get(key)
+                # Spadek (północ, reset licznika) to normalny stan - ostrzeżenie tylko dla odrzuconego wzrostu
+                if prev is not None and cur is not None and cur > prev and not self.delta.increment(key):
+                    _RLOG.warning(
+                        f"counter_jump:{key}", "Odrzucony skok licznika %s: %s -> %s kg", key, prev, cur,
+                        elapsed_s=self.delta.elapsed_s,
+                    )
+        self.snapshot = snap
+        for key, inc in self.delta.increments.items():
+            if inc > 0:
+                self.counters[key] = round(self.counters.get(key, 0.0) + inc, 4)
+
+    def _sync_history(self, data: dict, hours_payload, generation: int) -> None:
+        """Przejścia pomp i CWU, warunki w bieżącej godzinie, nowe zamknięte godziny i migawka cyklu."""
+        now = datetime.now().astimezone()
+        self._add_zones(discover_zones(data))
+        states = pump_states(data, self.zones)
+        self.pumps.observe(now.timestamp(), states)
+        self._track_dhw(data, now, states["dhw"])
+        self._track_events(data, now)
+        weather = data.get("weatherdata") or {}
+        try:
+            temp_ext = float(str(weather.get("1", 0)).replace(",", "."))
+            wind = max(0.0, float(str(weather.get("2", 0)).replace(",", ".")))
+        except (ValueError, TypeError):
+            temp_ext, wind = 0.0, 0.0
+        self._update_warmups(now.timestamp(), states, temp_ext)
+        if self.history is not None:
+            try:
+                self.history.record_activity(now, self.zone_deltas(temp_ext), wind, temp_ext)
+                if hours_payload:
+                    self.history.process_hours(hours_payload, now)
+            except Exception as err:
+                _LOGGER.debug("Błąd synchronizacji godzinowej: %s", err)
+        self._advance_snapshot(data, now, states, generation)
+
+    async def _async_hours_payload(self, h_stats):
+        """Seria godzinowa do synchronizacji: `hours=24` albo dłuższa, gdy nie sięga znaku wodnego."""
+        if self.history is None:
+            return h_stats
+        query = self.history.gap_query(h_stats, datetime.now().astimezone())
+        if query is None:
+            return h_stats
+        try:
+            async with async_timeout.timeout(30):
+                wide = await self.client.get_consumption(query)
+        except Exception as err:
+            _LOGGER.debug("Błąd pobierania %s: %s", query, err)
+            return h_stats
+        _LOGGER.info("Uzupełnianie przerwy w historii godzinowej (%s)", query)
+        return wide if isinstance(wide, list) else h_stats
+
     async def _async_update_data(self):
         """Pobierz dane z API z inteligentnym mechanizmem retry i cache."""
         max_retries = 2
@@ -52,8 +402,16 @@ class StokerCloudV16Coordinator(DataUpdateCoordinator):
         for attempt in range(max_retries + 1):
             try:
                 # 1. POBIERANIE DANYCH GŁÓWNYCH Z LIMITAMI CZASOWYMI
-                async with async_timeout.timeout(30):
-                    data = await self.client.fetch_data()
+                started = time.perf_counter()
+                if self._seed is not None:
+                    # Pierwszy cykl nowego wpisu: dane pobrane już przy walidacji w kreatorze
+                    data, self._seed = self._seed, None
+                    _LOGGER.debug("Pierwsza migawka z kreatora konfiguracji")
+                else:
+                    async with async_timeout.timeout(30):
+                        data = await self.client.fetch_data()
+                self.last_fetch_ms = round((time.perf_counter() - started) * 1000.0, 1)
+                _LOGGER.debug("fetch_data: %s ms", self.last_fetch_ms)
                 
                 if not data or not isinstance(data, dict):
                     raise ValueError("Pusty lub błędny format danych z API")
@@ -66,6 +424,7 @@ class StokerCloudV16Coordinator(DataUpdateCoordinator):
                     "yesterday": 0.0, "dhw_day": 0.0, "month": 0.0, "year": 0.0
                 }
                 
+                h_stats = []
                 try:
                     # Równoległe pobieranie
                     tasks = [
@@ -115,13 +474,20 @@ class StokerCloudV16Coordinator(DataUpdateCoordinator):
                     # Jeśli mamy stare statystyki, używamy ich zamiast zer
                     data["stats"] = self.data.get("stats", stat_results) if self.data else stat_results
 
+                # Po przerwie dłuższej niż zakres hours=24 - dłuższy zakres godzin dla synchronizacji
+                hours_payload = await self._async_hours_payload(h_stats)
+
                 # 3. OBSŁUGA MENU / KONFIGURACJI (z Cache)
                 should_update_menu = (
                     self._last_menu_update is None or 
-                    now - self._last_menu_update > timedelta(hours=1)
+                    now - self._last_menu_update > timedelta(minutes=MENU_REFRESH_MINUTES)
                 )
 
-                if should_update_menu and "menus" in data:
+                if not should_update_menu:
+                    # Poza warstwą menu kopia nie jest przechowywana w self.data (encje czytają cache);
+                    # czasu dekodowania ani szczytu pamięci to nie zmienia - JSON jest już sparsowany
+                    data.pop("menus", None)
+                elif "menus" in data:
                     menus_flat = {}
                     menus_raw = data.get("menus", {})
                     if isinstance(menus_raw, dict):
@@ -132,11 +498,28 @@ class StokerCloudV16Coordinator(DataUpdateCoordinator):
                         self._cached_menus["raw"] = menus_raw
                         self._last_menu_update = now
 
+                started = time.perf_counter()
+                # Generacja rośnie dopiero po zastosowaniu cyklu - ponowiona próba po błędzie
+                # synchronizacji nie jest widziana przez encje jako kolejny cykl
+                self._sync_history(data, hours_payload, self.generation + 1)
+                self.generation += 1
+                for spec in self.outputs.update(data):
+                    _LOGGER.debug("Nowe wyjście %s/%s: %s", spec.side, spec.output_id, spec.kind)
+                self.last_process_ms = round((time.perf_counter() - started) * 1000.0, 1)
+                self.max_process_ms = max(self.max_process_ms, self.last_process_ms)
+
                 # Zawsze wstrzykuj dane menu (z cache lub świeżo pobrane)
                 data["menus_flat"] = self._cached_menus.get("flat", {})
                 if not data.get("menus"):
                     data["menus"] = self._cached_menus.get("raw", {})
 
+                self.last_good_update = now
+                if self.stale:
+                    _LOGGER.info("StokerCloud ponownie dostępny")
+                self.stale = False
+                data["stale"] = False
+                data["data_age_s"] = 0.0
+
                 # Jeśli dotarliśmy tutaj, sukces! Zwracamy dane.
                 return data
 
@@ -145,8 +528,11 @@ class StokerCloudV16Coordinator(DataUpdateCoordinator):
                     _LOGGER.debug("Błąd w próbie %s: %s. Ponawiam za %s sek...", attempt + 1, err, retry_delay)
                     await asyncio.sleep(retry_delay)
                 else:
-                    # Ostateczna próba nieudana
+                    # Ostateczna próba nieudana - w tolerancji publikuj ostatnie dane
+                    if (stale := self._stale_data(err)) is not None:
+                        return stale
+                    self.stale = False
                     if isinstance(err, asyncio.TimeoutError):
                         raise UpdateFailed("Przekroczono czas oczekiwania na StokerCloud (Timeout)")
-                    _LOGGER.error("Błąd krytyczny po %s próbach: %s", max_retries + 1, err)
+                    _RLOG.error("update_failed", "Błąd krytyczny po %s próbach: %s", max_retries + 1, err)
                     raise UpdateFailed(f"Błąd komunikacji: {err}")
@@ -0,0 +1,325 @@
+"""Rdzeń obliczeniowy niezależny od Home Assistant (tylko stdlib i NumPy).
+
+Czyste funkcje i obiekty stanu: dekodowanie harmonogramów, model energii
+zasobnika CWU, prognoza dobowa stref, podział spalania na strefy, zasięg
+zasobnika i rozruch biura. Encje są cienkim adapterem (odczyt stanów HA
+i danych koordynatora -> wejścia typowane); te same funkcje mogą działać
+w narzędziach replay/benchmark i w puli procesów (wejścia są picklowalne).
+Moduł nie importuje niczego z pakietu integracji - stałe fizyczne
+przekazuje wywołujący.
+
+Import poza HA: `custom_components.stokercloud_v16.core` wykonuje najpierw
+`__init__.py` pakietu, który importuje Home Assistant i bibliotekę klienta.
+Narzędzia bez HA muszą zarejestrować pakiet w `sys.modules` z `__path__`
+i bez wykonania `__init__` (jak robi to tests/conftest.py) albo załadować
+plik modułu bezpośrednio.
+"""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Iterable
+
+import numpy as np
+
+# Klucze harmonogramu w menu pogodowym: a20..a29, b20..b29, ... (24 na strefę)
+_TIMER_KEYS = [f"{char}{num}" for char in "abcdefghij" for num in range(20, 30)]
+
+# Bity harmonogramu (2 na dzień tygodnia) -> współczynnik pracy strefy
+SCHEDULE_FACTORS = np.array([1.0, 0.0, 0.8, 0.0])
+
+DHW_STANDBY_KG_H = 0.02  # straty postojowe bojlera + cyrkulacja
+
+OFFICE_IDLE_RESET_S = 600.0  # przerwa pracy pompy biura kończąca rozruch
+
+
+def parse_float(raw, default: float = 0.0) -> float:
+    """Liczba z payloadu chmury (także z przecinkiem dziesiętnym)."""
+    try:
+        return float(str(raw).replace(",", "."))
+    except (ValueError, TypeError):
+        return default
+
+
+def hours_left_today(now: datetime) -> float:
+    return max(0, 1440 - (now.hour * 60 + now.minute)) / 60.0
+
+
+# --- HARMONOGRAMY ---
+def schedule_flags(zone_menu: dict | None) -> tuple[bool, bool, dict]:
+    """(harmonogram włączony, dane wczytane, słownik timings) z menu strefy."""
+    timer_val, timings = "0", {}
+    for key, item in (zone_menu or {}).items():
+        if not isinstance(item, dict):
+            continue
+        if key.endswith(".enabletimer"):
+            timer_val = item.get("val", "0")
+        elif key.endswith(".timings"):
+            timings = item.get("val", {})
+    loaded = isinstance(timings, dict) and len(timings) > 0
+    return str(timer_val) == "1", loaded, timings if loaded else {}
+
+
+def zone_schedule(zone_menu: dict | None, zone_index: int) -> np.ndarray:
+    """Tablica 7x24 współczynników pracy strefy (dzień tygodnia x godzina).
+
+    Przy wyłączonym lub niewczytanym harmonogramie strefa pracuje cały czas.
+    """
+    enabled, loaded, timings = schedule_flags(zone_menu)
+    if not enabled or not loaded:
+        return np.ones((7, 24))
+
+    table = np.zeros((7, 24))
+    keys = _TIMER_KEYS[zone_index * 24: zone_index * 24 + 24]
+    shifts = np.arange(7) * 2
+    for hour, key in enumerate(keys):
+        if timings.get(key) is None:
+            continue
+        try:
+            table[:, hour] = SCHEDULE_FACTORS[(int(timings[key]) >> shifts) & 3]
+        except (ValueError, TypeError):
+            table[:, hour] = 1.0
+    return table
+
+
+def remaining_schedule_hours(table: np.ndarray | None, now: datetime, shape: np.ndarray | None = None) -> float:
+    """Pozostałe dziś godziny pracy strefy (ważone trybem); bez harmonogramu - reszta doby.
+
+    `shape` - 24 wagi godzin o średniej 1 (wyuczony profil doby); rozkłada te same
+    godziny pracy doby wg rzeczywistego zachowania. Bez niego godziny są równe.
+    """
+    if table is None:
+        if shape is None:
+            return hours_left_today(now)
+        return round(float(shape[now.hour] * (1 - now.minute / 60.0) + shape[now.hour + 1:].sum()), 2)
+    row = table[now.weekday()]
+    if shape is not None:
+        weighted = row * shape
+        if weighted.sum() > 0:
+            # Suma doby bez zmian - profil tylko przesuwa wagę między godzinami pracy
+            row = weighted * (row.sum() / weighted.sum())
+    return round(float(row[now.hour:].sum()), 2)
+
+
+# --- CWU ---
+def dhw_reheat_kg(volume_l: float, temp_actual: float, temp_target: float,
+                  specific_heat_kwh: float, calorific_kwh: float, efficiency: float) -> float:
+    """Pellet na dogrzanie zasobnika: V * ΔT * c / (wartość opałowa * sprawność)."""
+    energy_kwh = volume_l * max(0.0, temp_target - temp_actual) * specific_heat_kwh
+    return energy_kwh / (calorific_kwh * efficiency)
+
+
+@dataclass(frozen=True)
+class DhwState:
+    """Zasobnik CWU w chwili prognozy."""
+
+    consumed_kg: float      # dzisiejsze zużycie CWU
+    temp: float             # temperatura zasobnika
+    target: float           # temperatura zadana
+    hysteresis: float       # histereza załączenia grzania
+    volume_l: float
+
+
+def dhw_day_kg(dhw: DhwState, hours_left: float, specific_heat_kwh: float, calorific_kwh: float,
+               efficiency: float, standby_kg_h: float = DHW_STANDBY_KG_H) -> float:
+    """Zużycie CWU do końca doby: zużyte + dogrzanie (poniżej histerezy) + straty postojowe."""
+    reheat = 0.0
+    if dhw.temp < dhw.target - dhw.hysteresis:
+        reheat = dhw_reheat_kg(dhw.volume_l, dhw.temp, dhw.target, specific_heat_kwh, calorific_kwh, efficiency)
+    return dhw.consumed_kg + reheat + hours_left * standby_kg_h
+
+
+# --- STREFY ---
+def static_demand_kg(index: float, target: float, temp_ext: float, min_delta: float = 0.0) -> float:
+    """Dobowe zapotrzebowanie strefy [kg/24h] przy stałej temperaturze zewnętrznej."""
+    return index * max(min_delta, target - temp_ext)
+
+
+def demand_matrix(index, wind_coef, delta, wind, on_fraction) -> np.ndarray:
+    """Przewidywane zapotrzebowanie stref [godziny x strefy] w kg/24h.
+
+    index, wind_coef: [Z] współczynniki modelu; delta, on_fraction: [H x Z];
+    wind: [H]. Indeks strefy = index + wind_coef * wiatr.
+    """
+    index = np.asarray(index, dtype=float)
+    wind_coef = np.asarray(wind_coef, dtype=float)
+    wind = np.asarray(wind, dtype=float)
+    idx = np.clip(index[None, :] + wind_coef[None, :] * wind[:, None], 0.0, None)
+    return idx * np.clip(np.asarray(delta, dtype=float), 0.0, None) * np.asarray(on_fraction, dtype=float)
+
+
+def allocate(burn, demand, fallback=None) -> np.ndarray:
+    """Podział spalania [H] na strefy proporcjonalnie do zapotrzebowania [H x Z].
+
+    Godziny bez przewidywanego zapotrzebowania dzielone są wg `fallback`
+    (np. udział czasu pracy pomp), a bez niego trafiają do pierwszej strefy.
+    """
+    burn = np.asarray(burn, dtype=float)
+    demand = np.asarray(demand, dtype=float)
+    if demand.shape[1] == 0:
+        return demand
+    weights = demand.copy()
+    empty = weights.sum(axis=1) <= 0
+    if fallback is not None:
+        weights[empty] = np.asarray(fallback, dtype=float)[empty]
+        empty = weights.sum(axis=1) <= 0
+    weights[empty, 0] = 1.0
+    shares = weights / weights.sum(axis=1, keepdims=True)
+    return shares * burn[:, None]
+
+
+def split_rate(rate_kg_h: float, predictions: dict[str, float]) -> dict[str, float]:
+    """Bieżące tempo spalania rozdzielone wg predykcji stref (bez spalania - predykcje/24)."""
+    keys = list(predictions)
+    demand = np.array([[predictions[k] for k in keys]])
+    if keys and rate_kg_h > 0 and demand.sum() > 0:
+        shares = allocate([rate_kg_h], demand)[0]
+    else:
+        shares = demand[0] / 24.0
+    return dict(zip(keys, shares.tolist()))
+
+
+# --- PROGNOZA DOBOWA ---
+@dataclass(frozen=True)
+class DayForecastInputs:
+    """Wejścia prognozy do końca doby (kolejność stref wspólna dla krotek)."""
+
+    now: datetime
+    temp_ext: float
+    zones: tuple                # klucze stref
+    zone_index: tuple           # indeks strefy z wiatrem [kg/°C/24h]
+    targets: tuple              # temperatury zadane
+    enabled: tuple              # strefa uwzględniana
+    consumed: tuple             # dzisiejsze zużycie strefy [kg]
+    schedules: tuple            # tablica 7x24 albo None (bez harmonogramu)
+    dhw: DhwState
+    specific_heat_kwh: float
+    calorific_kwh: float
+    dhw_efficiency: float
+    hour_shape: np.ndarray | None = None  # kształt doby z profilu tygodniowego (24 wagi)
+
+
+@dataclass(frozen=True)
+class DayForecast:
+    """Prognoza dobowa: kg stref, godziny pracy stref i kg CWU."""
+
+    zones: dict = field(default_factory=dict)
+    hours: dict = field(default_factory=dict)
+    dhw: float = 0.0
+
+    @property
+    def total(self) -> float:
+        return sum(self.zones.values()) + self.dhw
+
+    def kg(self, target: str) -> float:
+        """kg dla strefy, "dhw" albo sumy (każdy inny cel)."""
+        if target in self.zones:
+            return self.zones[target]
+        if target == "dhw":
+            return self.dhw
+        return self.total
+
+
+def day_forecast(inp: DayForecastInputs) -> DayForecast:
+    """Zużyte dziś + zapotrzebowanie stref w pozostałych godzinach harmonogramu + CWU."""
+    zones, hours = {}, {}
+    for key, index, target, enabled, consumed, table in zip(
+        inp.zones, inp.zone_index, inp.targets, inp.enabled, inp.consumed, inp.schedules
+    ):
+        if not enabled:
+            zones[key], hours[key] = 0.0, 0.0
+            continue
+        hours[key] = remaining_schedule_hours(table, inp.now, inp.hour_shape)
+        zones[key] = consumed + static_demand_kg(index, target, inp.temp_ext) / 24.0 * hours[key]
+    dhw = dhw_day_kg(
+        inp.dhw, hours_left_today(inp.now), inp.specific_heat_kwh, inp.calorific_kwh, inp.dhw_efficiency
+    )
+    return DayForecast(zones, hours, dhw)
+
+
+def day_forecast_batch(inputs: Iterable[DayForecastInputs], workers: int = 0) -> list[DayForecast]:
+    """Prognozy dla wielu scenariuszy; workers > 0 - w puli procesów (zadania wsadowe)."""
+    if workers <= 0:
+        return [day_forecast(inp) for inp in inputs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(day_forecast, inputs, chunksize=16))
+
+
+# --- ZASIĘG ZASOBNIKA ---
+def burn_horizon(profile_total: np.ndarray | None, hours: int, fallback_kg_h: float,
+                 learned: np.ndarray | None = None) -> np.ndarray:
+    """Oczekiwane spalanie [kg/h] na `hours` godzin naprzód.
+
+    Profil prognozy pokrywa swój horyzont. Dalej (albo bez prognozy) używany
+    jest wyuczony profil tygodniowy `learned` [hours] (NaN = nieznana komórka);
+    luki wypełnia ostatnia doba prognozy, a bez niej stałe tempo zastępcze.
+    """
+    if profile_total is None or len(profile_total) < 24:
+        burn = np.full(hours, max(0.0, fallback_kg_h))
+        covered = 0
+    else:
+        reps = -(-max(0, hours - len(profile_total)) // 24)
+        tail = np.tile(profile_total[-24:], reps)
+        burn = np.concatenate([profile_total, tail])[:hours]
+        covered = len(profile_total)
+    if learned is not None and covered < hours:
+        rest = learned[covered:hours]
+        burn[covered:] = np.where(np.isnan(rest), burn[covered:], np.clip(rest, 0.0, None))
+    return burn
+
+
+def simulate_runout(hopper_kg: float, burn_kg_h: np.ndarray, rel_sigma: float) -> dict:
+    """Krokowa (godzinowa) symulacja poziomu zasobnika z pasmem ufności.
+
+    Trzy scenariusze (niskie/oczekiwane/wysokie spalanie, +-rel_sigma) liczone
+    jednym cumsum na tablicy 3xN. Zwraca godziny do opróżnienia lub None,
+    gdy zasobnik wystarcza na cały horyzont.
+    """
+    scale = np.array([[1.0 + rel_sigma], [1.0], [max(0.0, 1.0 - rel_sigma)]])
+    levels = np.cumsum(burn_kg_h[np.newaxis, :] * scale, axis=1)
+    empty = levels >= max(0.0, hopper_kg)
+    hit = empty.any(axis=1)
+    idx = np.where(hit, empty.argmax(axis=1) + 1, -1)
+
+    def _hours(i):
+        return None if idx[i] < 0 else int(idx[i])
+
+    return {"early_h": _hours(0), "expected_h": _hours(1), "late_h": _hours(2)}
+
+
+def range_estimate(hopper_kg: float, profile_total: np.ndarray | None, fallback_kg_h: float,
+                   rel_sigma: float, horizon_h: int, learned: np.ndarray | None = None) -> dict:
+    """Spalanie na horyzont i wynik symulacji opróżnienia zasobnika."""
+    burn = burn_horizon(profile_total, horizon_h, fallback_kg_h, learned)
+    return {"burn": burn, "sim": simulate_runout(hopper_kg, burn, rel_sigma)}
+
+
+# --- ROZRUCH BIURA ---
+def warmup_limit_min(base_shift_min: float, temp_ext: float) -> float:
+    """Czas stabilizacji strefy po załączeniu: bazowy + 4 min na każde 5°C poniżej 10°C."""
+    return base_shift_min + max(0, (10.0 - temp_ext) / 5.0) * 4.0
+
+
+@dataclass
+class OfficeWarmup:
+    """Faza rozruchu strefy z przełącznikiem (nauka modelu wstrzymana w trakcie)."""
+
+    start_ts: float | None = None
+    last_on_ts: float | None = None
+
+    def update(self, now: float, switch_on: bool, pump_on: bool, idle_reset_s: float = OFFICE_IDLE_RESET_S) -> None:
+        if switch_on and pump_on:
+            self.last_on_ts = now
+            if not self.start_ts:
+                self.start_ts = now
+        elif not switch_on:
+            self.start_ts = None
+        elif not pump_on and self.start_ts:
+            if self.last_on_ts and (now - self.last_on_ts) > idle_reset_s:
+                self.start_ts = None
+
+    def elapsed_min(self, now: float) -> float:
+        return (now - self.start_ts) / 60 if self.start_ts else 0
+
+    def warming_up(self, now: float, active: bool, limit_min: float) -> bool:
+        return active and self.elapsed_min(now) < limit_min
@@ -0,0 +1,174 @@
+"""Dziennik cykli grzania CWU z dokładnym czasem przejść i statystykami kroczącymi."""
+from __future__ import annotations
+from bisect import bisect_left, insort
+from collections import deque
+from datetime import datetime, timedelta
+
+# Indeksy pól cyklu (krotka, w Store jako lista)
+START, END, KG, TEMP_BEFORE, TEMP_AFTER, VOLUME = range(6)
+
+
+def parse_boiler_clock(raw, now: datetime) -> datetime | None:
+    """Zegar sterownika (`miscdata.clock`) -> datetime w strefie `now`.
+
+    Sam czas (HH:MM[:SS]) dopasowywany jest do najbliższej doby względem `now`.
+    """
+    text = str(raw or "").strip()
+    if not text:
+        return None
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%d-%m-%Y %H:%M:%S", "%d-%m-%Y %H:%M"):
+        try:
+            return datetime.strptime(text, fmt).replace(tzinfo=now.tzinfo)
+        except ValueError:
+            continue
+    for fmt in ("%H:%M:%S", "%H:%M"):
+        try:
+            clock = datetime.strptime(text, fmt).time()
+        except ValueError:
+            continue
+        moment = datetime.combine(now.date(), clock, tzinfo=now.tzinfo)
+        if moment - now > timedelta(hours=12):
+            moment -= timedelta(days=1)
+        elif now - moment > timedelta(hours=12):
+            moment += timedelta(days=1)
+        return moment
+    return None
+
+
+class RollingCycleStats:
+    """Statystyki okna cykli aktualizowane przyrostowo przy dodaniu i usunięciu cyklu."""
+
+    def __init__(self) -> None:
+        self._durations: list[float] = []
+        self.count = 0
+        self.kg_sum = 0.0
+        self.kwh_sum = 0.0
+        self.litre_kelvin_sum = 0.0
+
+    def _apply(self, cycle, sign: int, calorific_kwh: float) -> None:
+        self.count += sign
+        self.kg_sum += sign * cycle[KG]
+        lift = (cycle[TEMP_AFTER] or 0.0) - (cycle[TEMP_BEFORE] or 0.0)
+        if cycle[TEMP_BEFORE] is not None and cycle[TEMP_AFTER] is not None and lift > 0.5 and cycle[VOLUME]:
+            self.kwh_sum += sign * cycle[KG] * calorific_kwh
+            self.litre_kelvin_sum += sign * cycle[VOLUME] * lift
+
+    def add(self, cycle, calorific_kwh: float) -> None:
+        insort(self._durations, cycle[END] - cycle[START])
+        self._apply(cycle, 1, calorific_kwh)
+
+    def remove(self, cycle, calorific_kwh: float) -> None:
+        i = bisect_left(self._durations, cycle[END] - cycle[START])
+        if i < len(self._durations):
+            del self._durations[i]
+        self._apply(cycle, -1, calorific_kwh)
+
+    @property
+    def median_duration_s(self) -> float | None:
+        n = len(self._durations)
+        if not n:
+            return None
+        mid = n // 2
+        return self._durations[mid] if n % 2 else (self._durations[mid - 1] + self._durations[mid]) / 2
+
+
+class DhwCycleJournal:
+    """Cykle grzania CWU wykrywane z przejść wyjścia pompy CWU.
+
+    Chwila migawki to zegar sterownika (gdy jest zgodny z czasem HA), a przejście
+    datowane jest na środek przedziału między migawkami - błąd najwyżej pół cyklu
+    odpytywania zamiast całego. Cykle trafiają do bufora pierścieniowego.
+    """
+
+    def __init__(self, keep: int = 200, max_skew_s: float = 900.0, calorific_kwh: float = 4.8) -> None:
+        self.keep = keep
+        self.max_skew_s = max_skew_s
+        self.calorific_kwh = calorific_kwh
+        self.cycles: deque = deque()
+        self.stats = RollingCycleStats()
+        self.active: dict | None = None
+        # Ostatnia migawka: (ts, stan pompy, licznik kg, temperatura zasobnika)
+        self._last: tuple | None = None
+
+    def snapshot_time(self, now: datetime, clock_raw) -> float:
+        """Czas migawki: zegar kotła, gdy odchyłka od `now` mieści się w max_skew_s."""
+        clock = parse_boiler_clock(clock_raw, now)
+        if clock is not None and abs((clock - now).total_seconds()) <= self.max_skew_s:
+            return clock.timestamp()
+        return now.timestamp()
+
+    def observe(self, now: datetime, clock_raw, on: bool, counter_kg: float, temp: float | None, volume_l: float) -> bool:
+        """Nowa migawka z koordynatora; zwraca True, jeśli zamknięto cykl."""
+        ts = self.snapshot_time(now, clock_raw)
+        last = self._last
+        if last is not None and ts <= last[0]:
+            # Ta sama (lub starsza) migawka chmury - bez nowej informacji
+            return False
+        self._last = (ts, on, counter_kg, temp)
+        if last is None:
+            if on:
+                self.active = {"start": ts, "start_kg": counter_kg, "temp_before": None}
+            return False
+
+        edge = (last[0] + ts) / 2.0
+        if on and self.active is None:
+            self.active = {"start": edge, "start_kg": last[2], "temp_before": last[3]}
+        elif not on and self.active is not None:
+            active, self.active = self.active, None
+            cycle = (
+                active["start"], edge, max(0.0, round(counter_kg - active["start_kg"], 3)),
+                active["temp_before"], temp, volume_l,
+            )
+            self._push(cycle)
+            return True
+        return False
+
+    def _push(self, cycle) -> None:
+        if len(self.cycles) >= self.keep:
+            self.stats.remove(self.cycles.popleft(), self.calorific_kwh)
+        self.cycles.append(cycle)
+        self.stats.add(cycle, self.calorific_kwh)
+
+    @property
+    def last_cycle(self):
+        return self.cycles[-1] if self.cycles else None
+
+    def summary(self) -> dict:
+        """Statystyki kroczące okna cykli (bez zapytań do recordera)."""
+        stats = self.stats
+        median = stats.median_duration_s
+        span_days = 0.0
+        if self.cycles:
+            span_days = (self.cycles[-1][END] - self.cycles[0][START]) / 86400.0
+        return {
+            "cycles_logged": stats.count,
+            "median_duration_min": round(median / 60.0, 1) if median is not None else None,
+            "kg_per_cycle": round(stats.kg_sum / stats.count, 3) if stats.count else None,
+            "cycles_per_day": round(stats.count / max(1.0, span_days), 2) if stats.count else None,
+            "kwh_per_litre_kelvin": (
+                round(stats.kwh_sum / stats.litre_kelvin_sum, 5) if stats.litre_kelvin_sum > 0 else None
+            ),
+        }
+
+    def as_dict(self) -> dict:
+        return {
+            "cycles": [list(c) for c in self.cycles],
+            "active": self.active,
+            "last": list(self._last) if self._last else None,
+        }
+
+    def load_dict(self, data: dict | None) -> None:
+        if not isinstance(data, dict):
+            return
+        self.cycles.clear()
+        self.stats = RollingCycleStats()
+        for item in (data.get("cycles") or [])[-self.keep:]:
+            try:
+                start, end, kg, before, after, volume = item
+                self._push((float(start), float(end), float(kg), before, after, float(volume or 0.0)))
+            except (TypeError, ValueError):
+                continue
+        active = data.get("active")
+        self.active = active if isinstance(active, dict) and "start" in active else None
+        last = data.get("last")
+        self._last = tuple(last) if isinstance(last, list) and len(last) == 4 else None
@@ -0,0 +1,27 @@
+"""Diagnostyka wpisu (Ustawienia -> Urządzenia -> Pobierz diagnostykę)."""
+from __future__ import annotations
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import CONF_PASSWORD, CONF_USERNAME, DOMAIN
+from .logs import suppressed_counts
+
+TO_REDACT = {CONF_USERNAME, CONF_PASSWORD}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict[str, Any]:
+    """Dane wpisu bez poświadczeń, rozmiary buforów i liczniki pominiętych wpisów logu.
+
+    Liczniki logu są tutaj, a nie w atrybutach encji - nie zmieniają się
+    w każdym cyklu stanu zapisywanego przez recorder.
+    """
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    return {
+        "entry": async_redact_data(dict(entry.data), TO_REDACT),
+        "last_update_success": coordinator.last_update_success,
+        "footprint": coordinator.footprint(),
+        "log_suppressed": suppressed_counts(),
+    }
@@ -1,5 +1,9 @@
 """Klasa bazowa dla encji NBE."""
 from __future__ import annotations
+from typing import Any, Callable
+
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_track_state_change_event
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 from homeassistant.helpers.entity import DeviceInfo
 from .const import DOMAIN
@@ -7,10 +11,87 @@ from .const import DOMAIN
 class StokerEntity(CoordinatorEntity):
     """Wspólna klasa bazowa definiująca urządzenie NBE."""
 
+    # Encje z własnym stanem wewnętrznym ustawiają True i implementują _dump_state/_load_state
+    _persist_state = False
+    # Czy encja może pokazywać ostatnią migawkę w przerwie chmury (coordinator.stale)
+    _stale_tolerant = True
+
     def __init__(self, coordinator, username: str) -> None:
         super().__init__(coordinator)
         self._username = username.lower()
         self._attr_has_entity_name = True
+        self._state_restored = False
+        # Cache wartości liczonych raz na zmianę wejść: nazwa -> (klucz, wartość)
+        self._memo_cache: dict[str, tuple] = {}
+        self._inputs_version = 0
+        self._delta_generation = None
+
+    @property
+    def available(self) -> bool:
+        """Niedostępna po tolerancji przerwy; encje nietolerujące także w jej trakcie."""
+        return super().available and (self._stale_tolerant or not self.coordinator.stale)
+
+    async def async_added_to_hass(self) -> None:
+        await super().async_added_to_hass()
+        inputs = [e for e in self._memo_inputs() if e]
+        if inputs:
+            self.async_on_remove(
+                async_track_state_change_event(self.hass, inputs, self._async_input_changed)
+            )
+        store = getattr(self.coordinator, "state_store", None)
+        if not self._persist_state or store is None:
+            return
+        key = f"entity:{self._attr_unique_id}"
+        data = store.get(key)
+        if isinstance(data, dict):
+            try:
+                self._load_state(data)
+                self._state_restored = True
+            except (KeyError, TypeError, ValueError):
+                self._state_restored = False
+        self.async_on_remove(store.register(key, self._dump_state))
+
+    def _memo_inputs(self) -> list[str]:
+        """Encje HA, od których zależą wartości liczone przez _memo (zmiana = przeliczenie)."""
+        return []
+
+    @callback
+    def _async_input_changed(self, _event) -> None:
+        self._inputs_version += 1
+        self.async_write_ha_state()
+
+    def _memo(self, name: str, compute: Callable[[], Any], *extra) -> Any:
+        """Wartość liczona raz na generację danych koordynatora i wersję wejść.
+
+        Stan, atrybuty i inni konsumenci w tym samym cyklu dostają ten sam wynik.
+        `extra` - dodatkowe składniki klucza (np. znacznik prognozy pogody).
+        """
+        key = (self.coordinator.generation, self._inputs_version, *extra)
+        cached = self._memo_cache.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        value = compute()
+        self._memo_cache[name] = (key, value)
+        return value
+
+    def _tick_delta(self):
+        """Delta bieżącego cyklu koordynatora albo None, jeśli encja już ją przetworzyła.
+
+        Koordynator powiadamia encje także po nieudanym odświeżeniu - bez tej
+        kontroli przyrost z ostatniego udanego cyklu zostałby doliczony ponownie.
+        """
+        delta = self.coordinator.delta
+        if delta.generation == self._delta_generation:
+            return None
+        self._delta_generation = delta.generation
+        return delta
+
+    def _dump_state(self) -> dict:
+        """Pełny stan wewnętrzny encji do checkpointu (JSON)."""
+        return {}
+
+    def _load_state(self, data: dict) -> None:
+        """Przywrócenie stanu wewnętrznego z checkpointu."""
 
     @property
     def device_info(self) -> DeviceInfo:
@@ -0,0 +1,262 @@
+"""Estymator online współczynników efektywności (RLS z czynnikiem zapominania)."""
+from __future__ import annotations
+from collections import deque
+
+# Regresory modelu spalania (y = kg/h * 24): para (ΔT, wiatr*ΔT) na strefę, na końcu CWU
+ZONE_REGRESSORS = ("delta", "wind_delta")
+
+# Wartości startowe (prior); indeks strefy pochodzi z jej konfiguracji
+PRIOR_WIND_RATIO = 0.05
+PRIOR_DHW_KG_24H = 0.0
+# Układ checkpointu sprzed stref: (dom, wiatr dom, biuro, cwu)
+LEGACY_ZONES = ("house", "office")
+
+
+class RecursiveLeastSquares:
+    """Rekurencyjna metoda najmniejszych kwadratów z czynnikiem zapominania.
+
+    Koszt aktualizacji zależy wyłącznie od liczby regresorów (O(1) względem historii).
+    """
+
+    def __init__(self, theta, forgetting=0.995, p0=10.0, p_max=1e4):
+        self.n = len(theta)
+        self.forgetting = forgetting
+        self.p_max = p_max
+        self.theta = [float(t) for t in theta]
+        self.P = [[p0 if i == j else 0.0 for j in range(self.n)] for i in range(self.n)]
+        self.updates = 0
+        self.p0 = p0
+
+    def insert(self, index: int, values) -> None:
+        """Wstaw nowe parametry przed pozycją `index` (nowe wiersze P = p0 * I)."""
+        values = [float(v) for v in values]
+        k = len(values)
+        if not k:
+            return
+        self.theta[index:index] = values
+        for row in self.P:
+            row[index:index] = [0.0] * k
+        n = self.n + k
+        self.P[index:index] = [[self.p0 if j == index + i else 0.0 for j in range(n)] for i in range(k)]
+        self.n = n
+
+    def predict(self, x) -> float:
+        return sum(t * xi for t, xi in zip(self.theta, x))
+
+    def update(self, x, y: float) -> float:
+        """Jeden krok RLS. Zwraca błąd predykcji a priori."""
+        n, lam, P = self.n, self.forgetting, self.P
+        px = [sum(P[i][j] * x[j] for j in range(n)) for i in range(n)]
+        denom = lam + sum(x[i] * px[i] for i in range(n))
+        if denom <= 0:
+            return 0.0
+        gain = [v / denom for v in px]
+        err = y - self.predict(x)
+        self.theta = [self.theta[i] + gain[i] * err for i in range(n)]
+        self.P = [[(P[i][j] - gain[i] * px[j]) / lam for j in range(n)] for i in range(n)]
+
+        # Ochrona przed "wybuchem" kowariancji przy słabym pobudzeniu
+        trace = sum(self.P[i][i] for i in range(n))
+        if trace > self.p_max:
+            scale = self.p_max / trace
+            self.P = [[v * scale for v in row] for row in self.P]
+        self.updates += 1
+        return err
+
+    def as_dict(self) -> dict:
+        return {"theta": list(self.theta), "P": [list(r) for r in self.P], "updates": self.updates}
+
+    def load_dict(self, data: dict) -> None:
+        theta = data.get("theta")
+        matrix = data.get("P")
+        if not isinstance(theta, list) or len(theta) != self.n:
+            return
+        self.theta = [float(t) for t in theta]
+        if isinstance(matrix, list) and len(matrix) == self.n:
+            self.P = [[float(v) for v in row] for row in matrix]
+        self.updates = int(data.get("updates", 0))
+
+
+class EfficiencyLearner:
+    """Wspólny model spalania dla wszystkich stref (jedna instancja na koordynator).
+
+    Próbkuje licznik kg w oknach >= `window_s` i uczy RLS; każda strefa ma
+    własny indeks, więc efektywności uczone są niezależnie. Składnik wiatrowy
+    uczą tylko strefy z `wind_zones` - u pozostałych regresor wiatru jest zerowy,
+    a współczynnik nie wchodzi do indeksu.
+    Ostatnie próbki trzymane są w buforze pierścieniowym (diagnostyka / błąd RMS).
+    """
+
+    def __init__(self, window_s: float = 300.0, buffer_size: int = 288):
+        self.window_s = window_s
+        self.zones: list[str] = []
+        self.wind_zones: set[str] = set()
+        self.rls = RecursiveLeastSquares([PRIOR_DHW_KG_24H])
+        self.samples: deque = deque(maxlen=buffer_size)
+        self.last_counter: float | None = None
+        self.last_ts: float | None = None
+        self.last_rate_kg_h = 0.0
+
+    def ensure_zones(self, zones) -> bool:
+        """Dodaj brakujące strefy [(klucz, indeks startowy, wiatr)]; zwraca True przy zmianie."""
+        added = False
+        for key, prior, wind in zones:
+            if wind:
+                self.wind_zones.add(key)
+            else:
+                self.wind_zones.discard(key)
+            if key in self.zones:
+                continue
+            self.rls.insert(2 * len(self.zones), [prior, prior * PRIOR_WIND_RATIO if wind else 0.0])
+            self.zones.append(key)
+            added = True
+        if added:
+            # Próbki o starym wymiarze nie nadają się już do porównań
+            self.samples.clear()
+        return added
+
+    def feed(self, now: float, counter_kg: float, x, learn: bool = True) -> bool:
+        """Podaj odczyt licznika; zwraca True, jeśli wykonano krok uczenia.
+
+        Wywołania w tym samym oknie czasowym są ignorowane, więc kilka encji
+        może bezpiecznie zasilać ten sam model.
+        """
+        if self.last_counter is None or counter_kg < self.last_counter:
+            self.last_counter, self.last_ts = counter_kg, now
+            return False
+        elapsed = now - self.last_ts
+        if elapsed < self.window_s:
+            return False
+
+        delta_kg = counter_kg - self.last_counter
+        self.last_counter, self.last_ts = counter_kg, now
+        self.last_rate_kg_h = delta_kg / (elapsed / 3600.0) if delta_kg > 0.005 else 0.0
+        if not learn or elapsed > 4 * self.window_s or len(x) != self.rls.n:
+            return False
+
+        y = self.last_rate_kg_h * 24.0
+        err = self.rls.update(x, y)
+        self.samples.append((now, y, tuple(x), err))
+        return True
+
+    def regressors(self, deltas: dict, fractions: dict, wind_speed: float, dhw: float = 0.0) -> tuple:
+        """Wektor regresorów: ΔT strefy x udział pracy pompy (oraz x wiatr w strefach z wiatrem), CWU."""
+        x = []
+        for key in self.zones:
+            active = deltas.get(key, 0.0) * fractions.get(key, 0.0)
+            x.extend((active, active * wind_speed if key in self.wind_zones else 0.0))
+        x.append(dhw)
+        return tuple(x)
+
+    def zone_predictions(self, x) -> dict[str, float]:
+        """Przewidywane spalanie stref [kg/24h] dla wektora regresorów."""
+        theta = self.rls.theta
+        return {
+            key: max(0.0, theta[2 * i] * x[2 * i] + theta[2 * i + 1] * x[2 * i + 1])
+            for i, key in enumerate(self.zones)
+        }
+
+    def as_dict(self) -> dict:
+        return {
+            "zones": list(self.zones),
+            "rls": self.rls.as_dict(),
+            "last_counter": self.last_counter,
+            "last_ts": self.last_ts,
+            "last_rate_kg_h": self.last_rate_kg_h,
+            "samples": [[ts, y, list(x), err] for ts, y, x, err in self.samples],
+        }
+
+    def load_dict(self, data: dict) -> None:
+        """Przywróć stan z checkpointu (odporne na brakujące pola)."""
+        if not isinstance(data, dict):
+            return
+        rls_data = data.get("rls") or {}
+        zones = data.get("zones")
+        if zones is None:
+            theta = rls_data.get("theta")
+            if isinstance(theta, list) and len(theta) == 4:
+                legacy = RecursiveLeastSquares([0.0] * 4)
+                legacy.load_dict(rls_data)
+                # Biuro nie miało składnika wiatrowego
+                legacy.insert(3, [0.0])
+                zones, rls_data = list(LEGACY_ZONES), legacy.as_dict()
+            else:
+                zones, rls_data = [], {}
+        if not isinstance(zones, list):
+            return
+        self.zones = [str(z) for z in zones]
+        self.rls = RecursiveLeastSquares([0.0] * (2 * len(self.zones)) + [PRIOR_DHW_KG_24H])
+        self.rls.load_dict(rls_data)
+        self.last_counter = data.get("last_counter")
+        self.last_ts = data.get("last_ts")
+        self.last_rate_kg_h = float(data.get("last_rate_kg_h") or 0.0)
+        self.samples.clear()
+        for item in data.get("samples") or []:
+            try:
+                ts, y, x, err = item
+                if len(x) == self.rls.n:
+                    self.samples.append((float(ts), float(y), tuple(x), float(err)))
+            except (TypeError, ValueError):
+                continue
+
+    @property
+    def coefficients(self) -> dict:
+        names = [f"{reg}_{key}" for key in self.zones for reg in ZONE_REGRESSORS] + ["dhw"]
+        return dict(zip(names, self.rls.theta))
+
+    def zone_coefficients(self, keys) -> tuple[list[float], list[float]]:
+        """(indeksy, współczynniki wiatru) dla listy stref; nieznane strefy = 0, strefy bez wiatru - wiatr 0."""
+        theta = self.rls.theta
+        index, wind = [], []
+        for key in keys:
+            if key in self.zones:
+                i = self.zones.index(key)
+                index.append(theta[2 * i])
+                wind.append(theta[2 * i + 1] if key in self.wind_zones else 0.0)
+            else:
+                index.append(0.0)
+                wind.append(0.0)
+        return index, wind
+
+    def zone_index(self, key: str, wind_speed: float = 0.0) -> float:
+        """Efektywny indeks strefy [kg/°C/24h] przy zadanym wietrze."""
+        (index,), (wind,) = self.zone_coefficients([key])
+        return max(0.05, index + wind * max(0.0, wind_speed))
+
+    def observed_index(self, key: str, min_demand: float = 1.0) -> tuple[float, float] | None:
+        """(czas, obserwowany indeks strefy) z ostatniej próbki okna albo None.
+
+        Spalanie okna minus przewidywany udział pozostałych stref i CWU, podzielone
+        przez ΔT strefy x udział pracy pompy. Zawiera składnik wiatrowy z tego okna,
+        więc porównywalne jest z `zone_index(key, wiatr)`, ale nie jest wygładzone.
+        """
+        if key not in self.zones or not self.samples:
+            return None
+        ts, y, x, _ = self.samples[-1]
+        i = 2 * self.zones.index(key)
+        if x[i] < min_demand:
+            return None
+        theta = self.rls.theta
+        others = sum(t * xi for j, (t, xi) in enumerate(zip(theta, x)) if j not in (i, i + 1))
+        return ts, (y - others) / x[i]
+
+    def predict_kg_h(self, deltas: dict, wind_speed: float, dhw: float = 0.0) -> float:
+        """Prognozowane spalanie [kg/h] przy pracy wszystkich stref z zadanym ΔT."""
+        x = self.regressors(deltas, {key: 1.0 for key in self.zones}, wind_speed, dhw)
+        return max(0.0, self.rls.predict(x)) / 24.0
+
+    @property
+    def relative_error(self) -> float:
+        """Błąd RMS względem średniego spalania (do pasm ufności), ograniczony do [0.1, 0.5]."""
+        if not self.samples:
+            return 0.5
+        mean_y = sum(abs(s[1]) for s in self.samples) / len(self.samples)
+        if mean_y <= 0:
+            return 0.5
+        return min(0.5, max(0.1, self.rms_error / mean_y))
+
+    @property
+    def rms_error(self) -> float:
+        if not self.samples:
+            return 0.0
+        return (sum(s[3] ** 2 for s in self.samples) / len(self.samples)) ** 0.5
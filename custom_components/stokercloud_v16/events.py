@@ -0,0 +1,144 @@
+"""Dziennik zdarzeń kotła (komunikaty info, alarmy, stany) z deduplikacją kodów."""
+from __future__ import annotations
+
+# Rodzaje zdarzeń
+INFO = "info"
+ALARM = "alarm"
+STATE = "state"
+
+# Zmiany zgłaszane na szynę HA
+NEW = "new"
+REPEATED = "repeated"
+CLEARED = "cleared"
+ENTERED = "entered"
+
+# Indeksy pól wpisu (lista - bezpośrednio serializowalna do Store)
+KIND, CODE, FIRST_SEEN, LAST_SEEN, COUNT, ACTIVE = range(6)
+
+
+def info_codes(raw) -> set[str]:
+    """Aktywne kody `infomessages` (lista liczb/napisów albo słowników z id/value); 0 i puste pomijane."""
+    items = raw if isinstance(raw, list) else [raw]
+    codes = set()
+    for item in items:
+        if isinstance(item, dict):
+            item = item.get("id", item.get("value"))
+        text = str(item).strip() if item is not None else ""
+        if text and text != "0":
+            codes.add(text)
+    return codes
+
+
+def alarm_codes(raw) -> set[str]:
+    """Aktywny alarm (`miscdata.alarm.value`) jako zbiór z jednym kodem albo pusty."""
+    text = str(raw).strip().lower() if raw is not None else ""
+    if text in ("", "0", "off", "false", "none"):
+        return set()
+    return {str(raw).strip()}
+
+
+def state_code(raw) -> str | None:
+    """Kod stanu kotła (`miscdata.state.value`) bez prefiksu `lng_`."""
+    if raw is None or raw == "":
+        return None
+    return str(raw).replace("lng_", "")
+
+
+class EventJournal:
+    """Wpis na (rodzaj, kod): pierwsze i ostatnie wystąpienie, liczba wystąpień, aktywność.
+
+    Kod trwający przez wiele cykli to jedno wystąpienie - zgłaszane są tylko
+    pojawienie się (new/repeated), zniknięcie (cleared) i wejście w stan (entered).
+    Pierwsza obserwacja bez zapisanego stanu ustala bazę bez zgłoszeń.
+    Po przekroczeniu `keep` usuwane są nieaktywne wpisy o najstarszym last_seen.
+    """
+
+    def __init__(self, keep: int = 100) -> None:
+        self.keep = keep
+        self.entries: dict[tuple[str, str], list] = {}
+        self.state: str | None = None
+        self.primed = False
+
+    def observe(self, ts: float, info: set[str], alarms: set[str], state: str | None) -> list[dict]:
+        """Migawka z koordynatora; zwraca zmiany do zgłoszenia."""
+        changes = []
+        for kind, codes in ((INFO, info), (ALARM, alarms)):
+            for code in codes:
+                change = self._activate(kind, code, ts)
+                if change:
+                    changes.append(self._change(kind, code, change))
+            for key, entry in self.entries.items():
+                if key[0] == kind and entry[ACTIVE] and key[1] not in codes:
+                    entry[ACTIVE] = False
+                    changes.append(self._change(kind, key[1], CLEARED))
+
+        if state is not None and state != self.state:
+            previous, self.state = self.state, state
+            if previous is not None:
+                old = self.entries.get((STATE, previous))
+                if old is not None:
+                    old[ACTIVE] = False
+            self._activate(STATE, state, ts)
+            if previous is not None:
+                changes.append({**self._change(STATE, state, ENTERED), "previous": previous})
+        elif state is not None:
+            self._activate(STATE, state, ts)
+
+        self._trim()
+        primed, self.primed = self.primed, True
+        return changes if primed else []
+
+    def _activate(self, kind: str, code: str, ts: float) -> str | None:
+        entry = self.entries.get((kind, code))
+        if entry is None:
+            self.entries[(kind, code)] = [kind, code, ts, ts, 1, True]
+            return NEW
+        entry[LAST_SEEN] = ts
+        if entry[ACTIVE]:
+            return None
+        entry[ACTIVE] = True
+        entry[COUNT] += 1
+        return REPEATED
+
+    def _change(self, kind: str, code: str, change: str) -> dict:
+        entry = self.entries[(kind, code)]
+        return {"kind": kind, "code": code, "change": change, "count": entry[COUNT], "ts": entry[LAST_SEEN]}
+
+    def _trim(self) -> None:
+        excess = len(self.entries) - self.keep
+        if excess <= 0:
+            return
+        idle = sorted((e[LAST_SEEN], key) for key, e in self.entries.items() if not e[ACTIVE])
+        for _, key in idle[:excess]:
+            del self.entries[key]
+
+    def query(self, kind: str | None = None, active_only: bool = False, since: float | None = None,
+              limit: int | None = None) -> list[list]:
+        """Wpisy od najświeższego last_seen, z filtrami."""
+        rows = [
+            e for e in self.entries.values()
+            if (kind is None or e[KIND] == kind)
+            and (not active_only or e[ACTIVE])
+            and (since is None or e[LAST_SEEN] >= since)
+        ]
+        rows.sort(key=lambda e: e[LAST_SEEN], reverse=True)
+        return rows[:limit] if limit else rows
+
+    def as_dict(self) -> dict:
+        return {"entries": [list(e) for e in self.entries.values()], "state": self.state, "primed": self.primed}
+
+    def load_dict(self, data: dict | None) -> None:
+        if not isinstance(data, dict):
+            return
+        self.entries.clear()
+        for item in data.get("entries") or []:
+            try:
+                kind, code, first, last, count, active = item
+                self.entries[(str(kind), str(code))] = [
+                    str(kind), str(code), float(first), float(last), int(count), bool(active),
+                ]
+            except (TypeError, ValueError):
+                continue
+        self.state = data.get("state")
+        self.primed = bool(data.get("primed")) and bool(self.entries)
+        self._trim()
@@ -0,0 +1,176 @@
+"""Eksport kolumnowy telemetrii i godzinowego zużycia (Parquet / Arrow IPC / CSV.gz), porcjami."""
+from __future__ import annotations
+import csv
+import gzip
+import logging
+from datetime import datetime, timedelta, timezone
+
+from homeassistant.components.recorder import get_instance, history
+from homeassistant.components.recorder.statistics import statistics_during_period
+from homeassistant.helpers import entity_registry as er
+
+from .const import EXPORT_CHUNK_DAYS, STAT_SERIES
+from .history import statistic_id
+from .zones import ALL_ZONES
+
+_LOGGER = logging.getLogger(__name__)
+
+FORMAT_EXTENSIONS = {"parquet": "parquet", "arrow": "arrow", "csv": "csv.gz"}
+
+# Kolumny zbiorów: (nazwa, typ pyarrow)
+TELEMETRY_COLUMNS = (("time", "timestamp"), ("entity_id", "string"), ("value", "float64"), ("state", "string"))
+CONSUMPTION_COLUMNS = (("start", "timestamp"), ("series", "string"), ("kg", "float64"), ("sum_kg", "float64"))
+
+
+class ChunkWriter:
+    """Zapis porcjami do jednego pliku; pyarrow opcjonalny (bez niego CSV.gz).
+
+    Metody write/close są blokujące - wywoływane w executorze.
+    """
+
+    def __init__(self, path_base: str, fmt: str, columns) -> None:
+        self.columns = columns
+        self.rows = 0
+        self._pa = None
+        if fmt != "csv":
+            try:
+                import pyarrow as pa
+            except ImportError:
+                _LOGGER.info("Brak pyarrow - eksport do CSV.gz zamiast %s", fmt)
+                fmt = "csv"
+            else:
+                self._pa = pa
+        self.format = fmt
+        self.path = f"{path_base}.{FORMAT_EXTENSIONS[fmt]}"
+        self._writer = None
+        self._file = None
+
+    def _schema(self):
+        pa = self._pa
+        types = {"timestamp": pa.timestamp("us", tz="UTC"), "string": pa.string(), "float64": pa.float64()}
+        return pa.schema([(name, types[kind]) for name, kind in self.columns])
+
+    def write(self, chunk: dict[str, list]) -> None:
+        count = len(chunk[self.columns[0][0]])
+        if not count:
+            return
+        if self.format == "csv":
+            if self._file is None:
+                self._file = gzip.open(self.path, "wt", newline="", encoding="utf-8")
+                self._writer = csv.writer(self._file)
+                self._writer.writerow([name for name, _ in self.columns])
+            cols = [chunk[name] for name, _ in self.columns]
+            self._writer.writerows(
+                [v.isoformat() if isinstance(v, datetime) else v for v in row] for row in zip(*cols)
+            )
+        else:
+            pa = self._pa
+            schema = self._schema()
+            if self._writer is None:
+                if self.format == "parquet":
+                    import pyarrow.parquet as pq
+                    self._writer = pq.ParquetWriter(self.path, schema, compression="zstd")
+                else:
+                    self._file = pa.OSFile(self.path, "wb")
+                    self._writer = pa.ipc.new_file(
+                        self._file, schema, options=pa.ipc.IpcWriteOptions(compression="zstd")
+                    )
+            self._writer.write_table(pa.Table.from_pydict(chunk, schema=schema))
+        self.rows += count
+
+    def close(self) -> None:
+        if self.format != "csv" and self._writer is not None:
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+
+
+def _value(state: str):
+    try:
+        return float(state)
+    except (ValueError, TypeError):
+        return None
+
+
+def telemetry_chunk(hass, entity_ids: list[str], start: datetime, end: datetime) -> dict[str, list]:
+    """Zmiany stanów encji integracji w oknie (wątek recordera)."""
+    states = history.get_significant_states(
+        hass, start, end, entity_ids,
+        include_start_time_state=False, significant_changes_only=False,
+        minimal_response=True, no_attributes=True,
+    )
+    chunk = {name: [] for name, _ in TELEMETRY_COLUMNS}
+    for entity_id, rows in states.items():
+        for row in rows:
+            # minimal_response: pierwszy wiersz to State, kolejne to słowniki
+            if isinstance(row, dict):
+                raw, changed = row.get("state"), row.get("last_changed")
+                changed = datetime.fromisoformat(changed) if isinstance(changed, str) else changed
+            else:
+                raw, changed = row.state, row.last_changed
+            if changed is None or raw in ("unknown", "unavailable"):
+                continue
+            chunk["time"].append(changed)
+            chunk["entity_id"].append(entity_id)
+            chunk["value"].append(_value(raw))
+            chunk["state"].append(str(raw))
+    return chunk
+
+
+def consumption_chunk(hass, username: str, start: datetime, end: datetime) -> dict[str, list]:
+    """Godzinowe serie zużycia z statystyk zewnętrznych integracji (wątek recordera)."""
+    keys = [*STAT_SERIES, *(f"pellet_{zone.key}" for zone in ALL_ZONES)]
+    ids = {statistic_id(username, key): key for key in keys}
+    stats = statistics_during_period(hass, start, end, set(ids), "hour", None, {"state", "sum"})
+    chunk = {name: [] for name, _ in CONSUMPTION_COLUMNS}
+    for stat_id, rows in stats.items():
+        for row in rows:
+            row_start = row["start"]
+            if not isinstance(row_start, datetime):
+                row_start = datetime.fromtimestamp(row_start, tz=timezone.utc)
+            chunk["start"].append(row_start)
+            chunk["series"].append(ids.get(stat_id, stat_id))
+            chunk["kg"].append(row.get("state"))
+            chunk["sum_kg"].append(row.get("sum"))
+    return chunk
+
+
+def entry_entity_ids(hass, entry_id: str) -> list[str]:
+    """Encje sensorów integracji (telemetria) z rejestru encji."""
+    registry = er.async_get(hass)
+    return sorted(
+        entry.entity_id for entry in er.async_entries_for_config_entry(registry, entry_id)
+        if entry.domain in ("sensor", "binary_sensor")
+    )
+
+
+async def async_export(hass, coordinator, entry_id: str, dataset: str, start: datetime, end: datetime,
+                       fmt: str, path_base: str) -> dict:
+    """Eksport zbioru porcjami po EXPORT_CHUNK_DAYS - w pamięci jest najwyżej jedna porcja."""
+    recorder = get_instance(hass)
+    if dataset == "telemetry":
+        entity_ids = entry_entity_ids(hass, entry_id)
+        columns = TELEMETRY_COLUMNS
+
+        def fetch(t0, t1):
+            return telemetry_chunk(hass, entity_ids, t0, t1)
+    else:
+        columns = CONSUMPTION_COLUMNS
+
+        def fetch(t0, t1):
+            return consumption_chunk(hass, coordinator.username, t0, t1)
+
+    writer = await hass.async_add_executor_job(ChunkWriter, path_base, fmt, columns)
+    chunks = 0
+    try:
+        t0 = start
+        while t0 < end:
+            t1 = min(end, t0 + timedelta(days=EXPORT_CHUNK_DAYS))
+            chunk = await recorder.async_add_executor_job(fetch, t0, t1)
+            await hass.async_add_executor_job(writer.write, chunk)
+            chunks += 1
+            t0 = t1
+    finally:
+        await hass.async_add_executor_job(writer.close)
+    _LOGGER.info("Eksport %s: %s wierszy -> %s", dataset, writer.rows, writer.path)
+    return {"path": writer.path if writer.rows else None, "format": writer.format, "rows": writer.rows, "chunks": chunks}
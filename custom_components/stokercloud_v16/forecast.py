@@ -0,0 +1,186 @@
+"""Wektorowa prognoza godzinowa zapotrzebowania na pellet (NumPy)."""
+from __future__ import annotations
+import math
+from dataclasses import dataclass
+from datetime import datetime
+
+import numpy as np
+
+from .core import DHW_STANDBY_KG_H
+
+
+@dataclass(frozen=True)
+class ForecastInputs:
+    """Niezmienny zestaw wejść; służy również jako klucz cache."""
+
+    hours: tuple            # znaczniki czasu (datetime lokalny) kolejnych godzin
+    temperature: tuple      # °C
+    wind_speed: tuple       # m/s
+    zones: tuple            # klucze stref grzewczych
+    zone_index: tuple       # indeks strefy [kg/°C/24h] (model RLS)
+    zone_wind: tuple        # współczynnik wiatru strefy (model RLS)
+    targets: tuple          # temperatury zadane stref
+    enabled: tuple          # czy strefa jest uwzględniana
+    schedules: bytes        # np.stack([zone_schedule(...)]).tobytes() - Z x 7 x 24
+    price_per_kg: float
+    dhw_kg_h: float = DHW_STANDBY_KG_H
+
+
+def compute_profile(inp: ForecastInputs) -> dict[str, np.ndarray]:
+    """Godzinowy profil kg i kosztu jako jedna operacja na tablicach [godziny x strefy]."""
+    n = len(inp.hours)
+    temp = np.asarray(inp.temperature, dtype=float)
+    wind = np.clip(np.asarray(inp.wind_speed, dtype=float), 0.0, None)
+    weekday = np.fromiter((h.weekday() for h in inp.hours), dtype=int, count=n)
+    hour = np.fromiter((h.hour for h in inp.hours), dtype=int, count=n)
+
+    sched = np.frombuffer(inp.schedules).reshape(len(inp.zones), 7, 24)[:, weekday, hour].T
+    index = np.asarray(inp.zone_index, dtype=float)
+    wind_coef = np.asarray(inp.zone_wind, dtype=float)
+    idx = np.clip(index[None, :] + wind_coef[None, :] * wind[:, None], 0.05, None)
+    delta = np.clip(np.asarray(inp.targets, dtype=float)[None, :] - temp[:, None], 0.0, None)
+    zones = idx * delta / 24.0 * sched * np.asarray(inp.enabled, dtype=float)[None, :]
+
+    dhw = np.full(n, max(DHW_STANDBY_KG_H, inp.dhw_kg_h))
+    total = zones.sum(axis=1) + dhw
+    result = {key: zones[:, i] for i, key in enumerate(inp.zones)}
+    result.update({
+        "zones": zones,
+        "dhw": dhw,
+        "total": total,
+        "cost": total * inp.price_per_kg,
+    })
+    return result
+
+
+class HourlyForecastEngine:
+    """Prognoza z cache - przeliczana tylko przy zmianie wejść."""
+
+    def __init__(self) -> None:
+        self._key: ForecastInputs | None = None
+        self._result: dict[str, np.ndarray] = {}
+        self._rows: list[dict] | None = None
+        self.computations = 0
+        # Ostatnia prognoza pogody: (godziny, temperatury, wiatr m/s)
+        self.weather: tuple[tuple, tuple, tuple] = ((), (), ())
+        self.weather_updated: datetime | None = None
+
+    def profile(self, inp: ForecastInputs) -> dict[str, np.ndarray]:
+        if inp != self._key:
+            self._result = compute_profile(inp)
+            self._rows = None
+            self._key = inp
+            self.computations += 1
+        return self._result
+
+    @property
+    def result(self) -> dict[str, np.ndarray]:
+        """Ostatnio policzony profil (bez przeliczania)."""
+        return self._result
+
+    def rows(self, inp: ForecastInputs) -> list[dict]:
+        """Profil w postaci wierszy (cache razem z profilem)."""
+        result = self.profile(inp)
+        if self._rows is None:
+            self._rows = self.as_rows(inp, result)
+        return self._rows
+
+    @staticmethod
+    def as_rows(inp: ForecastInputs, result: dict[str, np.ndarray]) -> list[dict]:
+        """Lista godzin w formacie atrybutu / odpowiedzi usługi."""
+        columns = {
+            "total_kg": result["total"],
+            **{f"{key}_kg": result[key] for key in inp.zones},
+            "dhw_kg": result["dhw"], "cost": result["cost"],
+        }
+        columns = {k: np.round(v, 3).tolist() for k, v in columns.items()}
+        return [
+            {"datetime": moment.isoformat(), **{k: col[i] for k, col in columns.items()}}
+            for i, moment in enumerate(inp.hours)
+        ]
+
+
+# Przeliczniki jednostek wiatru HA -> m/s (model uczony na danych StokerCloud)
+WIND_TO_MS = {"km/h": 1 / 3.6, "m/s": 1.0, "mph": 0.44704, "kn": 0.514444, "ft/s": 0.3048}
+
+
+def parse_weather_forecast(items: list | None, wind_unit: str | None = "km/h", limit: int = 72) -> tuple[tuple, tuple, tuple]:
+    """Forecast z weather.get_forecasts -> (godziny, temperatury, wiatr w m/s)."""
+    factor = WIND_TO_MS.get(wind_unit or "km/h", 1 / 3.6)
+    hours, temps, winds = [], [], []
+    for item in items or []:
+        try:
+            moment = datetime.fromisoformat(str(item["datetime"]))
+            temp = float(item["temperature"])
+        except (KeyError, ValueError, TypeError):
+            continue
+        try:
+            wind = float(item.get("wind_speed") or 0.0) * factor
+        except (ValueError, TypeError):
+            wind = 0.0
+        hours.append(moment)
+        temps.append(temp)
+        winds.append(wind)
+        if len(hours) >= limit:
+            break
+    return tuple(hours), tuple(temps), tuple(winds)
+
+
+def axis_length(spec) -> int:
+    """Liczba wartości osi siatki bez jej alokowania (zakres: floor((max-min)/step)+1)."""
+    if spec is None:
+        return 1
+    if isinstance(spec, dict):
+        span = abs(spec["max"] - spec["min"]) / spec["step"]
+        if not math.isfinite(span):
+            raise ValueError("Zakres osi musi być skończony")
+        # Tolerancja zaokrągleń, np. (1.0 - 0.0) / 0.1 = 9.999...
+        return math.floor(span + 1e-9) + 1
+    if isinstance(spec, list):
+        return len(spec)
+    return 1
+
+
+def grid_axes(specs: dict, defaults: dict, max_axis: int, max_cells: int) -> dict[str, np.ndarray]:
+    """Osie siatki what-if z kontrolą rozmiaru przed alokacją.
+
+    Każda oś najwyżej `max_axis` wartości, iloczyn najwyżej `max_cells`;
+    przekroczenie -> ValueError (bez budowania tablic).
+    """
+    lengths = {name: axis_length(specs.get(name)) for name in defaults}
+    for name, length in lengths.items():
+        if length > max_axis:
+            raise ValueError(f"Za długa oś {name}: {length} > {max_axis}")
+    cells = math.prod(lengths.values())
+    if cells > max_cells:
+        raise ValueError(f"Za duża siatka symulacji: {cells} > {max_cells}")
+    return {name: _axis(specs.get(name), default, lengths[name]) for name, default in defaults.items()}
+
+
+def _axis(spec, default: float, length: int) -> np.ndarray:
+    """Rozwiń specyfikację parametru do osi siatki."""
+    if spec is None:
+        return np.array([default])
+    if isinstance(spec, dict):
+        lo = min(spec["min"], spec["max"])
+        return np.round(lo + np.arange(length) * spec["step"], 4)
+    if isinstance(spec, list):
+        return np.array(spec, dtype=float)
+    return np.array([float(spec)])
+
+
+def simulate_grid(target_temps, outdoor_temps, insulation, prices) -> dict:
+    """Siatka what-if: dobowe kg i koszt dla wszystkich kombinacji parametrów.
+
+    kg[i, j, k] = insulation[k] * max(0, target[i] - outdoor[j]);
+    cost[i, j, k, m] = kg[i, j, k] * price[m] / 1000 (cena w PLN/t).
+    """
+    target = np.asarray(target_temps, dtype=float)
+    outdoor = np.asarray(outdoor_temps, dtype=float)
+    ins = np.asarray(insulation, dtype=float)
+    price = np.asarray(prices, dtype=float) / 1000.0
+
+    delta = np.clip(target[:, None] - outdoor[None, :], 0.0, None)
+    kg = delta[:, :, None] * ins[None, None, :]
+    cost = kg[..., None] * price
+    return {"kg": kg, "cost": cost}
@@ -0,0 +1,366 @@
+"""Historia zużycia StokerCloud: backfill i synchronizacja godzinowa do statystyk HA."""
+from __future__ import annotations
+import asyncio
+import logging
+import math
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import async_add_external_statistics
+from homeassistant.const import UnitOfMass
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.util import dt as dt_util, slugify
+
+from .const import (
+    DOMAIN,
+    BACKFILL_QUERIES,
+    BACKFILL_REQUEST_DELAY,
+    BACKFILL_BATCH_SIZE,
+    BACKFILL_RETRY_S,
+    BACKFILL_RETRY_MAX_S,
+    STAT_SERIES,
+    ZONE_STAT_NAME,
+    HOURLY_ACTIVITY_KEEP,
+    HOURLY_GAP_MAX_HOURS,
+)
+from .core import allocate, demand_matrix
+from .zones import ZONES_BY_KEY
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def parse_bucket_time(raw) -> datetime | None:
+    """Znacznik czasu kubełka (epoch s/ms lub ISO) -> datetime UTC."""
+    try:
+        ts = float(str(raw).replace(",", "."))
+        if ts > 1e11:
+            ts /= 1000.0
+        return datetime.fromtimestamp(ts, tz=timezone.utc)
+    except (ValueError, TypeError, OverflowError):
+        pass
+    try:
+        parsed = datetime.fromisoformat(str(raw))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def parse_series(payload, index: int) -> list[tuple[datetime, float]]:
+    """Wyciągnij serię `index` z odpowiedzi get_consumption (rosnąco po czasie)."""
+    if not isinstance(payload, list) or len(payload) <= index:
+        return []
+    sub = payload[index]
+    points = sub.get("data") if isinstance(sub, dict) else None
+    if not isinstance(points, list):
+        return []
+
+    buckets = {}
+    for point in points:
+        try:
+            start = parse_bucket_time(point[0])
+            value = float(str(point[1]).replace(",", "."))
+        except (ValueError, TypeError, IndexError):
+            continue
+        if start is not None and value >= 0:
+            buckets[start] = value
+    return sorted(buckets.items())
+
+
+def splice_series(coarse: list, fine: list) -> list[tuple[datetime, float]]:
+    """Połącz serię zgrubną z dokładniejszą bez podwójnego liczenia.
+
+    Kubełki zgrubne są brane tylko sprzed pierwszego kubełka dokładnego, który
+    zaczyna się na granicy kubełka zgrubnego; wcześniejsze dokładne są odrzucane.
+    """
+    if not fine:
+        return list(coarse)
+    coarse_starts = {start for start, _ in coarse}
+    boundary = next((start for start, _ in fine if start in coarse_starts), None)
+    if boundary is None:
+        return list(fine)
+    return [b for b in coarse if b[0] < boundary] + [b for b in fine if b[0] >= boundary]
+
+
+def statistic_id(username: str, key: str) -> str:
+    return f"{DOMAIN}:{slugify(username)}_{key}"
+
+
+def series_name(key: str) -> str:
+    """Nazwa serii statystyk: z STAT_SERIES lub pellet_<klucz strefy>."""
+    if key in STAT_SERIES:
+        return STAT_SERIES[key][1]
+    zone = ZONES_BY_KEY.get(key.removeprefix("pellet_"))
+    return ZONE_STAT_NAME.format(name=zone.name if zone else key)
+
+
+def statistic_metadata(username: str, key: str) -> StatisticMetaData:
+    name = series_name(key)
+    return StatisticMetaData(
+        has_mean=False,
+        has_sum=True,
+        name=f"{name} ({username})",
+        source=DOMAIN,
+        statistic_id=statistic_id(username, key),
+        unit_of_measurement=UnitOfMass.KILOGRAMS,
+    )
+
+
+def _hour_start(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+class ConsumptionHistory:
+    """Historia zużycia: jednorazowy backfill i przyrostowa synchronizacja godzinowa.
+
+    Stan (znaki wodne serii statystyk, znak wodny synchronizacji godzinowej,
+    sumy narastające i warunki ΔT stref/wiatr per godzina) trzymany jest w
+    StokerStateStore pod kluczem "history".
+    """
+
+    def __init__(self, hass, coordinator) -> None:
+        self.hass = hass
+        self.coordinator = coordinator
+        self.username = coordinator.username
+        self._store = coordinator.state_store
+        state = self._store.get("history") if self._store else None
+        self.state = state if isinstance(state, dict) else {}
+        self.state.setdefault("done", False)
+        self.state.setdefault("series", {})
+        self.state.setdefault("hourly", {"last_start": None, "totals": {}})
+        self.state.setdefault("activity", {})
+        if self._store:
+            self._store.register("history", lambda: self.state)
+        # Strony backfillu pobrane w tej sesji (zapytanie -> payload) i ponowienie brakujących
+        self._pages: dict[str, list] = {}
+        self._retry_s = BACKFILL_RETRY_S
+        self._unsub_retry = None
+
+    @property
+    def done(self) -> bool:
+        return bool(self.state.get("done"))
+
+    @property
+    def totals(self) -> dict:
+        """Sumy narastające [kg] z zamkniętych godzin: total/dhw i klucze stref."""
+        return self.state["hourly"]["totals"]
+
+    def watermark(self, key: str) -> tuple[datetime | None, float]:
+        mark = self.state["series"].get(key) or {}
+        last = mark.get("last_start")
+        return (datetime.fromisoformat(last) if last else None), float(mark.get("sum", 0.0))
+
+    def _set_watermark(self, key: str, last_start: datetime, total: float) -> None:
+        self.state["series"][key] = {"last_start": last_start.isoformat(), "sum": round(total, 4)}
+        if self._store:
+            self._store.async_schedule_save()
+
+    def import_rows(self, key: str, rows: list[tuple[datetime, float]]) -> int:
+        """Zaimportuj kubełki nowsze niż znak wodny, partiami. Zwraca liczbę wierszy."""
+        last_start, total = self.watermark(key)
+        pending = []
+        for start, value in rows:
+            start = _hour_start(start)
+            if last_start is not None and start <= last_start:
+                continue
+            total += value
+            pending.append(StatisticData(start=start, state=value, sum=total))
+            last_start = start
+
+        meta = statistic_metadata(self.username, key)
+        for i in range(0, len(pending), BACKFILL_BATCH_SIZE):
+            batch = pending[i:i + BACKFILL_BATCH_SIZE]
+            async_add_external_statistics(self.hass, meta, batch)
+            self._set_watermark(key, batch[-1]["start"], batch[-1]["sum"])
+        return len(pending)
+
+    # --- BACKFILL ---
+    async def _fetch_missing(self) -> list[str]:
+        """Pobierz zakresy historii jeszcze niepobrane w tej sesji (z przerwami); zwraca brakujące."""
+        missing = []
+        for query in BACKFILL_QUERIES:
+            if query in self._pages:
+                continue
+            if len(self._pages) + len(missing):
+                await asyncio.sleep(BACKFILL_REQUEST_DELAY)
+            try:
+                page = await self.coordinator.client.get_consumption(query)
+            except Exception as err:
+                _LOGGER.warning("Backfill: błąd pobierania %s: %s", query, err)
+                page = None
+            if isinstance(page, list):
+                self._pages[query] = page
+            else:
+                missing.append(query)
+        return missing
+
+    @callback
+    def _schedule_retry(self) -> None:
+        @callback
+        def _retry(_now) -> None:
+            self._unsub_retry = None
+            self.hass.async_create_background_task(self.async_backfill(), f"{DOMAIN}_backfill_{self.username}")
+
+        self._unsub_retry = async_call_later(self.hass, self._retry_s, _retry)
+        self._retry_s = min(self._retry_s * 2, BACKFILL_RETRY_MAX_S)
+
+    @callback
+    def async_cancel(self) -> None:
+        """Anuluj zaplanowane ponowienie backfillu (wyładowanie wpisu)."""
+        if self._unsub_retry:
+            self._unsub_retry()
+            self._unsub_retry = None
+
+    async def async_backfill(self) -> None:
+        """Import historii dopiero po pobraniu wszystkich zakresów.
+
+        Częściowy import przesunąłby znak wodny za brakujący zakres (np. miesiące),
+        których nie dałoby się już dograć - brakujące zapytania są ponawiane
+        w tej samej sesji z rosnącym odstępem.
+        """
+        if self.done:
+            return
+        missing = await self._fetch_missing()
+        if missing:
+            _LOGGER.info("Backfill: brak %s, ponowienie za %s s", ", ".join(missing), self._retry_s)
+            self._schedule_retry()
+            return
+        pages = [self._pages[query] for query in BACKFILL_QUERIES]
+
+        # Bieżąca (niezamknięta) godzina należy już do synchronizacji godzinowej
+        current_hour = _hour_start(datetime.now(timezone.utc))
+        imported = 0
+        for key, (index, _) in STAT_SERIES.items():
+            merged = []
+            for page in pages:
+                merged = splice_series(merged, parse_series(page, index))
+            imported += self.import_rows(key, [r for r in merged if _hour_start(r[0]) < current_hour])
+            await asyncio.sleep(0)
+
+        self.state["done"] = True
+        self._pages.clear()
+        if self._store:
+            self._store.async_schedule_save()
+        _LOGGER.info("Backfill historii zakończony: %s kubełków", imported)
+
+    # --- SYNCHRONIZACJA GODZINOWA ---
+    def record_activity(self, now: datetime, deltas: dict[str, float], wind: float, temp: float | None = None) -> None:
+        """Uśrednione warunki (ΔT stref, wiatr, temp.) w kubełku bieżącej godziny - podział na strefy i profil."""
+        key = _hour_start(now.astimezone(timezone.utc)).isoformat()
+        act = self.state["activity"].setdefault(key, {"n": 0, "wind": 0.0, "dt": {}})
+        act["n"] += 1
+        act["wind"] += wind
+        if temp is not None:
+            act["temp"] = act.get("temp", 0.0) + temp
+            act["nt"] = act.get("nt", 0) + 1
+        dt = act.setdefault("dt", {})
+        for zone_key, delta in deltas.items():
+            dt[zone_key] = dt.get(zone_key, 0.0) + delta
+
+        activity = self.state["activity"]
+        if len(activity) > HOURLY_ACTIVITY_KEEP:
+            for old in sorted(activity)[:len(activity) - HOURLY_ACTIVITY_KEEP]:
+                del activity[old]
+
+    def split_heating(self, starts: list[datetime], heating_kg) -> dict[str, np.ndarray]:
+        """Podział spalania grzewczego godzin na strefy jednym krokiem macierzowym.
+
+        Waga strefy = przewidywane zapotrzebowanie modelu x scałkowany czas pracy
+        jej pompy w danej godzinie (dziennik przejść koordynatora).
+        """
+        keys = [zone.key for zone in self.coordinator.zones]
+        pumps = self.coordinator.pumps
+        on = np.array([
+            [pumps.fraction(key, start.timestamp(), start.timestamp() + 3600.0) for key in keys]
+            for start in starts
+        ]).reshape(len(starts), len(keys))
+
+        delta = np.ones_like(on)
+        wind = np.zeros(len(starts))
+        for i, start in enumerate(starts):
+            act = self.state["activity"].get(start.isoformat())
+            if not act or not act.get("n"):
+                continue
+            n = act["n"]
+            wind[i] = act["wind"] / n
+            dt = act.get("dt") or {}
+            delta[i] = [dt.get(key, n) / n for key in keys]
+
+        index, wind_coef = self.coordinator.learner.zone_coefficients(keys)
+        demand = demand_matrix(index, wind_coef, delta, wind, on)
+        shares = allocate(np.clip(np.asarray(heating_kg, dtype=float), 0.0, None), demand, on)
+        return {key: shares[:, i] for i, key in enumerate(keys)}
+
+    def _learn_profile(self, starts: list[datetime], total_kg) -> None:
+        """Zamknięte godziny do profilu tygodniowego (czas lokalny, średnia temperatura godziny)."""
+        profile = self.coordinator.profile
+        for start, kg in zip(starts, total_kg):
+            act = self.state["activity"].get(start.isoformat()) or {}
+            temp = act["temp"] / act["nt"] if act.get("nt") else None
+            profile.update(dt_util.as_local(start), float(kg), temp)
+
+    def gap_query(self, payload, now: datetime) -> str | None:
+        """Zapytanie o dłuższy zakres godzin, gdy payload nie sięga znaku wodnego.
+
+        Po przerwie (HA/chmura) dłuższej niż zakres `hours=24` brakujące godziny
+        nie byłyby nigdy zaimportowane, a sumy synchronizacji zaniżone na stałe.
+        """
+        last = self.state["hourly"].get("last_start")
+        rows = parse_series(payload, 0)
+        if not last or not rows:
+            return None
+        last_start = datetime.fromisoformat(last)
+        if _hour_start(rows[0][0]) <= last_start + timedelta(hours=1):
+            return None
+        hours = math.ceil((now - last_start).total_seconds() / 3600.0) + 1
+        if hours > HOURLY_GAP_MAX_HOURS:
+            _LOGGER.warning("Przerwa %s h dłuższa niż %s h - starsze godziny pominięte", hours, HOURLY_GAP_MAX_HOURS)
+        return f"hours={min(hours, HOURLY_GAP_MAX_HOURS)}"
+
+    def process_hours(self, payload, now: datetime) -> int:
+        """Przetwórz nowe zamknięte godziny z serii `hours=24` (albo dłuższej z `gap_query`). Zwraca ich liczbę.
+
+        Pominięte odpytywania nadrabiane są automatycznie - liczą się kubełki
+        od znaku wodnego, a nie różnice licznika dobowego między cyklami.
+        """
+        total_rows = parse_series(payload, 0)
+        if not total_rows:
+            return 0
+        dhw_rows = dict(parse_series(payload, 1))
+        current_hour = _hour_start(now.astimezone(timezone.utc))
+        closed = [(_hour_start(t), v, dhw_rows.get(t, 0.0)) for t, v in total_rows if _hour_start(t) < current_hour]
+        if not closed:
+            return 0
+
+        hourly = self.state["hourly"]
+        last = hourly.get("last_start")
+        last_start = datetime.fromisoformat(last) if last else None
+        if last_start is None:
+            # Pierwsze uruchomienie: tylko ustaw znak wodny, bez liczenia wstecz
+            hourly["last_start"] = closed[-1][0].isoformat()
+            return 0
+
+        fresh = [row for row in closed if row[0] > last_start]
+        if not fresh:
+            return 0
+        starts = [start for start, _, _ in fresh]
+        total = np.array([total_kg for _, total_kg, _ in fresh])
+        dhw = np.minimum(np.array([dhw_kg for _, _, dhw_kg in fresh]), total)
+        series = {"total": total, "dhw": dhw, **self.split_heating(starts, total - dhw)}
+
+        self._learn_profile(starts, total)
+
+        totals = hourly["totals"]
+        new_rows = {}
+        for key, values in series.items():
+            totals[key] = round(totals.get(key, 0.0) + float(values.sum()), 4)
+            new_rows[f"pellet_{key}"] = [(start, float(v)) for start, v in zip(starts, values)]
+        hourly["last_start"] = starts[-1].isoformat()
+        for key, rows in new_rows.items():
+            # Serie z backfillu czekają na jego zakończenie (wspólny znak wodny)
+            if key not in STAT_SERIES or self.done:
+                self.import_rows(key, rows)
+        if self._store:
+            self._store.async_schedule_save()
+        return len(starts)
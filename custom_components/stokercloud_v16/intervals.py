@@ -0,0 +1,136 @@
+"""Ważony czasem dziennik pracy pomp (przejścia on/off i skumulowany czas pracy)."""
+from __future__ import annotations
+from bisect import bisect_right
+
+INTERVAL_KEEP_S = 48 * 3600
+
+
+class OnTimeAccumulator:
+    """Dziennik przejść jednego kanału z sumą prefiksową czasu pracy.
+
+    `_ts[i]` to chwila przejścia, `_cum[i]` to łączny czas "on" do tej chwili,
+    `_on[i]` to stan po przejściu. Czas pracy w oknie to różnica dwóch
+    odczytów skumulowanych (wyszukiwanie binarne, bez iteracji po historii).
+    """
+
+    def __init__(self, keep_s: float = INTERVAL_KEEP_S) -> None:
+        self.keep_s = keep_s
+        self._ts: list[float] = []
+        self._cum: list[float] = []
+        self._on: list[bool] = []
+
+    def __len__(self) -> int:
+        return len(self._ts)
+
+    @property
+    def is_on(self) -> bool:
+        return bool(self._on and self._on[-1])
+
+    @property
+    def last_change(self) -> float | None:
+        return self._ts[-1] if self._ts else None
+
+    def set_state(self, ts: float, on: bool) -> bool:
+        """Zarejestruj stan; zapisuje tylko rzeczywiste przejścia. Zwraca True przy zmianie."""
+        if self._ts:
+            if ts < self._ts[-1] or on == self._on[-1]:
+                return False
+            cum = self._cum[-1] + (ts - self._ts[-1] if self._on[-1] else 0.0)
+        else:
+            cum = 0.0
+        self._ts.append(ts)
+        self._cum.append(cum)
+        self._on.append(on)
+        self._trim(ts)
+        return True
+
+    def _trim(self, now: float) -> None:
+        # Przycinanie porcjami: zostaw co najmniej jedno przejście sprzed okna
+        if len(self._ts) < 64 or now - self._ts[0] <= 2 * self.keep_s:
+            return
+        cut = max(0, bisect_right(self._ts, now - self.keep_s) - 1)
+        del self._ts[:cut], self._cum[:cut], self._on[:cut]
+
+    def cumulative(self, t: float) -> float:
+        """Łączny czas pracy [s] od początku dziennika do chwili t."""
+        i = bisect_right(self._ts, t) - 1
+        if i < 0:
+            return 0.0
+        return self._cum[i] + (t - self._ts[i] if self._on[i] else 0.0)
+
+    def on_time(self, t0: float, t1: float) -> float:
+        """Czas pracy [s] w oknie [t0, t1]."""
+        if t1 <= t0:
+            return 0.0
+        return self.cumulative(t1) - self.cumulative(t0)
+
+    def fraction(self, t0: float, t1: float) -> float:
+        """Udział czasu pracy w oknie (0..1)."""
+        if t1 <= t0:
+            return 1.0 if self.is_on else 0.0
+        return min(1.0, max(0.0, self.on_time(t0, t1) / (t1 - t0)))
+
+    def as_dict(self) -> dict:
+        return {"ts": self._ts, "cum": self._cum, "on": self._on}
+
+    def load_dict(self, data: dict) -> None:
+        ts, cum, on = data.get("ts"), data.get("cum"), data.get("on")
+        if isinstance(ts, list) and isinstance(cum, list) and isinstance(on, list) and len(ts) == len(cum) == len(on):
+            self._ts = [float(v) for v in ts]
+            self._cum = [float(v) for v in cum]
+            self._on = [bool(v) for v in on]
+
+
+class PumpIntervalLog:
+    """Dzienniki pracy pomp (strefy grzewcze i CWU), kanały tworzone przy pierwszej obserwacji.
+
+    Kanał z wyłączonym przełącznikiem uwzględniania (np. biuro) liczy się jako nieaktywny.
+    """
+
+    def __init__(self) -> None:
+        self.channels: dict[str, OnTimeAccumulator] = {}
+        self._raw: dict[str, bool] = {}
+        self.enabled: dict[str, bool] = {}
+
+    def _apply(self, ts: float) -> None:
+        for name, on in self._raw.items():
+            acc = self.channels.setdefault(name, OnTimeAccumulator())
+            acc.set_state(ts, on and self.enabled.get(name, True))
+
+    def observe(self, ts: float, states: dict[str, bool]) -> None:
+        """Stan pomp z bieżącego payloadu {kanał: włączona}."""
+        self._raw.update(states)
+        self._apply(ts)
+
+    def set_enabled(self, ts: float, channel: str, enabled: bool) -> None:
+        """Zdarzenie zmiany przełącznika uwzględniania kanału (dokładny czas przejścia)."""
+        self.enabled[channel] = enabled
+        self._apply(ts)
+
+    def fraction(self, channel: str, t0: float, t1: float) -> float:
+        acc = self.channels.get(channel)
+        return acc.fraction(t0, t1) if acc else 0.0
+
+    def on_time(self, channel: str, t0: float, t1: float) -> float:
+        acc = self.channels.get(channel)
+        return acc.on_time(t0, t1) if acc else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "enabled": dict(self.enabled),
+            "raw": dict(self._raw),
+            "channels": {k: v.as_dict() for k, v in self.channels.items()},
+        }
+
+    def load_dict(self, data: dict | None) -> None:
+        if not isinstance(data, dict):
+            return
+        enabled = data.get("enabled")
+        if not isinstance(enabled, dict):
+            enabled = {"office": data.get("office_enabled", True)}
+        self.enabled = {str(k): bool(v) for k, v in enabled.items()}
+        self._raw = {str(k): bool(v) for k, v in (data.get("raw") or {}).items()}
+        for name, payload in (data.get("channels") or {}).items():
+            if isinstance(payload, dict):
+                acc = self.channels.setdefault(str(name), OnTimeAccumulator())
+                acc.load_dict(payload)
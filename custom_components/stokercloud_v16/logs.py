@@ -0,0 +1,73 @@
+"""Logowanie z limitem częstotliwości na klucz komunikatu (gorące ścieżki błędów)."""
+from __future__ import annotations
+import logging
+import time
+
+from .const import LOG_RATE_LIMIT_S
+
+# Wspólny rejestr: nazwa loggera -> RateLimitedLogger (liczniki dla diagnostyki)
+_LIMITERS: dict[str, RateLimitedLogger] = {}
+
+
+class RateLimitedLogger:
+    """Najwyżej jeden wpis na klucz w oknie `interval_s`; powtórzenia tylko zliczane.
+
+    Pominięty wpis nie jest formatowany. Kolejny wypuszczony wpis podaje liczbę
+    pominiętych powtórzeń i kontekst (pary klucz=wartość).
+    """
+
+    def __init__(self, logger: logging.Logger, interval_s: float = LOG_RATE_LIMIT_S) -> None:
+        self.logger = logger
+        self.interval_s = interval_s
+        # klucz -> [czas ostatniego wpisu, pominięte od niego, wystąpienia, pominięte łącznie]
+        self._keys: dict[str, list] = {}
+
+    def log(self, level: int, key: str, msg: str, *args, **context) -> bool:
+        """Zapis (True) albo zliczenie powtórzenia (False)."""
+        now = time.monotonic()
+        state = self._keys.get(key)
+        if state is None:
+            state = self._keys[key] = [None, 0, 0, 0]
+        state[2] += 1
+        if state[0] is not None and now - state[0] < self.interval_s:
+            state[1] += 1
+            state[3] += 1
+            return False
+        if not self.logger.isEnabledFor(level):
+            state[0], state[1] = now, 0
+            return False
+        if context:
+            msg += " [%s]"
+            args += (", ".join(f"{k}={v}" for k, v in context.items()),)
+        if state[1]:
+            msg += " (pominięto %s powtórzeń)"
+            args += (state[1],)
+        state[0], state[1] = now, 0
+        self.logger.log(level, msg, *args)
+        return True
+
+    def error(self, key: str, msg: str, *args, **context) -> bool:
+        return self.log(logging.ERROR, key, msg, *args, **context)
+
+    def warning(self, key: str, msg: str, *args, **context) -> bool:
+        return self.log(logging.WARNING, key, msg, *args, **context)
+
+    def stats(self) -> dict[str, dict]:
+        return {key: {"total": s[2], "suppressed": s[3], "pending": s[1]} for key, s in self._keys.items()}
+
+
+def rate_limited(logger: logging.Logger) -> RateLimitedLogger:
+    """Współdzielony limiter dla loggera modułu."""
+    limiter = _LIMITERS.get(logger.name)
+    if limiter is None:
+        limiter = _LIMITERS[logger.name] = RateLimitedLogger(logger)
+    return limiter
+
+
+def suppressed_counts() -> dict[str, dict]:
+    """Liczniki wszystkich kluczy (wystąpienia, pominięte łącznie i od ostatniego wpisu) - do diagnostyki."""
+    return {
+        f"{name.rsplit('.', 1)[-1]}:{key}": counts
+        for name, limiter in _LIMITERS.items()
+        for key, counts in limiter.stats().items()
+    }
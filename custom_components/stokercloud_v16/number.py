@@ -2,7 +2,10 @@ import logging
 from homeassistant.components.number import NumberEntity, NumberMode
 from homeassistant.helpers.restore_state import RestoreEntity
 from .entity import StokerEntity
+from homeassistant.const import UnitOfTemperature
 from .const import DOMAIN, SIMPLE_NUMBERS_CONFIG
+from .capabilities import async_add_when_present
+from .zones import ALL_ZONES
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -13,9 +16,24 @@ async def async_setup_entry(hass, config_entry, async_add_entities):
 
     # 1. Generowanie standardowych suwaków z konfiguracji
     entities = [StokerGenericNumber(coordinator, username, *cfg) for cfg in SIMPLE_NUMBERS_CONFIG]
-    
+
     async_add_entities(entities)
 
+    # 2. Temperatury zadane wykrytych stref bez stałego suwaka (strefy 3-4), także wykrytych później
+    static_ids = {f"number.nbe_{cfg[0]}" for cfg in SIMPLE_NUMBERS_CONFIG}
+
+    def zone_target(zone):
+        sid = zone.target_entity.split(".", 1)[1].removeprefix("nbe_")
+        return [StokerGenericNumber(
+            coordinator, username, sid, f"Temperatura zadana - {zone.name}", 5, 28, 0.5,
+            UnitOfTemperature.CELSIUS, "mdi:thermometer-lines", zone.default_target, "auto",
+        )]
+
+    async_add_when_present(config_entry, coordinator, async_add_entities, [
+        (lambda data, z=zone: z in coordinator.zones, lambda z=zone: zone_target(z))
+        for zone in ALL_ZONES if zone.target_entity not in static_ids
+    ])
+
 class StokerBaseNumber(StokerEntity, NumberEntity, RestoreEntity):
     """Wspólna logika dla suwaków integracji StokerCloud."""
     
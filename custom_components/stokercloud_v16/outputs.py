@@ -0,0 +1,123 @@
+"""Indeks schematu wyjść sterownika (leftoutput/rightoutput) i wspólne akcesory wartości."""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Callable
+
+from .const import OUTPUT_OVERRIDES, OUTPUT_SIDES
+
+# Typy wyjść
+ONOFF = "onoff"
+PERCENT = "percent"
+KG = "kg"
+NUMBER = "number"
+TEXT = "text"
+
+KIND_UNITS = {PERCENT: "%", KG: "kg"}
+KIND_ICONS = {ONOFF: "mdi:electric-switch", PERCENT: "mdi:gauge", KG: "mdi:weight-kilogram"}
+
+
+def _to_float(raw) -> float | None:
+    try:
+        return float(str(raw).replace("%", "").replace("kg", "").replace(",", ".").strip())
+    except (ValueError, TypeError):
+        return None
+
+
+def classify(item: dict) -> str:
+    """Typ wyjścia z pierwszej obserwowanej wartości (i jednostki, jeśli API ją podaje)."""
+    raw = str(item.get("val", "")).strip()
+    unit = str(item.get("unit") or "").strip().lower()
+    if raw.upper() in ("ON", "OFF"):
+        return ONOFF
+    if unit == "%" or raw.endswith("%"):
+        return PERCENT
+    if unit == "kg" or raw.lower().endswith("kg"):
+        return KG
+    return NUMBER if _to_float(raw) is not None else TEXT
+
+
+def _compile_reader(side: str, output_id: str, kind: str) -> Callable[[dict], object]:
+    """Akcesor wartości wyjścia kompilowany raz na wpis indeksu."""
+    def raw(data: dict):
+        item = (data.get(side) or {}).get(output_id)
+        return item.get("val") if isinstance(item, dict) else None
+
+    if kind == ONOFF:
+        return lambda data: str(raw(data)).upper() == "ON"
+    if kind == TEXT:
+        return lambda data: str(raw(data) or "").replace("%", "").strip()
+    return lambda data: _to_float(raw(data))
+
+
+@dataclass(frozen=True)
+class OutputSpec:
+    """Wpis indeksu: jedno wyjście z typem, jednostką i akcesorem wartości."""
+
+    side: str
+    output_id: str
+    kind: str
+    name: str
+    icon: str
+    slug: str
+    read: Callable[[dict], object] = field(compare=False, repr=False)
+
+    @property
+    def unit(self) -> str | None:
+        return KIND_UNITS.get(self.kind)
+
+    @property
+    def is_binary(self) -> bool:
+        return self.kind == ONOFF
+
+    def item(self, data: dict) -> dict:
+        item = (data.get(self.side) or {}).get(self.output_id)
+        return item if isinstance(item, dict) else {}
+
+
+class OutputSchema:
+    """Indeks wyjść budowany z payloadu; nowe wyjścia są dopisywane, znane nie zmieniają typu.
+
+    Typ znanego wyjścia jest stały (zmiana typu zmieniłaby platformę encji), a
+    pełne przejście po sekcjach odbywa się tylko przy zmianie zbioru kluczy.
+    """
+
+    def __init__(self) -> None:
+        self.specs: dict[tuple[str, str], OutputSpec] = {}
+        self._seen: dict[str, frozenset] = {}
+
+    def update(self, data: dict | None) -> list[OutputSpec]:
+        """Zaindeksuj wyjścia z migawki; zwraca nowo dodane wpisy."""
+        added = []
+        for side in OUTPUT_SIDES:
+            section = (data or {}).get(side)
+            if not isinstance(section, dict):
+                continue
+            keys = frozenset(section)
+            if self._seen.get(side) == keys:
+                continue
+            self._seen[side] = keys
+            for output_id, item in section.items():
+                if (side, output_id) in self.specs or not isinstance(item, dict):
+                    continue
+                spec = self._build(side, output_id, item)
+                self.specs[(side, output_id)] = spec
+                added.append(spec)
+        return added
+
+    @staticmethod
+    def _build(side: str, output_id: str, item: dict) -> OutputSpec:
+        override = OUTPUT_OVERRIDES.get(output_id) if side == "leftoutput" else None
+        safe_id = output_id.lower().replace("-", "_")
+        if override:
+            name, icon, slug, kind = override
+        else:
+            kind = classify(item)
+            name = str(item.get("name") or output_id)
+            icon = KIND_ICONS.get(kind, "mdi:numeric")
+            slug = None
+        if slug is None:
+            slug = f"output_{safe_id}" if side == "leftoutput" else f"right_output_{safe_id}"
+        return OutputSpec(side, output_id, kind, name, icon, slug, _compile_reader(side, output_id, kind))
+
+    def of_kind(self, binary: bool) -> list[OutputSpec]:
+        return [spec for spec in self.specs.values() if spec.is_binary == binary]
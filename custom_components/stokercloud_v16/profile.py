@@ -0,0 +1,115 @@
+"""Wyuczony profil zużycia dzień tygodnia x godzina (opcjonalnie w przedziałach temperatury)."""
+from __future__ import annotations
+import base64
+from datetime import datetime
+
+import numpy as np
+
+
+def _encode(array: np.ndarray) -> str:
+    return base64.b64encode(array.astype("<f4").tobytes()).decode("ascii")
+
+
+def _decode(text: str, shape: tuple) -> np.ndarray | None:
+    try:
+        raw = np.frombuffer(base64.b64decode(text), dtype="<f4")
+    except (ValueError, TypeError):
+        return None
+    if raw.size != int(np.prod(shape)):
+        return None
+    return raw.astype(float).reshape(shape)
+
+
+class WeekHourProfile:
+    """Średnia kg/h w komórkach [przedział temp. + "wszystkie", 7, 24] z zanikiem wykładniczym.
+
+    Każda zamknięta godzina aktualizuje komórkę swojego przedziału temperatury
+    i warstwę wspólną (ostatnią). Waga komórki maleje o `decay` przy każdej
+    obserwacji, więc stare tygodnie wygasają z okresem półtrwania `half_life`
+    obserwacji tej komórki. Komórki o wadze poniżej `min_weight` są nieznane.
+    """
+
+    def __init__(self, temp_bins=(), half_life: float = 6.0, min_weight: float = 2.0) -> None:
+        self.temp_bins = tuple(float(b) for b in temp_bins)
+        self.decay = 0.5 ** (1.0 / max(1.0, half_life))
+        self.min_weight = min_weight
+        shape = (len(self.temp_bins) + 2, 7, 24)
+        self.mean = np.zeros(shape)
+        self.weight = np.zeros(shape)
+        self.updates = 0
+
+    @property
+    def _all(self) -> int:
+        return self.mean.shape[0] - 1
+
+    def _bin(self, temp: float | None) -> int | None:
+        if temp is None:
+            return None
+        return int(np.searchsorted(self.temp_bins, temp, side="right"))
+
+    def update(self, start: datetime, kg: float, temp: float | None = None) -> None:
+        """Zamknięta godzina (czas lokalny początku) i jej zużycie."""
+        day, hour = start.weekday(), start.hour
+        for layer in (self._bin(temp), self._all):
+            if layer is None:
+                continue
+            w = self.weight[layer, day, hour] * self.decay + 1.0
+            self.mean[layer, day, hour] += (kg - self.mean[layer, day, hour]) / w
+            self.weight[layer, day, hour] = w
+        self.updates += 1
+
+    def lookup(self, days, hours, temps=None) -> np.ndarray:
+        """Wektorowy odczyt kg/h dla tablic dni tygodnia i godzin (NaN = komórka nieznana).
+
+        Przy temperaturze używany jest jej przedział, a gdy ten jest nieznany - warstwa wspólna.
+        """
+        days = np.asarray(days, dtype=int)
+        hours = np.asarray(hours, dtype=int)
+        common = np.where(
+            self.weight[self._all, days, hours] >= self.min_weight, self.mean[self._all, days, hours], np.nan
+        )
+        if temps is None:
+            return common
+        layers = np.searchsorted(self.temp_bins, np.asarray(temps, dtype=float), side="right")
+        known = self.weight[layers, days, hours] >= self.min_weight
+        return np.where(known, self.mean[layers, days, hours], common)
+
+    def horizon(self, start: datetime, hours: int) -> np.ndarray:
+        """kg/h na `hours` kolejnych godzin od `start` (czas lokalny), warstwa wspólna."""
+        first = start.replace(minute=0, second=0, microsecond=0)
+        steps = np.arange(hours)
+        base = first.weekday() * 24 + first.hour
+        slots = (base + steps) % 168
+        return self.lookup(slots // 24, slots % 24)
+
+    def day_shape(self, weekday: int, temp: float | None = None) -> np.ndarray | None:
+        """Kształt doby (24 wagi o średniej 1) albo None, gdy doba nie jest w pełni poznana."""
+        values = self.lookup(np.full(24, weekday), np.arange(24), None if temp is None else np.full(24, temp))
+        if np.isnan(values).any() or values.mean() <= 0:
+            return None
+        return values / values.mean()
+
+    @property
+    def coverage(self) -> float:
+        """Udział poznanych komórek warstwy wspólnej."""
+        return float((self.weight[self._all] >= self.min_weight).mean())
+
+    def as_dict(self) -> dict:
+        return {
+            "bins": list(self.temp_bins),
+            "mean": _encode(self.mean),
+            "weight": _encode(self.weight),
+            "updates": self.updates,
+        }
+
+    def load_dict(self, data: dict | None) -> None:
+        if not isinstance(data, dict) or tuple(data.get("bins") or ()) != self.temp_bins:
+            # Zmiana przedziałów temperatury - profil uczony od nowa
+            return
+        mean = _decode(data.get("mean", ""), self.mean.shape)
+        weight = _decode(data.get("weight", ""), self.weight.shape)
+        if mean is None or weight is None:
+            return
+        self.mean, self.weight = mean, weight
+        self.updates = int(data.get("updates", 0))
+
@@ -0,0 +1,82 @@
+"""Przekazanie wyniku walidacji z kreatora konfiguracji do pierwszego cyklu koordynatora."""
+from __future__ import annotations
+import hashlib
+import hmac
+import logging
+import time
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .const import DOMAIN, SEED_MAX_AGE_S
+
+_LOGGER = logging.getLogger(__name__)
+
+# Osobny klucz - hass.data[DOMAIN] zawiera wyłącznie koordynatory wpisów
+SEED_KEY = f"{DOMAIN}_seed"
+
+
+async def async_validate(client) -> dict | None:
+    """Sprawdzenie logowania: lekka próba, jeśli klient ją udostępnia, inaczej pełne pobranie.
+
+    Zwraca payload pełnego pobrania (do ponownego użycia) albo None.
+    Błędy logowania/połączenia przechodzą do wywołującego.
+    """
+    probe = getattr(client, "login", None)
+    if callable(probe):
+        await probe()
+        return None
+    data = await client.fetch_data()
+    if not data or not isinstance(data, dict):
+        raise ValueError("Pusty lub błędny format danych z API")
+    return data
+
+
+def _digest(password: str) -> bytes:
+    return hashlib.sha256(password.encode()).digest()
+
+
+def _drop(hass: HomeAssistant, key: str, seed: dict | None = None) -> dict | None:
+    """Usuń wpis (tylko wskazany, jeśli podany) i pusty słownik; anuluje timer wygaśnięcia."""
+    seeds = hass.data.get(SEED_KEY, {})
+    if key not in seeds or (seed is not None and seeds[key] is not seed):
+        return None
+    seed = seeds.pop(key)
+    if not seeds:
+        hass.data.pop(SEED_KEY, None)
+    seed["cancel"]()
+    return seed
+
+
+def stash_seed(hass: HomeAssistant, username: str, password: str, client, data: dict | None) -> None:
+    """Zachowaj zalogowanego klienta i payload walidacji dla wpisu tworzonego przez kreator.
+
+    Hasło nie jest przechowywane (tylko skrót do porównania). Wpis znika po
+    SEED_MAX_AGE_S, także gdy kreator przerwano lub wpis nigdy się nie uruchomił.
+    """
+    key = username.lower()
+    _drop(hass, key)
+    seed = {"digest": _digest(password), "client": client, "data": data, "ts": time.monotonic()}
+
+    @callback
+    def _expire(_now) -> None:
+        seed["cancel"] = lambda: None
+        if _drop(hass, key, seed) is not None:
+            _LOGGER.debug("Dane z kreatora dla %s wygasły nieużyte", key)
+
+    seed["cancel"] = async_call_later(hass, SEED_MAX_AGE_S, _expire)
+    hass.data.setdefault(SEED_KEY, {})[key] = seed
+
+
+def pop_seed(hass: HomeAssistant, username: str, password: str) -> tuple[object | None, dict | None]:
+    """(klient, payload) z kreatora, jeśli świeże i dla tych samych danych logowania.
+
+    Wpis jest zużywany jednorazowo - restart HA zawsze zaczyna od pełnego pobrania.
+    """
+    seed = _drop(hass, username.lower())
+    if seed is None or not hmac.compare_digest(seed["digest"], _digest(password)):
+        return None, None
+    if time.monotonic() - seed["ts"] > SEED_MAX_AGE_S:
+        _LOGGER.debug("Dane z kreatora zbyt stare - pełne pobranie")
+        return None, None
+    return seed["client"], seed["data"]
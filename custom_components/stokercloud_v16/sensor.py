@@ -2,7 +2,27 @@ from __future__ import annotations
 import logging
 import time
 from datetime import datetime, timedelta
+import numpy as np
+
 from .entity import StokerEntity
+from .zones import ALL_ZONES, ZONES_BY_KEY
+from .capabilities import async_add_outputs, async_add_when_present, has_menu
+from .dhw import START, END, KG, TEMP_BEFORE, TEMP_AFTER
+from .logs import rate_limited
+from .core import (
+    DHW_STANDBY_KG_H,
+    DayForecastInputs,
+    DhwState,
+    day_forecast,
+    dhw_reheat_kg,
+    parse_float,
+    range_estimate,
+    schedule_flags,
+    split_rate,
+    static_demand_kg,
+    zone_schedule,
+)
+from .forecast import ForecastInputs, parse_weather_forecast
 from homeassistant.util import dt as dt_util
 from homeassistant.components.sensor import (
     SensorEntity,
@@ -17,27 +37,21 @@ from homeassistant.const import (
     EntityCategory,
 )
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
-from homeassistant.helpers.event import async_track_state_change_event
+from homeassistant.helpers.event import async_track_state_change_event, async_track_time_interval
 from homeassistant.helpers.restore_state import RestoreEntity
 from homeassistant.components.sensor import ENTITY_ID_FORMAT                                                                        
 from .const import (
     DOMAIN,
-    ENTITY_SWITCH_OFFICE,
-    ENTITY_TARGET_HOUSE_TEMP,
-    ENTITY_TARGET_OFFICE_TEMP,
-    ENTITY_OFFICE_TIME_SHIFT,
     ENTITY_PELLET_PRICE,
-    ENTITY_PUMP_HOUSE,
-    ENTITY_PUMP_OFFICE,
-    ENTITY_WIND_FACTOR,
     ENTITY_BOILER_STATUS,
-    ENTITY_HOUSE_CONSUMPTION_DAILY,
-    ENTITY_OFFICE_CONSUMPTION_DAILY,
+    ENTITY_ZONE_CONSUMPTION_DAILY,
     ENTITY_DHW_TANK_VOLUME,
     ENTITY_INSULATION_FACTOR_HOUSE,
+    ENTITY_WEATHER_FORECAST,
+    FORECAST_HORIZON_HOURS,
+    FORECAST_REFRESH_MINUTES,
+    RANGE_HORIZON_DAYS,
     SENSOR_HOUSE_EFFICIENCY,
-    SENSOR_OFFICE_EFFICIENCY,
-    SENSOR_FORECAST_TOTAL_WEIGHT,
     SENSOR_DHW_TEMPERATURE,
     BOILER_EFFICIENCY_DHW,
     SPECIFIC_HEAT_WATER_KWH,
@@ -45,15 +59,19 @@ from .const import (
     STOKER_STATES,
     STOKER_INFO,
     SENSOR_MAP,
-    STOKER_OUTPUTS_CONFIG,
     STOKER_SETTINGS_MENU_CONFIG
 )
 
 _LOGGER = logging.getLogger(__name__)
+# Gorące ścieżki błędów (co cykl / przy każdym odczycie stanu)
+_RLOG = rate_limited(_LOGGER)
 
 # --- BASE SENSOR ---
 class StokerSensor(StokerEntity, SensorEntity):
     """Jeden sensor, by wszystkimi rządzić. Obsługuje ścieżki, jednostki i atrybuty."""
+
+    # Surowy odczyt z payloadu - wartość sprzed przerwy podana jako bieżąca wprowadzałaby w błąd
+    _stale_tolerant = False
     
     def __init__(self, coordinator, username, name, uid, path, unit=None, dev_class=None, state_class=None, icon=None, attrs=None):
         super().__init__(coordinator, username)
@@ -104,12 +122,18 @@ class StokerSensor(StokerEntity, SensorEntity):
         for k, p in self._attrs_map.items():
             attr_val = self._resolve_path(p)
             res[k] = attr_val
+        if self._attr_unique_id.endswith("boiler_info"):
+            # Wszystkie aktywne komunikaty (stan pokazuje tylko pierwszy) z dziennika zdarzeń
+            res["active_messages"] = [
+                self.coordinator.event_message(row[0], row[1])
+                for row in self.coordinator.events.query("info", active_only=True)
+            ]
         return res
 
 
 # --- DHW EFFICIENCY SENSOR ---
 class StokerDHWEfficiencySensor(StokerEntity, SensorEntity):
-    """Sensor monitorujący wydajność i czas grzania CWU (Ciepłej Wody Użytkowej)."""
+    """Sensor monitorujący wydajność i czas grzania CWU (dziennik cykli koordynatora)."""
 
     def __init__(self, coordinator, username):
         """Inicjalizacja sensora procesowego CWU."""
@@ -119,279 +143,163 @@ class StokerDHWEfficiencySensor(StokerEntity, SensorEntity):
         self._attr_name = "Ostatni czas grzania CWU"
         self._attr_unique_id = f"nbe_{username}_dhw_heat_time"
         self._attr_icon = "mdi:timer-outline"
-        
-        # Stan wewnętrzny do obliczeń
-        self._start_time: datetime | None = None
-        self._start_pellet: float = 0.0
-        self._last_duration_min: float = 0.0
-        self._last_pellet_used: float = 0.0
-        self._is_heating: bool = False
 
-    def _handle_coordinator_update(self) -> None:
-        """Logika wykrywania cyklu grzania przy aktualizacji danych."""
-        # Pobieramy status wyjścia (pompy/zaworu CWU)
-        # Wykorzystujemy bazowe _get_api_data dla bezpieczeństwa
-        status_val = self._get_api_data("leftoutput.output-1.val")
-        is_on = str(status_val).upper() == "ON"
-        
-        # Pobieramy licznik pelletu
-        try:
-            current_total = float(str(self._get_api_data("hopperdata.4") or 0).replace(",", "."))
-        except (ValueError, TypeError):
-            current_total = 0.0
-                                                                                                 
-        # Wykrycie początku grzania
-        if is_on and not self._is_heating:
-            self._start_time = datetime.now()
-            self._start_pellet = current_total
-            self._is_heating = True
-        
-        # Wykrycie końca grzania
-        elif not is_on and self._is_heating:
-            if self._start_time:
-                duration = (datetime.now() - self._start_time).total_seconds() / 60
-                self._last_duration_min = round(duration, 1)
-                self._last_pellet_used = max(0.0, round(current_total - self._start_pellet, 2))
-            self._is_heating = False
-            self._start_time = None
-
-        # Powiadomienie HA o zmianie stanu
-        self.async_write_ha_state()
+    @property
+    def _journal(self):
+        return self.coordinator.dhw
 
     @property
     def native_value(self) -> str:
         """Zwraca czas w formacie HH:MM (aktualny lub ostatni zakończony)."""
+        active = self._journal.active
+        last = self._journal.last_cycle
         total_min = 0
-        if self._is_heating and self._start_time:
-            total_min = int((datetime.now() - self._start_time).total_seconds() / 60)
-        else:
-            total_min = int(self._last_duration_min)
+        if active:
+            total_min = int((time.time() - active["start"]) / 60)
+        elif last:
+            total_min = int((last[END] - last[START]) / 60)
 
         h, m = divmod(max(0, total_min), 60)
         return f"{h:02}:{m:02}"
 
     @property
     def extra_state_attributes(self):
-        """Dodatkowe informacje o sesji grzania."""
-        return {
-            "heating_status": "ON" if self._is_heating else "OFF",
-            "last_cycle_consumption_kg": self._last_pellet_used,
-            "current_session_start": self._start_time.isoformat() if self._start_time else None,
-            "unit": "minut"
+        """Dodatkowe informacje o sesji grzania i statystyki kroczące cykli."""
+        active = self._journal.active
+        last = self._journal.last_cycle
+        attrs = {
+            "heating_status": "ON" if active else "OFF",
+            "last_cycle_consumption_kg": last[KG] if last else 0.0,
+            "current_session_start": datetime.fromtimestamp(active["start"]).isoformat() if active else None,
+            "unit": "minut",
         }
+        if last:
+            attrs["last_cycle_start"] = datetime.fromtimestamp(last[START]).isoformat()
+            attrs["last_cycle_end"] = datetime.fromtimestamp(last[END]).isoformat()
+            attrs["last_cycle_temp_before"] = last[TEMP_BEFORE]
+            attrs["last_cycle_temp_after"] = last[TEMP_AFTER]
+        attrs.update(self._journal.summary())
+        return attrs
 
 
-# --- HOUSE & OFFICE EFFICIENCY SENSOR ---
+# --- ZONE EFFICIENCY SENSOR ---
 class StokerEfficiencySensor(StokerEntity, SensorEntity, RestoreEntity):
-    def __init__(self, coordinator, username, name, uid, consumption_sid, target_temp_sid, attr_name=None, use_wind=False, *args, **kwargs):
+    """Indeks efektywności strefy wyliczany przez wspólny estymator RLS koordynatora."""
+
+    def __init__(self, coordinator, username, zone, use_wind=False):
         super().__init__(coordinator, username)
+        uid = zone.key
         self.entity_id = f"sensor.nbe_{uid}_efficiency"
-        self._attr_name = f"{name} - Indeks efektywności"
+        self._attr_name = f"{zone.name} - Indeks efektywności"
         self._attr_unique_id = f"nbe_{username}_{uid}_efficiency"
         self._attr_native_unit_of_measurement = "kg/°C/24h"
         self._attr_state_class = SensorStateClass.MEASUREMENT
         self._attr_icon = "mdi:chart-bell-curve-cumulative"
         
         self._uid = uid 
-        self._consumption_sid = consumption_sid 
-        self._target_temp_sid = target_temp_sid 
-        self._attr_name_source = attr_name                
+        self._zone = zone
         self._use_wind = use_wind
-        
-        self._last_consumption_val = None
-        self._last_calc_time = None
-        self._current_efficiency = 0.8  
-        self._office_start_timestamp = None
-        self._office_last_pump_on_time = None 
-
-        self._alpha = 0.05
-        self._instant_kg_per_hour = 0.0
-        self._diag_house_share = 0.0
-        self._diag_office_share = 0.0
-        self._debug_pump_state = "off"
-        self._dynamic_limit_cache = 20.0
+
+
+        self._wind_speed = 0.0
+        self._diag_shares = {}
+
+    @property
+    def _learner(self):
+        return self.coordinator.learner
+
+    @property
+    def _warmup(self):
+        """Rozruch strefy liczony w koordynatorze (None dla stref bez przełącznika)."""
+        return self.coordinator.warmups.get(self._uid)
 
     async def async_added_to_hass(self):
         await super().async_added_to_hass()
+        warmup = self._warmup
+        if warmup is None or warmup.start_ts:
+            return
         last_state = await self.async_get_last_state()
         if last_state:
-            if last_state.state not in ["unknown", "unavailable"]:
-                try: self._current_efficiency = float(last_state.state)
-                except ValueError: pass
             old_ts = last_state.attributes.get("office_start_ts")
-            if old_ts: self._office_start_timestamp = float(old_ts)
+            if old_ts: warmup.start_ts = float(old_ts)
 
     @property
     def native_value(self):
-        return round(self._current_efficiency, 3)
+        return round(self._learner.zone_index(self._uid, self._wind_speed if self._use_wind else 0.0), 3)
 
     @property
     def extra_state_attributes(self):
-        now = time.time()
-        pump_on = (self._debug_pump_state == "on")
-        elapsed_min = (now - self._office_start_timestamp) / 60 if self._office_start_timestamp else 0
-        time_left = max(0, self._dynamic_limit_cache - elapsed_min) if pump_on and elapsed_min < self._dynamic_limit_cache else 0
+        attrs = {
+            "burn_rate_total_kg_h": round(self._learner.last_rate_kg_h, 3),
+            "assigned_to_zone_kg_h": round(self._diag_shares.get(self._uid, 0.0), 3),
+            "assigned_kg_h": {k: round(v, 3) for k, v in self._diag_shares.items()},
+            "model_coefficients": {k: round(v, 4) for k, v in self._learner.coefficients.items()},
+            "model_samples": len(self._learner.samples),
+            "model_rms_error": round(self._learner.rms_error, 3),
+            "learning_paused": self.coordinator.warming_up,
+        }
+        warmup = self._warmup
+        if warmup is None:
+            return attrs
 
-        return {
-            "burn_rate_total_kg_h": round(self._instant_kg_per_hour, 3),
-            "assigned_to_house_kg_h": round(self._diag_house_share, 3),
-            "assigned_to_office_kg_h": round(self._diag_office_share, 3),
+        now = time.time()
+        snapshot = self.coordinator.snapshot
+        pump_on = bool(snapshot and snapshot.states.get(self._uid))
+        limit = self.coordinator.warmup_limits.get(self._uid, 0.0)
+        start_ts = warmup.start_ts
+        elapsed_min = warmup.elapsed_min(now)
+        time_left = max(0, limit - elapsed_min) if pump_on and elapsed_min < limit else 0
+        attrs.update({
             "office_heating_active": pump_on,
-            "time_shift_active": pump_on and (0 < elapsed_min < 20),
+            "time_shift_active": self.coordinator.warming.get(self._uid, False),
             "time_shift_elapsed_min": round(elapsed_min, 1) if pump_on else 0,
-            "time_shift_limit_min": round(self._dynamic_limit_cache, 1),
+            "time_shift_limit_min": round(limit, 1),
             "time_shift_remaining_min": round(time_left, 1),
-            "office_start_time": datetime.fromtimestamp(self._office_start_timestamp).strftime('%d-%m-%Y %H:%M:%S') if self._office_start_timestamp else "Nieaktywne"
-        }
+            "office_start_ts": start_ts,
+            "office_start_time": datetime.fromtimestamp(start_ts).strftime('%d-%m-%Y %H:%M:%S') if start_ts else "Nieaktywne"
+        })
+        return attrs
 
     def _handle_coordinator_update(self) -> None:
+        # Ostatnia migawka w przerwie chmury (stale) to nie nowa próbka - model czeka na świeże dane
+        if self._tick_delta() is None:
+            return
         try:
             now = time.time()
-            
-            # 1. POMPY I CZAS
-            sw_biuro = self.hass.states.get(ENTITY_SWITCH_OFFICE)
-            pump_biuro = self.hass.states.get(ENTITY_PUMP_OFFICE)
-            switch_is_on = (sw_biuro.state != "off") if sw_biuro else True
-            pump_is_on = (pump_biuro and pump_biuro.state == "on")
-            self._debug_pump_state = "on" if pump_is_on else "off"
-
-            if switch_is_on and pump_is_on:
-                self._office_last_pump_on_time = now
-                if not self._office_start_timestamp: self._office_start_timestamp = now
-            elif not switch_is_on:
-                self._office_start_timestamp = None
-            elif not pump_is_on and self._office_start_timestamp:
-                if self._office_last_pump_on_time and (now - self._office_last_pump_on_time) > 600:
-                    self._office_start_timestamp = None
-
-            # 2. POGODA I PROGNOZY (Zawsze aktualne)
-            t_state = self.hass.states.get(self._target_temp_sid)
-            temp_target = float(t_state.state) if t_state and t_state.state not in ["unknown", "unavailable"] else 22.0
+
+            # 1. POGODA I PARAMETRY
             wd = (self.coordinator.data or {}).get("weatherdata", {})
-            try:
-                temp_ext = float(str(wd.get("1", 0)).replace(",", "."))
-            except:
-                temp_ext = 0.0
-           
-            shift_entity = self.hass.states.get(ENTITY_OFFICE_TIME_SHIFT)                                                       
-            base_shift = float(shift_entity.state) if shift_entity and shift_entity.state not in ["unknown", "unavailable"] else 10.0
-            temp_adjustment = max(0, (10.0 - temp_ext) / 5.0) * 4.0                                                             
-            self._dynamic_limit_cache = base_shift + temp_adjustment                                                                  
- 
-            delta_t = max(1.0, temp_target - temp_ext)
-            effective_delta = delta_t
-            if self._use_wind:
-                try:
-                    wind_speed = float(str(wd.get("2", 0)).replace(",", "."))
-                    wind_factor_state = self.hass.states.get(ENTITY_WIND_FACTOR)
-                    wind_factor = (float(wf_state.state) / 100.0) if wind_factor_state else 0.05
-                    effective_delta = delta_t * (1 + (wind_speed * wind_factor))
-                except: pass
-
-            # Indeksy do podziału proporcjonalnego
-            house_eff_sensor = self.hass.states.get(SENSOR_HOUSE_EFFICIENCY)
-            idx_house = float(house_eff_sensor.state) if house_eff_sensor and house_eff_sensor.state not in ["unknown", "unavailable"] else 0.62
-            
-            # PROGNOZOWANE zapotrzebowanie (ile strefa "chciałaby" spalić)
-            pred_house = (idx_house * effective_delta) / 24.0
-            pred_office = (self._current_efficiency * effective_delta) / 24.0
-
-            # 3. SPALANIE (Blokada 5 min)
-            state_obj = self.hass.states.get(self._consumption_sid)
-            if not state_obj or state_obj.state in ["unknown", "unavailable"]: return
-
-            try: current_kg = float(state_obj.attributes.get(self._attr_name_source, 0)) if self._attr_name_source else float(state_obj.state)
-            except: return
-
-            if self._last_consumption_val is None or current_kg < self._last_consumption_val:
-                self._last_consumption_val = current_kg
-                self._last_calc_time = now
-                return
-
-            time_diff_sec = now - self._last_calc_time
-            if time_diff_sec < 300:
-                # W czasie oczekiwania pokazujemy prognozę w atrybutach
-                self._diag_house_share = pred_house
-                self._diag_office_share = pred_office
-                self.async_write_ha_state()
-                return
-
-            delta_kg = current_kg - self._last_consumption_val
-            self._instant_kg_per_hour = delta_kg / (time_diff_sec / 3600.0) if delta_kg > 0.005 else 0.0
-
-            # 4.ZAMROŻENIE INDEKSU PODCZAS CWU (Przywrócone) ---
+            temp_ext = parse_float(wd.get("1", 0))
+            self._wind_speed = max(0.0, parse_float(wd.get("2", 0)))
+
+            deltas = self.coordinator.zone_deltas(temp_ext)
+
+            # 2. STAN STREF (regresory modelu)
             boiler_status = self.hass.states.get(ENTITY_BOILER_STATUS)
-            if boiler_status and boiler_status.state in ["CWU", "state_7"]:
-                self._last_consumption_val = current_kg
-                self._last_calc_time = now
-                self._diag_house_share = pred_house
-                self._diag_office_share = pred_office
-                self.async_write_ha_state()
-                return
-
-            # 5. INTELIGENTNY ROZDZIAŁ
-            is_office_active = (switch_is_on and pump_is_on)
-            elapsed = (now - self._office_start_timestamp) / 60 if self._office_start_timestamp else 0
-            is_office_reliable = is_office_active and elapsed >= self._dynamic_limit_cache
-            is_office_warming_up = is_office_active and elapsed < self._dynamic_limit_cache
-            
-            active_pred_office = pred_office if is_office_active else 0.0                             
-            total_pred = pred_house + active_pred_office   
-
-            new_instant_eff = self._current_efficiency
-            do_math_update = False
-
-            if self._uid == "house":                                                                  
-                if is_office_warming_up:                                                              
-                    # Biuro zabiera paliwo, ale nie ufamy jeszcze danym do nauki indeksu                                        
-                    self._diag_house_share = self._instant_kg_per_hour * (pred_house / total_pred)                              
-                    self._diag_office_share = self._instant_kg_per_hour * (active_pred_office / total_pred)
-                    do_math_update = False                                                                 
-                elif not is_office_active:                                                                 
-                    # Tylko dom grzeje - dom uczy si.. na 100% spalania                                    
-                    self._diag_house_share = self._instant_kg_per_hour                                     
-                    self._diag_office_share = 0.0                                                          
-                    new_instant_eff = (self._instant_kg_per_hour * 24.0) / effective_delta                 
-                    do_math_update = True                                                                  
-                else:                                                                                      
-                    # Obie strefy stabilne - dom uczy si.. na swojej cz....ci proporcjonalnej                                   
-                    share_ratio = pred_house / total_pred                                                  
-                    self._diag_house_share = self._instant_kg_per_hour * share_ratio                       
-                    self._diag_office_share = self._instant_kg_per_hour * (1 - share_ratio)                
-                    new_instant_eff = (self._diag_house_share * 24.0) / effective_delta                    
-                    do_math_update = True                                                                              
-
-            elif self._uid == "office":                                                                                         
-                if is_office_reliable:                                                                     
-                    # Biuro stabilne - uczy si.. na swojej cz....ci                                        
-                    share_ratio = active_pred_office / total_pred                                          
-                    office_kg_h = self._instant_kg_per_hour * share_ratio                                  
-                    self._diag_office_share = office_kg_h                                                  
-                    self._diag_house_share = self._instant_kg_per_hour - office_kg_h                       
-                    new_instant_eff = (office_kg_h * 24.0) / effective_delta                               
-                    do_math_update = True                                                                  
-                elif is_office_warming_up:                                                                                      
-                    # Biuro grzeje, ale faza przej..ciowa - brak nauki (do_math_update = False)                                 
-                    share_ratio = active_pred_office / total_pred                                          
-                    self._diag_office_share = self._instant_kg_per_hour * share_ratio                      
-                    self._diag_house_share = self._instant_kg_per_hour - self._diag_office_share           
-                    do_math_update = False                                                                 
-                else:                                                                                      
-                    # Biuro wy....czone - brak nauki, wszystko przypisane (diagnostycznie) do domu         
-                    self._diag_office_share = 0.0                                                          
-                    self._diag_house_share = self._instant_kg_per_hour                                     
-                    do_math_update = False                                                                 
-
-            # 6. FINALIZACJA
-            if do_math_update and 0.1 < new_instant_eff < 15.0:
-                self._current_efficiency = (self._current_efficiency * (1 - self._alpha)) + (new_instant_eff * self._alpha)
-            
-            self._last_consumption_val = current_kg
-            self._last_calc_time = now
+            is_cwu = bool(boiler_status and boiler_status.state in ["CWU", "state_7"])
+
+            # Udział czasu pracy pomp w oknie uczenia (dziennik przejść), nie stan chwilowy
+            pumps = self.coordinator.pumps
+            window_start = self._learner.last_ts or (now - self._learner.window_s)
+            fractions = {zone.key: pumps.fraction(zone.key, window_start, now) for zone in self.coordinator.zones}
+            # Wiatr zawsze rzeczywisty - model sam pomija go w strefach bez składnika wiatrowego,
+            # więc wektor nie zależy od tego, która encja strefy zasiliła okno
+            x = self._learner.regressors(deltas, fractions, self._wind_speed, 1.0 if is_cwu else 0.0)
+
+            # 3. SPALANIE -> krok RLS (nauka wstrzymana w fazie rozruchu strefy - stan koordynatora)
+            # Licznik z delt cyklu koordynatora: zerowania i skoki API już odfiltrowane
+            current_kg = self.coordinator.counters.get("pellet_total")
+            if current_kg is None: return
+
+            self._learner.feed(now, current_kg, x, learn=not self.coordinator.warming_up)
+
+            # 4. ROZDZIAŁ DIAGNOSTYCZNY wg udziału stref w predykcji
+            self._diag_shares = split_rate(self._learner.last_rate_kg_h, self._learner.zone_predictions(x))
+
             self.async_write_ha_state()
 
         except Exception as e:
-            _LOGGER.error("Błąd wydajności %s: %s", self._uid, e)
+            _RLOG.error(f"efficiency:{self._uid}", "Błąd wydajności %s: %s", self._uid, e)
  
 
 # --- EFFICENCY DEVIATION SENSOR ---
@@ -458,8 +366,7 @@ class StokerUnifiedForecastSensor(StokerEntity, SensorEntity):
         self._type = forecast_type    
         
         target_names = {
-            "house": "Dom", 
-            "office": "Biuro", 
+            **{zone.key: zone.name for zone in ALL_ZONES},
             "dhw": "CWU", 
             "total": "Suma"
         }
@@ -491,198 +398,87 @@ class StokerUnifiedForecastSensor(StokerEntity, SensorEntity):
                 except ValueError: return default
         return default
 
-    async def async_added_to_hass(self):
-        """Rejestracja nasłuchiwania na zmiany encji zewnętrznych."""
-        await super().async_added_to_hass()
-        
-        # Lista encji, których zmiana ma wymusić przeliczenie prognozy
-        tracked_entities = [
-            ENTITY_TARGET_HOUSE_TEMP,
-            ENTITY_TARGET_OFFICE_TEMP,
-            ENTITY_WIND_FACTOR,
-            ENTITY_PELLET_PRICE
-        ]
-        
-        existing_entities = [
-            e for e in tracked_entities if self.hass.states.get(e) is not None
-        ]
-
-        if existing_entities:
-            self.async_on_remove(
-                async_track_state_change_event(
-                    self.hass, existing_entities, self._update_manual
-                )
-            )
-
-    def _update_manual(self, event):
-        """Wymuszenie odświeżenia przy zmianie temperatury zadanej."""
-        self.async_write_ha_state()
- 
-    def _get_schedule_activity(self, zone_index):
-        
-        # Inicjalizacja zmiennych diagnostycznych
-        self._debug_enabled = False
-        self._debug_loaded = False
+    def _memo_inputs(self):
+        """Encje zewnętrzne, których zmiana wymusza przeliczenie prognozy."""
+        return [*forecast_input_entities(), ENTITY_DHW_TANK_VOLUME]
 
+    def _day_inputs(self, result: dict) -> DayForecastInputs:
+        """Adapter: stany HA i dane koordynatora -> wejścia prognozy dobowej rdzenia."""
+        data = self.coordinator.data or {}
         now = datetime.now()
-        current_hour = now.hour
-        weekday = now.weekday()
-        hours_left_today = max(0, 1440 - (now.hour * 60 + now.minute)) / 60.0
-
-        menu_key = "weather" if zone_index == 0 else f"weather{zone_index + 1}"
-        
-        menus = self.coordinator.data.get("menus", {})
-        zone_menu = menus.get(menu_key, {})
-
-        if not zone_menu:
-            return hours_left_today
-
-        timer_val = "0"
-        timings_dict = {}
-
-        for key, item in zone_menu.items():
-            if key.endswith(".enabletimer"):
-                timer_val = item.get("val", "0")
-            
-            elif key.endswith(".timings"):
-                timings_dict = item.get("val", {})
-
-        self._debug_enabled = str(timer_val) == "1"
-        self._debug_loaded = isinstance(timings_dict, dict) and len(timings_dict) > 0
-
-        if not self._debug_enabled or not self._debug_loaded:
-            return hours_left_today
-
-        all_keys = []
-        for char in "abcdefghij":
-            for num in range(20, 30):
-                all_keys.append(f"{char}{num}")
-
-        start_idx = zone_index * 24
-        zone_keys = all_keys[start_idx : start_idx + 24]
-        
-        remaining_units = 0.0
-        
-        for h in range(current_hour, 24):
-            if h >= len(zone_keys): break
-            
-            key = zone_keys[h]
-            val = timings_dict.get(key)
-            
-            if val is not None:
-                try:
-                    bits = (int(val) >> (weekday * 2)) & 3
-                    if bits == 0:
-                        remaining_units += 1.0
-                    elif bits == 2:
-                        remaining_units += 0.8
-                except (ValueError, TypeError):
-                    remaining_units += 1.0
-                    
-        return round(remaining_units, 2)
+        weather = data.get("weatherdata", {})
+        temp_ext = parse_float(weather.get("1", 0))
+        wind_speed = max(0.0, parse_float(weather.get("2", 0)))
+        menus = data.get("menus", {})
+        zones = self.coordinator.zones
+        enabled = tuple(zone_enabled(self.hass, zone) for zone in zones)
+
+        # Harmonogram: None = strefa pracuje do końca doby (wyłączony lub niewczytany)
+        schedules = []
+        for zone, on in zip(zones, enabled):
+            table = None
+            if on:
+                zone_menu = menus.get(zone.menu_key, {})
+                result["enabled"], result["loaded"], _ = schedule_flags(zone_menu)
+                if zone_menu and result["enabled"] and result["loaded"]:
+                    table = zone_schedule(zone_menu, zone.schedule_index)
+            schedules.append(table)
+
+        return DayForecastInputs(
+            now=now,
+            temp_ext=temp_ext,
+            zones=tuple(zone.key for zone in zones),
+            zone_index=tuple(self.coordinator.learner.zone_index(zone.key, wind_speed) for zone in zones),
+            targets=tuple(self._get_value_safely(zone.target_entity, zone.default_target) for zone in zones),
+            enabled=enabled,
+            consumed=tuple(
+                self._get_value_safely(ENTITY_ZONE_CONSUMPTION_DAILY.format(zone=zone.key), 0.0) for zone in zones
+            ),
+            schedules=tuple(schedules),
+            dhw=DhwState(
+                consumed_kg=float(data.get("stats", {}).get("dhw_day", 0.0)),
+                temp=float(data.get("dhwdata", {}).get("8", 40.0)),
+                target=float(data.get("frontdata", {}).get("dhwwanted", 50.0)),
+                hysteresis=float(data.get("dhwdata", {}).get("3", 5.0)),
+                volume_l=self._get_value_safely(ENTITY_DHW_TANK_VOLUME, 200.0),
+            ),
+            specific_heat_kwh=SPECIFIC_HEAT_WATER_KWH,
+            calorific_kwh=PELLET_CALORIFIC_KWH,
+            dhw_efficiency=BOILER_EFFICIENCY_DHW,
+            # Wyuczony kształt doby (None, dopóki profil tej doby nie jest poznany)
+            hour_shape=self.coordinator.profile.day_shape(now.weekday(), temp_ext),
+        )
 
     @property
     def native_value(self):
-        try:
-            # --- 1. CZAS I POGODA ---
-            now = datetime.now()
-            minutes_passed_today = now.hour * 60 + now.minute
-            hours_left_today = max(0, 1440 - minutes_passed_today) / 60.0
-            
-            weather_data = self.coordinator.data.get("weatherdata", {})
-            try: 
-                ext_temp = float(str(weather_data.get("1", 0)).replace(",", "."))
-            except (ValueError, TypeError): 
-                ext_temp = 0.0
-            
-            wind_factor = 1.0
-            try:
-                wind_speed = float(str(weather_data.get("2", 0)).replace(",", "."))
-                wf_state = self.hass.states.get(ENTITY_WIND_FACTOR)
-                w_val = (float(wf_state.state) / 100.0) if wf_state else 0.05
-                wind_factor = 1.0 + (wind_speed * w_val)
-            except: pass
- 
-            # --- 2. PARAMETRY I STAŁE ---
-            # Używamy stałych z const.py (efektywność spalania dla wody)
-            eff_energy_kg = PELLET_CALORIFIC_KWH * BOILER_EFFICIENCY_DHW
-
-            # --- 3. DOM (HOUSE) ---
-            target_house_temp = self._get_value_safely(ENTITY_TARGET_HOUSE_TEMP, 23.0)
-            delta_house_temp = max(0, (target_house_temp - ext_temp) * wind_factor   )
-            idx_house_eff = self._get_value_safely(SENSOR_HOUSE_EFFICIENCY, 0.8)
-            consumed_house = self._get_value_safely(ENTITY_HOUSE_CONSUMPTION_DAILY, 0.0)
-            self._house_units = self._get_schedule_activity(0)
-            forecast_house_total = consumed_house + (idx_house_eff * delta_house_temp / 24.0) * self._house_units 
-
-            # --- 4. BIURO (OFFICE) ---
-            sw_office = self.hass.states.get(ENTITY_SWITCH_OFFICE)
-            is_office_on = sw_office and sw_office.state == "on"
-            forecast_office_total = 0.0
-            
-            if is_office_on:
-                target_office_temp = self._get_value_safely(ENTITY_TARGET_OFFICE_TEMP, 10.0)
-                delta_office_temp = max(0, (target_office_temp - ext_temp) * wind_factor)
-                idx_office_eff = self._get_value_safely(SENSOR_OFFICE_EFFICIENCY, 1.2)
-                consumed_office = self._get_value_safely(ENTITY_OFFICE_CONSUMPTION_DAILY, 0.0)
-                self._office_units = self._get_schedule_activity(1)  
-                forecast_office_total = consumed_office + (idx_office_eff * delta_office_temp / 24.0) * self._office_units
-            else:
-                self._office_units = 0.0
-
-            # --- 5. CWU (DHW) ---
-            self._dhw_units = 0.0
-            data = self.coordinator.data or {}
-            
-            consumed_dhw = float(data.get("stats", {}).get("dhw_day", 0.0))
-            target_temp_dhw = float(data.get("frontdata", {}).get("dhwwanted", 50.0))
-            curr_temp_dhw = float(data.get("dhwdata", {}).get("8", 40.0))
-            hysteresis = float(data.get("dhwdata", {}).get("3", 5.0))
+        return self._memo("forecast", self._compute)["value"]
 
-            tank_vol = self._get_value_safely(ENTITY_DHW_TANK_VOLUME, 200.0)
-            
-            # Jeśli woda jest chłodniejsza niż zadana (histereza), liczmy koszt dogrzania
-            temp_gap_dhw = max(0, (target_temp_dhw - curr_temp_dhw)) 
-            
-            needed_dhw_now_kg = 0.0
+    def _compute(self) -> dict:
+        """Prognoza i dane diagnostyczne liczone raz na cykl (stan i atrybuty czytają wynik)."""
+        result = {"value": 0.0, "units": {}, "enabled": False, "loaded": False}
+        try:
+            forecast = day_forecast(self._day_inputs(result))
+            result["units"] = forecast.hours
+            res_kg = forecast.kg(self._target)
 
-            # Jeśli temperatura spadła poniżej (zadana - histereza), grzanie CWU
-            if curr_temp_dhw < (target_temp_dhw - hysteresis):
-                energy_now_kwh = tank_vol * temp_gap_dhw * SPECIFIC_HEAT_WATER_KWH
-                needed_dhw_now_kg = energy_now_kwh / eff_energy_kg
-            
-            # straty postojowe (58W bojlera + cyrkulacja okazjonalna)
-            # 0.014 (bojler) + 0.006 (dodatek na cyrkulację) = 0.02 kg/h
-            standby_loss_rate = 0.02  
-            standby_loss_kg = hours_left_today * standby_loss_rate
-            forecast_dhw_total = consumed_dhw + needed_dhw_now_kg + standby_loss_kg
-
-            # --- 6. AGREGACJA WYNIKU ---
-            self._total_units = 0.0
-
-            if self._target == "house":
-                res_kg = forecast_house_total
-            elif self._target == "office":
-                res_kg = forecast_office_total
-            elif self._target == "dhw":
-                res_kg = forecast_dhw_total
-            else: # "total"
-                res_kg = forecast_house_total + forecast_office_total + forecast_dhw_total
-
-            # --- 7. KONWERSJA NA WALUTĘ LUB KG ---
+            # Konwersja na walutę lub kg
             if self._type == "weight":
-                return round(res_kg, 2)
+                result["value"] = round(res_kg, 2)
             else:
                 price_ton = self._get_value_safely(ENTITY_PELLET_PRICE, 1250.0)
-                return round(res_kg * (price_ton / 1000.0), 2)
+                result["value"] = round(res_kg * (price_ton / 1000.0), 2)
 
         except Exception as e:
-            _LOGGER.error("Błąd prognozy Unified Forecast (%s): %s", self._target, e)
-            return 0.0
+            _RLOG.error(
+                "unified_forecast", "Błąd prognozy Unified Forecast: %s", e,
+                target=self._target, type=self._type,
+            )
+        return result
 
     @property
     def extra_state_attributes(self):
-        units = getattr(self, f"_{self._target}_units", 0.0)
+        result = self._memo("forecast", self._compute)
+        units = result["units"].get(self._target, 0.0)
         
         if self._target == "dhw" or self._target == "total":
             display_units = "N/A"
@@ -690,12 +486,158 @@ class StokerUnifiedForecastSensor(StokerEntity, SensorEntity):
             display_units = str(timedelta(hours=units))[:-3]
 
         return {
-            "schedule_enabled": getattr(self, "_debug_enabled", False),
-            "schedule_data_loaded": getattr(self, "_debug_loaded", False),
+            "schedule_enabled": result["enabled"],
+            "schedule_data_loaded": result["loaded"],
             "calculated_remaining_time": display_units
         }
 
 
+# --- HOURLY FORECAST SENSOR ---
+def zone_enabled(hass, zone) -> bool:
+    """Strefa uwzględniana w prognozach (przełącznik strefy, jeśli go ma)."""
+    if zone.switch_entity is None:
+        return True
+    switch = hass.states.get(zone.switch_entity)
+    return bool(switch and switch.state == "on")
+
+
+def forecast_input_entities() -> list[str]:
+    """Encje HA czytane przez build_forecast_inputs (temperatury zadane, przełączniki, cena)."""
+    return [
+        *(zone.target_entity for zone in ALL_ZONES),
+        *(zone.switch_entity for zone in ALL_ZONES if zone.switch_entity),
+        ENTITY_PELLET_PRICE,
+    ]
+
+
+def build_forecast_inputs(entity: StokerEntity) -> ForecastInputs | None:
+    """Wejścia prognozy godzinowej dla dowolnej encji integracji (None bez prognozy pogody)."""
+    hours, temps, winds = entity.coordinator.forecast.weather
+    if not hours:
+        return None
+    data = entity.coordinator.data or {}
+    menus = data.get("menus", {})
+    zones = entity.coordinator.zones
+    index, wind_coef = entity.coordinator.learner.zone_coefficients([zone.key for zone in zones])
+
+    # Bazowe zużycie CWU: dzisiejsze zużycie rozłożone na minione pełne godziny (min. 6 h).
+    # Bez minut i z kwantyzacją 0.01 kg/h wejście zmienia się najwyżej raz na godzinę
+    # (lub przy nowej wartości statystyki), więc cache profilu trafia między cyklami.
+    now = datetime.now()
+    try:
+        dhw_today = float(data.get("stats", {}).get("dhw_day", 0.0))
+    except (ValueError, TypeError):
+        dhw_today = 0.0
+    dhw_kg_h = max(DHW_STANDBY_KG_H, round(dhw_today / max(6, now.hour), 2))
+
+    return ForecastInputs(
+        hours=hours,
+        temperature=temps,
+        wind_speed=winds,
+        zones=tuple(zone.key for zone in zones),
+        zone_index=tuple(round(v, 4) for v in index),
+        zone_wind=tuple(round(v, 4) for v in wind_coef),
+        targets=tuple(entity._get_value_safely(zone.target_entity, zone.default_target) for zone in zones),
+        enabled=tuple(zone_enabled(entity.hass, zone) for zone in zones),
+        schedules=np.stack(
+            [zone_schedule(menus.get(zone.menu_key), zone.schedule_index) for zone in zones]
+        ).tobytes() if zones else b"",
+        price_per_kg=entity._get_value_safely(ENTITY_PELLET_PRICE, 1250.0) / 1000.0,
+        dhw_kg_h=dhw_kg_h,
+    )
+
+
+class StokerHourlyForecastSensor(StokerEntity, SensorEntity):
+    """
+    Prognoza godzinowa (24-72 h) na bazie prognozy encji `weather`.
+    Profil kg/koszt liczony wektorowo; przeliczenie tylko przy zmianie wejść.
+    """
+
+    # Profil godzinowy nie trafia do recordera
+    _unrecorded_attributes = frozenset({"forecast"})
+
+    def __init__(self, coordinator, username):
+        super().__init__(coordinator, username)
+        self._username = username
+        self.entity_id = "sensor.nbe_forecast_hourly_weight"
+        self._attr_name = "Prognoza godzinowa - 24h (KG)"
+        self._attr_unique_id = f"nbe_{username}_forecast_hourly_weight"
+        self._attr_native_unit_of_measurement = "kg"
+        self._attr_device_class = SensorDeviceClass.WEIGHT
+        self._attr_state_class = SensorStateClass.MEASUREMENT
+        self._attr_icon = "mdi:chart-timeline-variant"
+
+    async def async_added_to_hass(self):
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            async_track_time_interval(
+                self.hass, self._async_refresh_weather, timedelta(minutes=FORECAST_REFRESH_MINUTES)
+            )
+        )
+        self.async_on_remove(
+            async_track_state_change_event(self.hass, [ENTITY_WEATHER_FORECAST], self._async_refresh_weather)
+        )
+        self.hass.async_create_task(self._async_refresh_weather())
+
+    async def _async_refresh_weather(self, *_args) -> None:
+        """Pobierz prognozę godzinową z encji weather (weather.get_forecasts)."""
+        state = self.hass.states.get(ENTITY_WEATHER_FORECAST)
+        if state is None:
+            return
+        try:
+            response = await self.hass.services.async_call(
+                "weather", "get_forecasts",
+                {"entity_id": ENTITY_WEATHER_FORECAST, "type": "hourly"},
+                blocking=True, return_response=True,
+            )
+        except Exception as e:
+            _LOGGER.debug("Brak prognozy godzinowej z %s: %s", ENTITY_WEATHER_FORECAST, e)
+            return
+        items = (response or {}).get(ENTITY_WEATHER_FORECAST, {}).get("forecast")
+        hours, temps, winds = parse_weather_forecast(
+            items, state.attributes.get("wind_speed_unit"), FORECAST_HORIZON_HOURS
+        )
+        engine = self.coordinator.forecast
+        engine.weather = (tuple(dt_util.as_local(h) for h in hours), temps, winds)
+        engine.weather_updated = dt_util.now()
+        self.async_write_ha_state()
+
+    def _memo_inputs(self):
+        return forecast_input_entities()
+
+    def _profile(self):
+        return self._memo("profile", self._compute_profile, self.coordinator.forecast.weather_updated)
+
+    def _compute_profile(self):
+        inp = build_forecast_inputs(self)
+        if inp is None:
+            return None, None
+        return inp, self.coordinator.forecast.profile(inp)
+
+    @property
+    def native_value(self):
+        _, result = self._profile()
+        if result is None:
+            return None
+        return round(float(result["total"][:24].sum()), 2)
+
+    @property
+    def extra_state_attributes(self):
+        inp, result = self._profile()
+        if result is None:
+            return {"weather_entity": ENTITY_WEATHER_FORECAST, "forecast": []}
+        engine = self.coordinator.forecast
+        return {
+            "weather_entity": ENTITY_WEATHER_FORECAST,
+            "weather_updated": engine.weather_updated.isoformat() if engine.weather_updated else None,
+            "horizon_hours": len(inp.hours),
+            "cost_24h": round(float(result["cost"][:24].sum()), 2),
+            "total_kg_horizon": round(float(result["total"].sum()), 2),
+            "computations": engine.computations,
+            "forecast": engine.rows(inp),
+        }
+
+
 # --- FORECAST SENSOR ---
 class StokerForecastSensor(StokerEntity, SensorEntity):
     """
@@ -739,20 +681,13 @@ class StokerForecastSensor(StokerEntity, SensorEntity):
         self._force_index = force_index
         self._force_slider = force_slider
 
-    async def _update_manual_trigger(self, event):
-        """Wymusza odświeżenie po zmianie parametrów wejściowych (np. zmiana ceny)."""
-        self.async_write_ha_state()
-
-    async def async_added_to_hass(self):
-        """Nasłuchiwanie zmian w encjach sterujących prognozą."""
-        await super().async_added_to_hass()
-        
+    def _memo_inputs(self):
+        """Encje sterujące prognozą - jedna subskrypcja zmian stanu w klasie bazowej."""
         # Śledzimy cenę i temperaturę zadaną
         tracked_entities = [ENTITY_PELLET_PRICE, self._target_temp_sid]
         
         # Śledzimy suwak izolacji/wydajności
-        slider_entity = f"number.nbe_insulation_factor_{self._uid_for_slider}"
-        tracked_entities.append(slider_entity)
+        tracked_entities.append(f"number.nbe_insulation_factor_{self._uid_for_slider}")
         
         # Jeśli to prognoza realna (nie symulacja), śledzimy indeks wyliczony przez inny sensor
         if (self._force_index or not self._force_slider) and self._efficiency_sid:
@@ -764,12 +699,14 @@ class StokerForecastSensor(StokerEntity, SensorEntity):
                 ENTITY_DHW_TANK_VOLUME, 
                 SENSOR_DHW_TEMPERATURE
             ])
-            
-        for entity_id in tracked_entities:
-            if entity_id:
-                self.async_on_remove(
-                    async_track_state_change_event(self.hass, entity_id, self._update_manual_trigger)
-                )
+        return tracked_entities
+
+    def _learned_index(self) -> float:
+        """Indeks strefy z modelu RLS koordynatora; strefa spoza modelu - indeks startowy z konfiguracji."""
+        learner = self.coordinator.learner
+        if self._uid_for_slider in learner.zones:
+            return learner.zone_index(self._uid_for_slider)
+        return ZONES_BY_KEY[self._uid_for_slider].prior_index
 
     @property
     def extra_state_attributes(self):
@@ -802,16 +739,16 @@ class StokerForecastSensor(StokerEntity, SensorEntity):
                     temp_target = float(data.get("frontdata", {}).get("dhwwanted", 50.0)) + 10
                     temp_actual = float(data.get("dhwdata", {}).get("8", 40.0))
                     
-                    delta_temp_dhw = max(0, temp_target - temp_actual)
-                    
                     # Obliczenie energii: (V * deltaT * ciepło_właściwe) / (wartość_opałowa * sprawność)
-                    # 1.163 to Wh/kgK (zmienione na kWh w stałej)
-                    energy_kwh = volume * delta_temp_dhw * SPECIFIC_HEAT_WATER_KWH
-                    result_kg = energy_kwh / (PELLET_CALORIFIC_KWH * BOILER_EFFICIENCY_DHW)
+                    result_kg = dhw_reheat_kg(
+                        volume, temp_actual, temp_target,
+                        SPECIFIC_HEAT_WATER_KWH, PELLET_CALORIFIC_KWH, BOILER_EFFICIENCY_DHW,
+                    )
 
             # 3. Model Budynków (Grzejniki/Podłogówka)
             else:
-                eff_val = 0.6  # Fallback
+                # Wyuczony indeks strefy (przed pierwszymi próbkami RLS - jej prior)
+                eff_val = self._learned_index()
 
                 if self._force_slider:
                     # Tryb SYMULACJI (zawsze suwak)
@@ -838,8 +775,7 @@ class StokerForecastSensor(StokerEntity, SensorEntity):
                 t_state = self.hass.states.get(self._target_temp_sid)
                 t_dest = float(t_state.state) if t_state and t_state.state not in ["unknown", "unavailable"] else 22.0
                 
-                delta_t_bldg = max(0, t_dest - temp_ext)
-                result_kg = eff_val * delta_t_bldg
+                result_kg = static_demand_kg(eff_val, t_dest, temp_ext)
 
             # 4. Przeliczenie na finalną jednostkę
             final_val = result_kg if self._return_kg else (result_kg * price_per_kg)
@@ -864,10 +800,12 @@ class StokerForecastSensor(StokerEntity, SensorEntity):
 class StokerCostTotalSensor(StokerEntity, SensorEntity, RestoreEntity):
     """
     Sensor akumulujący całkowity koszt (long-term statistics).
-    Nalicza opłaty na podstawie przyrostu (delty) kilogramów i aktualnej ceny.
+    Nalicza opłaty na podstawie przyrostu kilogramów z delty cyklu koordynatora i aktualnej ceny.
     """
 
-    def __init__(self, coordinator, username, name, uid, consumption_sid):
+    _persist_state = True
+
+    def __init__(self, coordinator, username, name, uid):
         super().__init__(coordinator, username)
         self._username = username
         self.entity_id = f"sensor.nbe_{uid}_cost_total"
@@ -878,15 +816,23 @@ class StokerCostTotalSensor(StokerEntity, SensorEntity, RestoreEntity):
         self._attr_state_class = SensorStateClass.TOTAL
         self._attr_icon = "mdi:cash-register"
         
-        self._consumption_sid = consumption_sid
+        # Suma narastająca zużycia z synchronizacji historii (total/dhw/klucz strefy)
+        self._counter = f"sync_{uid}"
         self._attr_native_value = 0.0
-        self._last_known_kg_total = 0.0
+
+    def _dump_state(self) -> dict:
+        return {"value": self._attr_native_value}
+
+    def _load_state(self, data: dict) -> None:
+        self._attr_native_value = float(data["value"])
 
     async def async_added_to_hass(self):
-        """Przywrócenie stanu portfela i synchronizacja licznika przy starcie."""
+        """Przywrócenie stanu portfela."""
         await super().async_added_to_hass()
+        if self._state_restored:
+            return
         
-        # 1. Przywróć ostatnią zapisaną kwotę z bazy danych HA
+        # Przywróć ostatnią zapisaną kwotę z bazy danych HA
         last_state = await self.async_get_last_state()
         if last_state is not None and last_state.state not in ["unknown", "unavailable"]:
             try:
@@ -894,60 +840,24 @@ class StokerCostTotalSensor(StokerEntity, SensorEntity, RestoreEntity):
             except ValueError:
                 self._attr_native_value = 0.0
         
-        # 2. Pobierz aktualny stan licznika KG, aby wyznaczyć punkt zero dla przyrostów
-        kg_state = self.hass.states.get(self._consumption_sid)
-        if kg_state and kg_state.state not in ["unknown", "unavailable"]:
-            try:
-                self._last_known_kg_total = float(kg_state.state)
-            except ValueError:
-                self._last_known_kg_total = 0.0
-        
-        _LOGGER.info(
-            "Zainicjalizowano licznik kosztów %s: %s PLN. Punkt startowy: %s kg",
-            self._attr_name, self._attr_native_value, self._last_known_kg_total
-        )
+        _LOGGER.info("Zainicjalizowano licznik kosztów %s: %s PLN", self._attr_name, self._attr_native_value)
 
     def _handle_coordinator_update(self) -> None:
-        """Obliczanie przyrostu kosztu przy każdej aktualizacji koordynatora."""
-        kg_state = self.hass.states.get(self._consumption_sid)
-        p_state = self.hass.states.get(ENTITY_PELLET_PRICE)
-
-        if not kg_state or kg_state.state in ["unknown", "unavailable"]:
+        """Doliczenie kosztu przyrostu kg z bieżącego cyklu koordynatora."""
+        delta = self._tick_delta()
+        kg_delta = delta.increment(self._counter) if delta else 0.0
+        if kg_delta <= 0:
             return
 
-        try:
-            current_kg_total = float(kg_state.state)
-            
-            # Pobranie ceny pelletu z suwaka zdefiniowanego w const.py
-            # Fallback na 1.2 PLN/kg (1200 za tonę)
-            price_per_kg = 1.2
-            if p_state and p_state.state not in ["unknown", "unavailable"]:
-                price_per_kg = float(p_state.state) / 1000
-
-            # Obliczamy deltę (ile przybyło od ostatniego pomiaru)
-            if current_kg_total > self._last_known_kg_total:
-                kg_delta = current_kg_total - self._last_known_kg_total
-                cost_increment = kg_delta * price_per_kg
-                
-                # Dodajemy do istniejącej sumy
-                self._attr_native_value = round((self._attr_native_value or 0.0) + cost_increment, 2)
-                self._last_known_kg_total = current_kg_total
-                
-                _LOGGER.debug(
-                    "Przyrost kosztu %s: +%s PLN (delta %s kg)",
-                    self._attr_name, round(cost_increment, 2), round(kg_delta, 3)
-                )
-            
-            # Obsługa resetu źródłowego licznika KG (np. reset licznika dobowego o północy)
-            elif current_kg_total < self._last_known_kg_total:
-                # Synchronizujemy licznik bez doliczania kosztów (ważne przy sensorach typu 'daily')
-                self._last_known_kg_total = current_kg_total
-
-            # Zapisujemy stan w HA
-            self.async_write_ha_state()
-
-        except ValueError as e:
-            _LOGGER.error("Błąd przetwarzania liczb w sensorze kosztu %s: %s", self.entity_id, e)
+        # Cena pelletu z suwaka zdefiniowanego w const.py (fallback 1200 PLN/t)
+        price_per_kg = self._get_value_safely(ENTITY_PELLET_PRICE, 1200.0) / 1000
+        cost_increment = kg_delta * price_per_kg
+        self._attr_native_value = round((self._attr_native_value or 0.0) + cost_increment, 2)
+        _LOGGER.debug(
+            "Przyrost kosztu %s: +%s PLN (delta %s kg)",
+            self._attr_name, round(cost_increment, 2), round(kg_delta, 3)
+        )
+        self.async_write_ha_state()
 
 
 # --- ACTUAL HEATING COST SENSOR ---
@@ -983,164 +893,93 @@ class StokerHeatingCostActualSensor(StokerEntity, SensorEntity):
             return 0.0
 
 
-# --- HOUSE & OFFICE CONSUMPTION SENSOR ---
-class StokerDividedConsumptionSensor(StokerEntity, SensorEntity, RestoreEntity):
-    """Uniwersalny sensor rozdzielający zużycie między Dom a Biuro."""
-    
-    def __init__(self, coordinator, username, is_house=True):
+# --- SYNCED TOTAL CONSUMPTION SENSORS ---
+class StokerSyncedTotalSensor(StokerEntity, SensorEntity, RestoreEntity):
+    """Licznik kumulatywny zasilany zamkniętymi godzinami z synchronizacji historii.
+
+    Przyrost to delta cyklu koordynatora dla sumy narastającej
+    `history.totals[key]` (licznik `sync_<key>`); migawka koordynatora jest
+    w tym samym checkpoincie co stan encji, więc restart nie gubi zużycia.
+    """
+
+    _persist_state = True
+    _sync_key = "total"
+
+    def __init__(self, coordinator, username):
         super().__init__(coordinator, username)
-        self._username = username
-        self._is_house = is_house
-        
-        suffix = "house" if is_house else "office"
-        self.entity_id = f"sensor.nbe_{suffix}_consumption_total"
-        self._attr_name = "Dom - Konsumpcja całkowita" if is_house else "Biuro - Konsumpcja całkowita"
-        self._attr_unique_id = f"nbe_{username}_{suffix}_consumption_total"
-        self._attr_icon = "mdi:home-lightning-bolt" if is_house else "mdi:office-building-marker"
         self._attr_native_unit_of_measurement = UnitOfMass.KILOGRAMS
-        self._attr_state_class = SensorStateClass.TOTAL_INCREASING
         self._attr_device_class = SensorDeviceClass.WEIGHT
-        
+        self._attr_state_class = SensorStateClass.TOTAL_INCREASING
         self._attr_native_value = 0.0
-        self._last_day_stat = None 
-        self._last_update_time = None
-        self._house_baseline_kgh = 0.0
         self._last_increment = 0.0
 
-    async def async_added_to_hass(self):
-        await super().async_added_to_hass()
-        if (last_state := await self.async_get_last_state()) and last_state.state not in ("unknown", "unavailable"):
-            try:
-                self._attr_native_value = float(last_state.state)
-            except ValueError:
-                self._attr_native_value = 0.0
-        
-        if self.coordinator.data and "stats" in self.coordinator.data:
-            val = self.coordinator.data["stats"].get("day")
-            if val is not None:
-                self._last_day_stat = float(val)
-                self._last_update_time = time.time()
-
-    def _calculate_house_baseline(self, data):
-        eff_state = self.hass.states.get(SENSOR_HOUSE_EFFICIENCY)
-        try:
-            idx = float(eff_state.state) if eff_state and eff_state.state not in ("unknown", "unavailable") else 0.8
-        except: idx = 0.8
+    def _dump_state(self) -> dict:
+        return {"value": self._attr_native_value, "last_increment": self._last_increment}
 
-        t_state = self.hass.states.get(ENTITY_TARGET_HOUSE_TEMP)
-        try:
-            t_target = float(t_state.state) if t_state and t_state.state not in ("unknown", "unavailable") else 22.0
-        except: t_target = 22.0
-        
-        try:
-            temp_ext = float(str(data.get("weatherdata", {}).get("1", 0)).replace(",", "."))
-        except: temp_ext = 0.0
+    def _load_state(self, data: dict) -> None:
+        self._attr_native_value = float(data["value"])
+        self._last_increment = float(data.get("last_increment", 0.0))
 
-        return (idx * max(0.1, t_target - temp_ext)) / 24.0
+    async def async_added_to_hass(self):
+        """Przywracanie stanu licznika."""
+        await super().async_added_to_hass()
+        if not self._state_restored:
+            last_state = await self.async_get_last_state()
+            if last_state is not None and last_state.state not in ["unknown", "unavailable"]:
+                try:
+                    self._attr_native_value = float(last_state.state)
+                except ValueError:
+                    self._attr_native_value = 0.0
+        self.async_write_ha_state()
 
     def _handle_coordinator_update(self) -> None:
-        data = self.coordinator.data
-        if not data or "stats" not in data:
+        delta = self._tick_delta()
+        increment = delta.increment(f"sync_{self._sync_key}") if delta else 0.0
+        if increment <= 0:
             return
+        self._last_increment = increment
+        self._attr_native_value = round((self._attr_native_value or 0.0) + increment, 4)
+        _LOGGER.debug("%s: dodano +%s kg. Nowy stan: %s", self.entity_id, round(increment, 4), self._attr_native_value)
+        self.async_write_ha_state()
 
-        try:
-            current_day_stat = float(data["stats"].get("day", 0.0))
-        except (ValueError, TypeError):
-            return
+    @property
+    def extra_state_attributes(self):
+        return {"last_increment_kg": round(self._last_increment, 4)}
 
-        # 1. OBSŁUGA RESETU O PÓŁNOCY
-        if current_day_stat < self._last_day_stat:                                                                              
-            now_hour = datetime.now().hour                                                                                      
-            if now_hour == 0 or now_hour == 23:                                                                                 
-                _LOGGER.info("Poprawny reset nocny: %s", current_day_stat)                                                      
-                self._last_day_stat = current_day_stat                                                                          
-                self._last_update_time = time.time()                                                                            
-                return                                                                                                          
-            else:                                                                                                               
-                # Ignorujemy spadek do zera w ..rodku dnia (b....d API)                                                         
-                _LOGGER.warning("Zignorowano b....d API (spadek licznika): %s -> %s", self._last_day_stat, current_day_stat)    
-                return                                                                                                          
-                                                                                                                                
-        # 2. Obliczanie delty                                                                                                   
-        total_delta = current_day_stat - self._last_day_stat                                                                    
-                                                                                                                                
-        # Je..li brak przyrostu, aktualizujemy tylko czas i wychodzimy                                                          
-        if total_delta <= 0:                                                                                                    
-            self._last_update_time = time.time()                                                                                
-            return                                                                                                              
-                                                                                                                                
-        if total_delta > 2.0:                                                                                                   
-            _LOGGER.error("Zablokowano nienaturalny skok zu..ycia: %s kg! (B....d danych)", total_delta)                        
-            # Synchronizujemy licznik, by w nast..pnym kroku delta by..a ju.. poprawna                                          
-            self._last_day_stat = current_day_stat                                                                              
-            return                                                                                                              
-
-        now_ts = time.time()
-        time_diff_hours = (now_ts - self._last_update_time) / 3600.0
-        
-        # Zabezpieczenie przed skokami czasu (max 1h)
-        if time_diff_hours > 1.0 or time_diff_hours < 0:
-            time_diff_hours = 0.0 
-
-        # Aktualizacja zmiennych bazowych
-        self._last_day_stat = current_day_stat
-        self._last_update_time = now_ts
-
-        # 3. Oblicz Baseline Domu
-        self._house_baseline_kgh = self._calculate_house_baseline(data)
-        expected_house_kg = self._house_baseline_kgh * time_diff_hours
-
-        # 4. Sprawdzenie statusów urządzeń
-        pump_house = self.hass.states.get(ENTITY_PUMP_HOUSE)
-        pump_office = self.hass.states.get(ENTITY_PUMP_OFFICE)
-        switch_office = self.hass.states.get(ENTITY_SWITCH_OFFICE)
-        boiler = self.hass.states.get(ENTITY_BOILER_STATUS)
-
-        is_house_on = (pump_house and pump_house.state == "on")
-        is_office_active = (is_house_on and pump_office and pump_office.state == "on" and switch_office and switch_office.state == "on")
-        is_cwu = (boiler and boiler.state in ["CWU", "state_7"])
-
-        # 5. LOGIKA PODZIAŁU (Z zachowaniem braku luki)
-        increment = 0.0
-        TOLERANCE = 1.15
-
-        if is_cwu:
-            increment = 0.0
-        elif self._is_house:
-            if not is_house_on:
-                increment = 0.0
-            elif is_office_active:
-                # Dom bierze swoją część z marginesem
-                increment = min(total_delta, expected_house_kg * TOLERANCE)
-            else:
-                # Tylko dom grzeje
-                increment = total_delta
-        else: # Biuro
-            if is_office_active:
-                # Biuro bierze całą resztę (Gwarancja sumy)
-                house_share = min(total_delta, expected_house_kg * TOLERANCE)
-                increment = max(0.0, total_delta - house_share)
-            else:
-                increment = 0.0
 
-        # 6. ZAPIS STANU
-        self._last_increment = increment
-        if increment > 0:
-            current_val = self._attr_native_value if self._attr_native_value is not None else 0.0
-            self._attr_native_value = round(current_val + increment, 4)
-            self.async_write_ha_state()
+# --- ZONE CONSUMPTION SENSOR ---
+class StokerDividedConsumptionSensor(StokerSyncedTotalSensor):
+    """Uniwersalny sensor zużycia strefy grzewczej (podział godzinowy na strefy)."""
+
+    def __init__(self, coordinator, username, zone):
+        super().__init__(coordinator, username)
+        self._username = username
+        self._zone = zone
+        
+        suffix = zone.key
+        self._sync_key = suffix
+        self.entity_id = f"sensor.nbe_{suffix}_consumption_total"
+        self._attr_name = f"{zone.name} - Konsumpcja całkowita"
+        self._attr_unique_id = f"nbe_{username}_{suffix}_consumption_total"
+        self._attr_icon = zone.icon
 
     @property
     def extra_state_attributes(self):
         return {
-            "baseline_kgh": round(self._house_baseline_kgh, 3),
+            "baseline_kgh": round(self._baseline_kgh(), 3),
             "last_increment_kg": round(self._last_increment, 4)
         }
 
+    def _baseline_kgh(self) -> float:
+        data = self.coordinator.data or {}
+        temp_ext = parse_float(data.get("weatherdata", {}).get("1", 0))
+        t_target = self._get_value_safely(self._zone.target_entity, self._zone.default_target)
+        return static_demand_kg(self.coordinator.learner.zone_index(self._zone.key), t_target, temp_ext, 0.1) / 24.0
+
 
 # --- PELLETS LEFT FOR DAYS SENSOR ---
 class StokerRangeSensor(StokerEntity, SensorEntity):
-    """ Sensor zasięgu. """
+    """ Sensor zasięgu - godzinowa symulacja poziomu zasobnika. """
     def __init__(self, coordinator, username):
         super().__init__(coordinator, username)
         self._username = username
@@ -1151,159 +990,107 @@ class StokerRangeSensor(StokerEntity, SensorEntity):
         self._attr_icon = "mdi:calendar-clock"
         self._attr_state_class = SensorStateClass.MEASUREMENT
 
+    def _memo_inputs(self):
+        return forecast_input_entities()
+
+    def _simulation(self) -> dict:
+        """Wynik symulacji wspólny dla stanu i atrybutów (liczony raz na cykl)."""
+        return self._memo("range", self._simulate, self.coordinator.forecast.weather_updated)
+
+    def _simulate(self) -> dict:
+        """Symulacja na RANGE_HORIZON_DAYS: profil prognozy, dalej jego ostatnia doba."""
+        current_pellet_kg = float(self._get_api_data("frontdata.hoppercontent", 0.0))
+        yesterday_burn = float(self._get_api_data("stats.yesterday", 0.0))
+
+        profile_total = None
+        inp = build_forecast_inputs(self)
+        if inp is not None:
+            profile_total = self.coordinator.forecast.profile(inp)["total"]
+
+        # Poza horyzontem prognozy pogody - wyuczony profil tygodniowy, dalej wczorajsze tempo
+        horizon_h = RANGE_HORIZON_DAYS * 24
+        result = range_estimate(
+            current_pellet_kg, profile_total, yesterday_burn / 24.0,
+            self.coordinator.learner.relative_error, horizon_h,
+            self.coordinator.profile.horizon(dt_util.now(), horizon_h),
+        )
+        result["yesterday"] = yesterday_burn
+        return result
+
     @property
     def native_value(self):
         try:
-            data = self.coordinator.data or {}
-            current_pellet_kg = float(self._get_api_data("frontdata.hoppercontent", 0.0))
-            yesterday_burn = float(self._get_api_data("stats.yesterday", 0.0))
-            forecast_rate = self._get_value_safely(SENSOR_FORECAST_TOTAL_WEIGHT, 0.0)
-
-            if yesterday_burn > 0 and forecast_rate > 0:
-                daily_burn_rate = (yesterday_burn * 0.85) + (forecast_rate * 0.15)
-            elif yesterday_burn > 0:
-                daily_burn_rate = yesterday_burn
-            else:
-                daily_burn_rate = forecast_rate
-            if daily_burn_rate < 0.5:
-                return 99.0
-            days_remaining = current_pellet_kg / daily_burn_rate
-            
-            self._calculated_burn_rate = round(daily_burn_rate, 2)
-            self._yesterday_weight = yesterday_burn
-            self._forecast_weight = forecast_rate
-            return round(days_remaining, 1)
+            sim = self._simulation()["sim"]
+            if sim["expected_h"] is None:
+                # Zasobnik wystarcza na cały horyzont symulacji
+                return float(RANGE_HORIZON_DAYS)
+            return round(sim["expected_h"] / 24.0, 1)
 
         except Exception as e:
-            _LOGGER.error("Błąd obliczania zasięgu hybrydowego: %s", e)
+            _RLOG.error("range_simulation", "Błąd symulacji zasięgu: %s", e)
             return None
 
     @property
     def extra_state_attributes(self):
-        """Atrybuty pokazujące wagę składowych modelu."""
-        val = self.native_value
+        """Atrybuty symulacji: daty opróżnienia z pasmem ufności."""
         attrs = {}
-        
-        if hasattr(self, '_calculated_burn_rate'):
-            attrs["avg_daily_burn_calculated"] = f"{self._calculated_burn_rate} kg/24h"
-            attrs["yesterday_actual"] = f"{self._yesterday_weight} kg"
-            attrs["forecast_theoretical"] = f"{self._forecast_weight} kg"
-
-        if val and val != 99.0:
-            finish_date = dt_util.now() + timedelta(days=val)
-            attrs["expected_empty_date"] = finish_date.strftime("%Y-%m-%d %H:%M")
-            if val < 2:
-                attrs["status"] = "Uzupełnić pellet w zasobniku"
-        
+        try:
+            result = self._simulation()
+        except Exception:
+            return attrs
+        sim = result["sim"]
+
+        now = dt_util.now()
+        attrs["avg_daily_burn_calculated"] = f"{round(float(result['burn'][:24].sum()), 2)} kg/24h"
+        attrs["yesterday_actual"] = f"{result['yesterday']} kg"
+        attrs["confidence_band_pct"] = round(self.coordinator.learner.relative_error * 100)
+        attrs["learned_profile_coverage_pct"] = round(self.coordinator.profile.coverage * 100)
+        for key, label in (("expected_h", "expected_empty_date"), ("early_h", "earliest_empty_date"), ("late_h", "latest_empty_date")):
+            hours = sim[key]
+            attrs[label] = (now + timedelta(hours=hours)).strftime("%Y-%m-%d %H:%M") if hours is not None else None
+
+        expected = sim["expected_h"]
+        attrs["beyond_horizon"] = expected is None
+        if expected is not None and expected < 48:
+            attrs["status"] = "Uzupełnić pellet w zasobniku"
         return attrs
 
 # --- DHW TOTAL CONSUMPTION SENSOR ---
-class StokerDHWConsumptionTotalSensor(StokerEntity, SensorEntity, RestoreEntity):
+class StokerDHWConsumptionTotalSensor(StokerSyncedTotalSensor):
     """ Sensor kumulatywny zużycia pelletu na CWU. """
 
+    _sync_key = "dhw"
+
     def __init__(self, coordinator, username):
         super().__init__(coordinator, username)
         self.entity_id = "sensor.nbe_dhw_consumption_total"
         self._attr_unique_id = f"nbe_{username}_dhw_consumption_total"
         self._attr_name = "CWU - Konsumpcja całkowita"
-        
-        self._attr_native_unit_of_measurement = UnitOfMass.KILOGRAMS
-        self._attr_device_class = SensorDeviceClass.WEIGHT
-        self._attr_state_class = SensorStateClass.TOTAL_INCREASING
         self._attr_icon = "mdi:water-boiler"
-        
-        self._attr_native_value = 0.0
-        self._last_dhw_stat = 0.0
-        self._initialized = False
-
-    async def async_added_to_hass(self):
-        """Przywracanie stanu licznika i inicjalizacja punktu odniesienia."""
-        await super().async_added_to_hass()
-        
-        last_state = await self.async_get_last_state()
-        if last_state is not None and last_state.state not in ["unknown", "unavailable"]:
-            try:
-                self._attr_native_value = float(last_state.state)
-            except ValueError:
-                self._attr_native_value = 0.0
-
-        current_stat = self._get_api_data("stats.dhw_day")
-        if current_stat is not None:
-            self._last_dhw_stat = float(current_stat)
-            self._initialized = True
-            _LOGGER.debug("Zainicjalizowano sensor CWU Total. Startowa baza: %s kg", self._last_dhw_stat)
-
-        self.async_write_ha_state()
-    
-    def _handle_coordinator_update(self) -> None:
-        raw_current = self._get_api_data("stats.dhw_day")
-        if raw_current is None:
-            return
-        current_dhw_stat = float(raw_current)
-        
-        if not self._initialized:
-            self._last_dhw_stat = current_dhw_stat
-            self._initialized = True
-            return
-
-        # 1. Wykrycie resetu (północ)
-        if current_dhw_stat < self._last_dhw_stat:
-            now_hour = datetime.now().hour
-            if now_hour == 0 or now_hour == 23:
-                _LOGGER.debug("Poprawny reset nocny CWU: %s", current_dhw_stat)
-                self._last_dhw_stat = current_dhw_stat
-                return
-            else:
-                _LOGGER.warning(
-                    "Zignorowano błąd API CWU (spadek wartości): %s -> %s", 
-                    self._last_dhw_stat, current_dhw_stat
-                )
-                return 
-
-        # 2. Wykrycie "skoku z zera" po północy
-        if self._last_dhw_stat == 0.0 and current_dhw_stat > 0:
-            self._last_dhw_stat = current_dhw_stat
-            return
-        delta_dhw = current_dhw_stat - self._last_dhw_stat
-
-        # 3. Zapis przyrostu z Sanity Check
-        if 0 < delta_dhw < 2.0:
-            current_total = self._attr_native_value or 0.0
-            self._attr_native_value = round(current_total + delta_dhw, 4)
-            # Aktualizujemy bazę dopiero po udanym doliczeniu delty
-            self._last_dhw_stat = current_dhw_stat
-            _LOGGER.debug("CWU Total: dodano +%s kg. Nowy stan: %s", delta_dhw, self._attr_native_value)
-            self.async_write_ha_state()
-            
-        elif delta_dhw >= 2.0:
-             _LOGGER.error("Zablokowano nienaturalny skok CWU: %s kg", delta_dhw)
-             # Synchronizujemy bazę, żeby nie blokować kolejnych odczytów, ale nie dodajemy do licznika
-             self._last_dhw_stat = current_dhw_stat
-             # Nie robimy write_ha_state, bo stan native_value się nie zmienił
 
 
 # --- OUTPUTS SENSOR ---
 class StokerOutputSensor(StokerEntity, SensorEntity):
-    """Sensor monitorujący konkretne wyjścia sterownika (np. % mocy wentylatora)."""
+    """Sensor liczbowy wyjścia sterownika (np. % mocy wentylatora) z indeksu schematu wyjść."""
+
+    # Chwilowy stan wyjścia sprzed przerwy wprowadzałby w błąd
+    _stale_tolerant = False
     
-    def __init__(self, coordinator, username, output_id, name, icon, unit=None):
+    def __init__(self, coordinator, username, spec):
         super().__init__(coordinator, username)
-        # Dynamiczne tworzenie entity_id na podstawie ID wyjścia
-        safe_id = output_id.lower().replace('-', '_')
-        self.entity_id = f"sensor.nbe_output_{safe_id}"
-        self._output_id = output_id
+        self.entity_id = f"sensor.nbe_{spec.slug}"
+        self._spec = spec
+        side = "" if spec.side == "leftoutput" else "right_"
         
-        self._attr_name = name
-        self._attr_unique_id = f"nbe_{username}_out_{output_id}"
-        self._attr_icon = icon
-        self._attr_native_unit_of_measurement = unit
+        self._attr_name = spec.name
+        self._attr_unique_id = f"nbe_{username}_out_{side}{spec.output_id}"
+        self._attr_icon = spec.icon
+        self._attr_native_unit_of_measurement = spec.unit
 
     @property
     def native_value(self):
-        """Pobiera wartość wyjścia i czyści ją ze zbędnych znaków."""
-        raw_val = self.coordinator.data.get("leftoutput", {}).get(self._output_id, {}).get("val", "0")
-        # Usuwamy % i spacje, aby HA mógł to traktować jako liczbę jeśli to możliwe
-        return str(raw_val).replace("%", "").strip()
+        """Wartość wyjścia przez akcesor z indeksu (liczba; tekst dla wyjść nieliczbowych)."""
+        return self._spec.read(self.coordinator.data or {})
 
 # --- SETTINGS SENSORS ---
 class StokerGroupedSettingsSensor(StokerEntity, SensorEntity):
@@ -1382,11 +1169,23 @@ class StokerDiagnosticDump(StokerEntity, SensorEntity):
         for key in keys_to_dump:
             if key in data and data[key] is not None:
                 flat_data[key] = data[key]
-        
+
+        # Rozmiary buforów i czasy cyklu - trend w długim działaniu (wycieki, przestoje pętli)
+        flat_data["footprint"] = self.coordinator.footprint()
         return flat_data
 
 
 # --- SETUP ---
+def zone_sensors(coordinator, username, zone) -> list:
+    """Sensory strefy grzewczej: wydzielone zużycie, koszt, indeks efektywności i prognozy."""
+    return [
+        StokerDividedConsumptionSensor(coordinator, username, zone),
+        StokerCostTotalSensor(coordinator, username, zone.name, zone.key),
+        StokerEfficiencySensor(coordinator, username, zone, use_wind=zone.wind),
+        *(StokerUnifiedForecastSensor(coordinator, username, target=zone.key, forecast_type=tp) for tp in ("weight", "cost")),
+    ]
+
+
 async def async_setup_entry(hass, entry, async_add_entities):
     """Główna konfiguracja sensorów NBE w Home Assistant."""
     coordinator = hass.data[DOMAIN][entry.entry_id]
@@ -1403,34 +1202,32 @@ async def async_setup_entry(hass, entry, async_add_entities):
         StokerDHWConsumptionTotalSensor(coordinator, username),
         StokerDHWEfficiencySensor(coordinator, username),
         
-        # Sensory wydzielonego zużycia (Logika rozdzielania Dom/Biuro)
-        StokerDividedConsumptionSensor(coordinator, username, is_house=True),
-        StokerDividedConsumptionSensor(coordinator, username, is_house=False),
     ])
 
-    # --- KONFIGURACJA WYJŚĆ (Outputs) ---
-    for out_id, out_name, out_icon, out_unit in STOKER_OUTPUTS_CONFIG:
-        entities.append(StokerOutputSensor(coordinator, username, out_id, out_name, out_icon, out_unit))
-
-    # --- KONFIGURACJA GRUPOWYCH USTAWIEŃ (Menus) ---
-    for name, menu_key, icon in STOKER_SETTINGS_MENU_CONFIG:
-        entities.append(StokerGroupedSettingsSensor(coordinator, username, name, menu_key, icon))
-
     # Dodanie pierwszej fali sensorów
     async_add_entities(entities)
 
+    # --- WYJŚCIA, MENU I STREFY WYKRYTE W DANYCH (dodawane także później) ---
+    async_add_outputs(entry, coordinator, async_add_entities, False, lambda spec: StokerOutputSensor(coordinator, username, spec))
+    async_add_when_present(entry, coordinator, async_add_entities, [
+        *(
+            (lambda data, key=cfg[1]: has_menu(data, key), lambda cfg=cfg: [StokerGroupedSettingsSensor(coordinator, username, *cfg)])
+            for cfg in STOKER_SETTINGS_MENU_CONFIG
+        ),
+        *(
+            (lambda data, z=zone: z in coordinator.zones, lambda z=zone: zone_sensors(coordinator, username, z))
+            for zone in ALL_ZONES
+        ),
+    ])
+
     # --- FAZA 2: SENSORY OBLICZENIOWE (Koszty, Prognozy, Zasięg) ---
     try:
         computed_entities = [
             # 1. Koszty rzeczywiste (PLN) bazujące na Twoich sensorach "Total"
-            StokerCostTotalSensor(coordinator, username, "Dom", "house", "sensor.nbe_house_consumption_total"),
-            StokerCostTotalSensor(coordinator, username, "Biuro", "office", "sensor.nbe_office_consumption_total"),
-            StokerCostTotalSensor(coordinator, username, "CWU", "dhw", "sensor.nbe_dhw_consumption_total"),
+            StokerCostTotalSensor(coordinator, username, "CWU", "dhw"),
             StokerHeatingCostActualSensor(coordinator, username),
 
             # 2. Indeksy efektywności i odchylenia
-            StokerEfficiencySensor(coordinator, username, "Dom", "house", "sensor.nbe_consumption_statistics", "number.nbe_house_targer_temp", "month", use_wind=True),
-            StokerEfficiencySensor(coordinator, username, "Biuro", "office", "sensor.nbe_consumption_statistics", "number.nbe_office_target_temp", "month", use_wind=True),
             StokerEfficiencyDeviationSensor(coordinator, username),
 
             # 3. Symulatory (PLN)
@@ -1439,10 +1236,13 @@ async def async_setup_entry(hass, entry, async_add_entities):
 
             # 4. Zasięg zasobnika
             StokerRangeSensor(coordinator, username),
+
+            # 5. Prognoza godzinowa z encji weather
+            StokerHourlyForecastSensor(coordinator, username),
         ]
         
         # 5. Dynamiczne generowanie ujednoliconych prognoz (Waga i Koszt)
-        targets = ["total", "house", "office", "dhw"]                                                                                                                   
+        targets = ["total", "dhw"]                                                                                                                   
         types = ["weight", "cost"]                                                                                                                                      
                                                                                                                                                                         
         for t in targets:                                                                                                                                               
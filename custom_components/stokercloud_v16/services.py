@@ -0,0 +1,193 @@
+"""Usługi integracji NBE StokerCloud (odpowiedzi bez tworzenia encji)."""
+from __future__ import annotations
+import logging
+from datetime import timedelta
+
+import numpy as np
+import voluptuous as vol
+
+import homeassistant.helpers.config_validation as cv
+from homeassistant.core import HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.util import dt as dt_util
+
+from .const import (
+    DOMAIN,
+    ENTITY_PELLET_PRICE,
+    EXPORT_DEFAULT_DAYS,
+    SIMULATE_MAX_AXIS,
+    SIMULATE_MAX_CELLS,
+)
+from .events import ACTIVE, ALARM, CODE, COUNT, FIRST_SEEN, INFO, KIND, LAST_SEEN, STATE
+from .export import FORMAT_EXTENSIONS, async_export
+from .forecast import grid_axes, simulate_grid
+from .zones import ZONES_BY_KEY
+
+_LOGGER = logging.getLogger(__name__)
+
+SERVICE_SIMULATE = "simulate"
+SERVICE_EXPORT = "export"
+SERVICE_EVENTS = "events"
+
+# Wartość pojedyncza, lista wartości albo zakres {min, max, step}
+RANGE_SCHEMA = vol.Any(
+    vol.Coerce(float),
+    [vol.Coerce(float)],
+    vol.Schema({
+        vol.Required("min"): vol.Coerce(float),
+        vol.Required("max"): vol.Coerce(float),
+        vol.Optional("step", default=1.0): vol.All(vol.Coerce(float), vol.Range(min=0.001)),
+    }),
+)
+
+SIMULATE_SCHEMA = vol.Schema({
+    vol.Optional("entry_id"): str,
+    vol.Optional("zone", default="house"): vol.In(list(ZONES_BY_KEY)),
+    vol.Optional("target_temp"): RANGE_SCHEMA,
+    vol.Optional("outdoor_temp"): RANGE_SCHEMA,
+    vol.Optional("insulation_factor"): RANGE_SCHEMA,
+    vol.Optional("pellet_price"): RANGE_SCHEMA,
+})
+
+
+EXPORT_SCHEMA = vol.Schema({
+    vol.Optional("entry_id"): str,
+    vol.Optional("dataset", default="consumption"): vol.In(["consumption", "telemetry"]),
+    vol.Optional("start"): cv.datetime,
+    vol.Optional("end"): cv.datetime,
+    vol.Optional("format", default="parquet"): vol.In(list(FORMAT_EXTENSIONS)),
+    vol.Optional("filename"): cv.matches_regex(r"^[A-Za-z0-9_.-]+$"),
+})
+
+EVENTS_SCHEMA = vol.Schema({
+    vol.Optional("entry_id"): str,
+    vol.Optional("kind"): vol.In([INFO, ALARM, STATE]),
+    vol.Optional("active_only", default=False): cv.boolean,
+    vol.Optional("since"): cv.datetime,
+    vol.Optional("limit", default=50): vol.All(vol.Coerce(int), vol.Range(min=1, max=500)),
+})
+
+
+def _get_entry(hass: HomeAssistant, entry_id: str | None):
+    """(entry_id, koordynator) wskazanego wpisu albo pierwszego skonfigurowanego."""
+    coordinators = hass.data.get(DOMAIN, {})
+    if entry_id:
+        if entry_id not in coordinators:
+            raise HomeAssistantError(f"Nieznany wpis konfiguracji: {entry_id}")
+        return entry_id, coordinators[entry_id]
+    if not coordinators:
+        raise HomeAssistantError("Brak skonfigurowanego kotła NBE")
+    return next(iter(coordinators.items()))
+
+
+def _get_coordinator(hass: HomeAssistant, entry_id: str | None):
+    return _get_entry(hass, entry_id)[1]
+
+
+def _state_float(hass: HomeAssistant, entity_id: str, default: float) -> float:
+    state = hass.states.get(entity_id)
+    try:
+        return float(state.state) if state else default
+    except (ValueError, TypeError):
+        return default
+
+
+def async_register_services(hass: HomeAssistant) -> None:
+    """Rejestracja usług domeny (jednokrotnie dla wszystkich wpisów)."""
+    if hass.services.has_service(DOMAIN, SERVICE_SIMULATE):
+        return
+
+    async def _async_simulate(call: ServiceCall) -> ServiceResponse:
+        coordinator = _get_coordinator(hass, call.data.get("entry_id"))
+        zone = ZONES_BY_KEY[call.data["zone"]]
+        learner = coordinator.learner
+
+        weather = (coordinator.data or {}).get("weatherdata", {})
+        try:
+            outdoor_now = float(str(weather.get("1", 0)).replace(",", "."))
+        except (ValueError, TypeError):
+            outdoor_now = 0.0
+
+        target_default = _state_float(hass, zone.target_entity, zone.default_target)
+        insulation_default = learner.zone_index(zone.key)
+
+        defaults = {
+            "target_temp": target_default,
+            "outdoor_temp": outdoor_now,
+            "insulation_factor": round(insulation_default, 3),
+            "pellet_price": _state_float(hass, ENTITY_PELLET_PRICE, 1250.0),
+        }
+        try:
+            axes = grid_axes(call.data, defaults, SIMULATE_MAX_AXIS, SIMULATE_MAX_CELLS)
+        except ValueError as err:
+            raise HomeAssistantError(str(err)) from err
+
+        result = simulate_grid(
+            axes["target_temp"], axes["outdoor_temp"], axes["insulation_factor"], axes["pellet_price"]
+        )
+        return {
+            "zone": zone.key,
+            "axes": {k: v.tolist() for k, v in axes.items()},
+            "kg_axes": ["target_temp", "outdoor_temp", "insulation_factor"],
+            "cost_axes": ["target_temp", "outdoor_temp", "insulation_factor", "pellet_price"],
+            "kg_per_day": np.round(result["kg"], 3).tolist(),
+            "cost_per_day": np.round(result["cost"], 2).tolist(),
+        }
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_SIMULATE, _async_simulate,
+        schema=SIMULATE_SCHEMA, supports_response=SupportsResponse.ONLY,
+    )
+
+    async def _async_export(call: ServiceCall) -> ServiceResponse:
+        entry_id, coordinator = _get_entry(hass, call.data.get("entry_id"))
+        end = dt_util.as_utc(call.data.get("end") or dt_util.now())
+        start = dt_util.as_utc(call.data.get("start") or end - timedelta(days=EXPORT_DEFAULT_DAYS))
+        if start >= end:
+            raise HomeAssistantError("Początek zakresu eksportu musi być przed końcem")
+        dataset = call.data["dataset"]
+        name = call.data.get("filename") or f"{DOMAIN}_{dataset}_{end.strftime('%Y%m%d_%H%M')}"
+        return await async_export(
+            hass, coordinator, entry_id, dataset, start, end, call.data["format"], hass.config.path(name)
+        )
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_EXPORT, _async_export,
+        schema=EXPORT_SCHEMA, supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    async def _async_events(call: ServiceCall) -> ServiceResponse:
+        coordinator = _get_coordinator(hass, call.data.get("entry_id"))
+        since = call.data.get("since")
+        rows = coordinator.events.query(
+            call.data.get("kind"),
+            call.data["active_only"],
+            dt_util.as_utc(since).timestamp() if since else None,
+            call.data["limit"],
+        )
+        return {
+            "events": [
+                {
+                    "kind": row[KIND],
+                    "code": row[CODE],
+                    "message": coordinator.event_message(row[KIND], row[CODE]),
+                    "first_seen": dt_util.utc_from_timestamp(row[FIRST_SEEN]).isoformat(),
+                    "last_seen": dt_util.utc_from_timestamp(row[LAST_SEEN]).isoformat(),
+                    "count": row[COUNT],
+                    "active": row[ACTIVE],
+                }
+                for row in rows
+            ]
+        }
+
+    hass.services.async_register(
+        DOMAIN, SERVICE_EVENTS, _async_events,
+        schema=EVENTS_SCHEMA, supports_response=SupportsResponse.ONLY,
+    )
+
+
+def async_unload_services(hass: HomeAssistant) -> None:
+    """Usunięcie usług po wyładowaniu ostatniego wpisu."""
+    hass.services.async_remove(DOMAIN, SERVICE_SIMULATE)
+    hass.services.async_remove(DOMAIN, SERVICE_EXPORT)
+    hass.services.async_remove(DOMAIN, SERVICE_EVENTS)
@@ -0,0 +1,75 @@
+"""Typowana migawka cyklu koordynatora i widok różnic względem poprzedniej migawki."""
+from __future__ import annotations
+from dataclasses import dataclass, field
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """Wartości jednego cyklu: czas serwera, liczniki kg i stany (pompy, tryby)."""
+
+    ts: float
+    counters: dict[str, float | None]
+    states: dict[str, object]
+
+    def as_dict(self) -> dict:
+        return {"ts": self.ts, "counters": dict(self.counters), "states": dict(self.states)}
+
+    @classmethod
+    def from_dict(cls, data) -> Snapshot | None:
+        if not isinstance(data, dict) or data.get("ts") is None:
+            return None
+        return cls(float(data["ts"]), dict(data.get("counters") or {}), dict(data.get("states") or {}))
+
+
+def counter_increment(old, new, elapsed_s: float | None, max_rate_h: float | None, min_window_s: float) -> float:
+    """Przyrost licznika między migawkami.
+
+    Spadek wartości to zerowanie licznika (doba/miesiąc) - przyrostem jest
+    nowa wartość. Przyrost większy niż max_rate_h w oknie (min. min_window_s)
+    to skok danych (np. chwilowe 0 z API) - migawka staje się nową bazą.
+    """
+    if old is None or new is None:
+        return 0.0
+    step = new - old if new >= old else new
+    if max_rate_h is not None and step > max_rate_h * max(elapsed_s or 0.0, min_window_s) / 3600.0:
+        return 0.0
+    return step
+
+
+@dataclass(frozen=True)
+class TickDelta:
+    """Różnice cyklu: przyrosty liczników, czas między znacznikami serwera i zmiany stanów."""
+
+    generation: int = 0
+    elapsed_s: float | None = None
+    increments: dict[str, float] = field(default_factory=dict)
+    transitions: dict[str, tuple] = field(default_factory=dict)
+
+    def increment(self, key: str) -> float:
+        return self.increments.get(key, 0.0)
+
+    def changed(self, key: str) -> bool:
+        return key in self.transitions
+
+    def turned_on(self, key: str) -> bool:
+        return key in self.transitions and bool(self.transitions[key][1])
+
+    def turned_off(self, key: str) -> bool:
+        return key in self.transitions and not self.transitions[key][1]
+
+
+def diff(prev: Snapshot | None, cur: Snapshot, generation: int, limits: dict, min_window_s: float) -> TickDelta:
+    """Widok różnic `cur` względem `prev`; `limits` - maks. tempo [kg/h] licznika (None = bez limitu)."""
+    if prev is None:
+        return TickDelta(generation)
+    elapsed = cur.ts - prev.ts if cur.ts > prev.ts else None
+    increments = {
+        key: counter_increment(prev.counters.get(key), value, elapsed, limits.get(key), min_window_s)
+        for key, value in cur.counters.items()
+    }
+    transitions = {
+        key: (prev.states.get(key), value)
+        for key, value in cur.states.items()
+        if key in prev.states and prev.states[key] != value
+    }
+    return TickDelta(generation, elapsed, increments, transitions)
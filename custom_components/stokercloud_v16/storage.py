@@ -0,0 +1,96 @@
+"""Trwały stan wewnętrzny (learnery, akumulatory) zapisywany w Store HA."""
+from __future__ import annotations
+import logging
+from typing import Any, Callable
+
+from homeassistant.const import EVENT_HOMEASSISTANT_FINAL_WRITE
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.storage import Store
+
+from .const import STORAGE_KEY, STORAGE_SAVE_DELAY, STORAGE_VERSION
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class StokerStateStore:
+    """Checkpoint stanu wszystkich zarejestrowanych uczestników do jednego pliku.
+
+    Zapis jest dławiony (najwyżej raz na STORAGE_SAVE_DELAY s) oraz wymuszany
+    przy zamknięciu HA i przy wyładowaniu integracji.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        self.hass = hass
+        self._store = Store(hass, STORAGE_VERSION, f"{STORAGE_KEY}.{entry_id}")
+        self._data: dict[str, Any] = {}
+        self._dumpers: dict[str, Callable[[], Any]] = {}
+        self._save_pending = False
+        self._unsub_final_write = None
+
+    async def async_load(self) -> None:
+        """Wczytaj ostatni checkpoint (jednorazowo przy starcie wpisu)."""
+        try:
+            stored = await self._store.async_load()
+        except Exception as err:
+            _LOGGER.warning("Nie udało się wczytać stanu integracji: %s", err)
+            stored = None
+        self._data = stored if isinstance(stored, dict) else {}
+
+    @callback
+    def async_listen_final_write(self) -> None:
+        """Zapis przy zamknięciu HA - dopiero po udanym starcie wpisu.
+
+        Magazyn z nieudanej próby startu (ConfigEntryNotReady) nie ma słuchacza,
+        więc przy zamknięciu nie nadpisze pliku starszym stanem.
+        """
+        if self._unsub_final_write is None:
+            self._unsub_final_write = self.hass.bus.async_listen_once(
+                EVENT_HOMEASSISTANT_FINAL_WRITE, self._async_final_write
+            )
+
+    def get(self, key: str) -> Any:
+        return self._data.get(key)
+
+    @callback
+    def register(self, key: str, dumper: Callable[[], Any]) -> Callable[[], None]:
+        """Zarejestruj źródło stanu; zwraca funkcję wyrejestrowującą."""
+        self._dumpers[key] = dumper
+
+        @callback
+        def _unregister() -> None:
+            # Zachowaj ostatni stan, by zapis przy wyładowaniu go nie zgubił
+            if self._dumpers.pop(key, None) is not None:
+                self._data[key] = dumper()
+
+        return _unregister
+
+    def _data_to_save(self) -> dict[str, Any]:
+        self._save_pending = False
+        for key, dumper in self._dumpers.items():
+            try:
+                self._data[key] = dumper()
+            except Exception as err:
+                _LOGGER.debug("Błąd serializacji stanu %s: %s", key, err)
+        return self._data
+
+    @callback
+    def async_schedule_save(self) -> None:
+        """Zaplanuj zapis, jeśli żaden nie oczekuje (dławienie, nie debounce)."""
+        if self._save_pending:
+            return
+        self._save_pending = True
+        self._store.async_delay_save(self._data_to_save, STORAGE_SAVE_DELAY)
+
+    async def async_save(self) -> None:
+        """Natychmiastowy zapis (wyładowanie integracji)."""
+        await self._store.async_save(self._data_to_save())
+
+    async def _async_final_write(self, _event) -> None:
+        self._unsub_final_write = None
+        await self.async_save()
+
+    async def async_close(self) -> None:
+        if self._unsub_final_write:
+            self._unsub_final_write()
+            self._unsub_final_write = None
+        await self.async_save()
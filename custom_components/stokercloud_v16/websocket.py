@@ -0,0 +1,154 @@
+"""Komenda websocket `stokercloud_v16/subscribe`: zwarte delty telemetrii co cykl koordynatora."""
+from __future__ import annotations
+import voluptuous as vol
+
+from homeassistant.components import websocket_api
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+
+from .const import DOMAIN, SENSOR_MAP
+from .dhw import START, END, KG, TEMP_BEFORE, TEMP_AFTER
+
+WS_SUBSCRIBE = f"{DOMAIN}/subscribe"
+# Znacznik w hass.data - komend websocket nie da się wyrejestrować, więc rejestracja jest jedna
+WS_REGISTERED = f"{DOMAIN}_websocket"
+
+
+def signal_entry_unloaded(entry_id: str) -> str:
+    """Sygnał dispatchera wysyłany przy wyładowaniu wpisu (zamyka jego subskrypcje)."""
+    return f"{DOMAIN}_entry_unloaded_{entry_id}"
+
+
+def _typed(value):
+    """Wartość pola w typie natywnym (liczba, gdy się da)."""
+    if isinstance(value, (int, float, bool)) or value is None:
+        return value
+    try:
+        return float(str(value).replace(",", "."))
+    except (ValueError, TypeError):
+        return str(value)
+
+
+def _field_readers() -> dict[str, tuple[str, ...]]:
+    """Ścieżki pól telemetrii (te same co sensory podstawowe), rozbite raz na subskrypcję."""
+    return {cfg[1]: tuple(cfg[2].split(".")) for cfg in SENSOR_MAP}
+
+
+def _read(data: dict, parts: tuple[str, ...]):
+    for part in parts:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(part)
+    return data
+
+
+class TelemetryStream:
+    """Stan jednej subskrypcji: ostatnio wysłane pola, wersja prognozy i liczba cykli CWU."""
+
+    def __init__(self, coordinator) -> None:
+        self.coordinator = coordinator
+        self._readers = _field_readers()
+        self._fields: dict[str, object] = {}
+        self._forecast_version = None
+        self._dhw_cycles = None
+        self._generation = None
+
+    def message(self) -> dict | None:
+        """Delta względem poprzedniej wiadomości (pierwsza zawiera wszystko).
+
+        None, gdy koordynator powiadomił bez nowych danych (nieudane odświeżenie).
+        """
+        coordinator = self.coordinator
+        if coordinator.generation == self._generation:
+            return None
+        self._generation = coordinator.generation
+        data = coordinator.data or {}
+        fields = {key: _typed(_read(data, parts)) for key, parts in self._readers.items()}
+        changed = {key: value for key, value in fields.items() if self._fields.get(key, ...) != value}
+        self._fields = fields
+
+        delta = coordinator.delta
+        msg = {
+            "generation": coordinator.generation,
+            "ts": coordinator.snapshot.ts if coordinator.snapshot else None,
+            "elapsed_s": delta.elapsed_s,
+            "fields": changed,
+            "increments": {key: round(v, 4) for key, v in delta.increments.items() if v > 0},
+            "transitions": {key: list(pair) for key, pair in delta.transitions.items()},
+        }
+
+        engine = coordinator.forecast
+        if engine.computations != self._forecast_version and engine.result:
+            self._forecast_version = engine.computations
+            hours = engine.weather[0]
+            msg["forecast"] = {
+                "start": hours[0].isoformat() if hours else None,
+                **{
+                    key: [round(float(v), 3) for v in values]
+                    for key, values in engine.result.items()
+                    if getattr(values, "ndim", 0) == 1
+                },
+            }
+
+        cycles = len(coordinator.dhw.cycles)
+        if self._dhw_cycles is not None and cycles != self._dhw_cycles and coordinator.dhw.last_cycle:
+            cycle = coordinator.dhw.last_cycle
+            msg["dhw_cycle"] = {
+                "start": cycle[START], "end": cycle[END], "kg": cycle[KG],
+                "temp_before": cycle[TEMP_BEFORE], "temp_after": cycle[TEMP_AFTER],
+            }
+        self._dhw_cycles = cycles
+        return msg
+
+
+@websocket_api.websocket_command({
+    vol.Required("type"): WS_SUBSCRIBE,
+    vol.Optional("entry_id"): str,
+})
+@callback
+def ws_subscribe(hass: HomeAssistant, connection: websocket_api.ActiveConnection, msg: dict) -> None:
+    """Subskrypcja: wynik, pełna migawka, potem jedna wiadomość na cykl koordynatora.
+
+    Wyładowanie wpisu kończy subskrypcję błędem - klient może zasubskrybować ponownie.
+    """
+    coordinators = hass.data.get(DOMAIN, {})
+    entry_id = msg.get("entry_id")
+    if not entry_id:
+        entry_id = next(iter(coordinators), None)
+    coordinator = coordinators.get(entry_id)
+    if coordinator is None:
+        connection.send_error(msg["id"], websocket_api.ERR_NOT_FOUND, "Brak skonfigurowanego kotła NBE")
+        return
+
+    stream = TelemetryStream(coordinator)
+
+    @callback
+    def _forward() -> None:
+        if (payload := stream.message()) is not None:
+            connection.send_message(websocket_api.event_message(msg["id"], payload))
+
+    @callback
+    def _unsubscribe() -> None:
+        unsub_listener()
+        unsub_unloaded()
+
+    @callback
+    def _entry_unloaded() -> None:
+        if connection.subscriptions.pop(msg["id"], None) is not None:
+            _unsubscribe()
+            connection.send_error(msg["id"], websocket_api.ERR_NOT_FOUND, "Wpis konfiguracji został wyładowany")
+
+    unsub_listener = coordinator.async_add_listener(_forward)
+    unsub_unloaded = async_dispatcher_connect(hass, signal_entry_unloaded(entry_id), _entry_unloaded)
+    connection.subscriptions[msg["id"]] = _unsubscribe
+    connection.send_result(msg["id"])
+    _forward()
+
+
+@callback
+def async_register_websocket(hass: HomeAssistant) -> None:
+    """Rejestracja komend websocket (jednokrotnie dla domeny)."""
+    if hass.data.get(WS_REGISTERED):
+        return
+    hass.data[WS_REGISTERED] = True
+    websocket_api.async_register_command(hass, ws_subscribe)
@@ -0,0 +1,77 @@
+"""Strefy grzewcze sterownika (N stref pogodowych) i stany ich pomp."""
+from __future__ import annotations
+from dataclasses import dataclass
+
+from .const import DHW_PUMP_OUTPUT, HEATING_ZONES
+
+
+@dataclass(frozen=True)
+class HeatingZone:
+    """Opis jednej strefy pogodowej (konfiguracja z HEATING_ZONES)."""
+
+    number: int
+    key: str
+    name: str
+    icon: str
+    output: str | None
+    target_entity: str
+    default_target: float
+    switch_entity: str | None
+    prior_index: float
+    wind: bool              # składnik wiatrowy w modelu RLS (tylko strefy narażone na wiatr)
+
+    @property
+    def menu_key(self) -> str:
+        """Menu ustawień strefy: weather, weather2, ..."""
+        return "weather" if self.number == 1 else f"weather{self.number}"
+
+    @property
+    def schedule_index(self) -> int:
+        return self.number - 1
+
+    @property
+    def time_shift_entity(self) -> str:
+        """Czas stabilizacji strefy z przełącznikiem: number.nbe_<klucz>_time_shift."""
+        return f"number.nbe_{self.key}_time_shift"
+
+
+ALL_ZONES: tuple[HeatingZone, ...] = tuple(
+    HeatingZone(number, *cfg) for number, cfg in sorted(HEATING_ZONES.items())
+)
+ZONES_BY_KEY: dict[str, HeatingZone] = {zone.key: zone for zone in ALL_ZONES}
+
+
+def _zone_active(comp: dict, number: int) -> bool:
+    val = comp.get(f"zone{number}active", comp.get(f"zone{number}-active"))
+    if isinstance(val, dict):
+        val = val.get("val")
+    return str(val if val is not None else "0") == "1"
+
+
+def discover_zones(data: dict | None) -> tuple[HeatingZone, ...]:
+    """Strefy obecne w payloadzie: z wyjściem pompy albo aktywne w weathercomp (zoneNactive).
+
+    Koordynator nie usuwa raz wykrytych stref, więc strefa aktywna choćby raz
+    pozostaje w modelu.
+    """
+    comp = (data or {}).get("weathercomp")
+    comp = comp if isinstance(comp, dict) else {}
+    return tuple(zone for zone in ALL_ZONES if zone.output or _zone_active(comp, zone.number))
+
+
+def pump_states(data: dict | None, zones) -> dict[str, bool]:
+    """Stan pomp stref i CWU z payloadu (leftoutput, w razie braku wyjścia - aktywność strefy)."""
+    data = data or {}
+    outputs = data.get("leftoutput") or {}
+    comp = data.get("weathercomp") or {}
+
+    def output_on(output_id):
+        out = outputs.get(output_id)
+        return isinstance(out, dict) and str(out.get("val")).upper() == "ON"
+
+    states = {
+        zone.key: output_on(zone.output) if zone.output else _zone_active(comp, zone.number)
+        for zone in zones
+    }
+    states["dhw"] = output_on(DHW_PUMP_OUTPUT)
+    return states
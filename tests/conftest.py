@@ -0,0 +1,25 @@
+"""Wspólna konfiguracja testów.
+
+Pakiet integracji rejestrowany jest w `sys.modules` bez wykonania `__init__.py`
+(ten importuje Home Assistant i bibliotekę klienta StokerCloud). Dzięki temu
+moduły niezależne od HA (core, snapshot, intervals, dhw, anomaly, profile,
+forecast, estimator, events) importują się bez HA - to jedyna droga
+samodzielnego importu `core`, opisana w jego docstringu. Testy modułów
+zależnych od HA (koordynator, historia) pomijane są bez
+pytest-homeassistant-custom-component.
+"""
+import sys
+import types
+from pathlib import Path
+
+PACKAGE = "custom_components.stokercloud_v16"
+ROOT = Path(__file__).resolve().parents[1]
+
+if PACKAGE not in sys.modules:
+    for name, path in (
+        ("custom_components", ROOT / "custom_components"),
+        (PACKAGE, ROOT / "custom_components" / "stokercloud_v16"),
+    ):
+        module = types.ModuleType(name)
+        module.__path__ = [str(path)]
+        sys.modules[name] = module
@@ -0,0 +1,50 @@
+"""Koordynator: rozruch stref z przełącznikiem liczony raz na cykl."""
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("pytest_homeassistant_custom_component")
+
+from custom_components.stokercloud_v16.const import ENTITY_OFFICE_TIME_SHIFT, ENTITY_SWITCH_OFFICE  # noqa: E402
+from custom_components.stokercloud_v16.coordinator import StokerCloudV16Coordinator  # noqa: E402
+
+
+def _coordinator(hass):
+    return StokerCloudV16Coordinator(hass, SimpleNamespace(username="User"))
+
+
+async def test_warmup_follows_zone_switch_and_time_shift(hass):
+    coordinator = _coordinator(hass)
+    assert set(coordinator.warmups) == {"office"}
+    hass.states.async_set(ENTITY_SWITCH_OFFICE, "on")
+    hass.states.async_set(ENTITY_OFFICE_TIME_SHIFT, "5")
+
+    coordinator._update_warmups(1000.0, {"house": True, "office": True}, 10.0)
+    assert coordinator.warming_up
+    assert coordinator.warmup_limits["office"] == 5.0
+
+    # Po czasie stabilizacji nauka wraca
+    coordinator._update_warmups(1000.0 + 6 * 60, {"house": True, "office": True}, 10.0)
+    assert not coordinator.warming_up
+
+    # Wyłączony przełącznik kończy rozruch niezależnie od pompy
+    hass.states.async_set(ENTITY_SWITCH_OFFICE, "off")
+    coordinator._update_warmups(2000.0, {"house": True, "office": True}, 10.0)
+    assert not coordinator.warming_up
+    assert coordinator.warmups["office"].start_ts is None
+
+
+async def test_warmup_survives_checkpoint_and_migrates_entity_state(hass):
+    coordinator = _coordinator(hass)
+    coordinator.warmups["office"].start_ts = 123.0
+    dumped = coordinator._dump_warmups()
+
+    store = SimpleNamespace(get=lambda key: None)
+    restored = _coordinator(hass)
+    restored._load_warmups(dumped, store)
+    assert restored.warmups["office"].start_ts == 123.0
+
+    legacy = {"entity:nbe_user_office_efficiency": {"office_start_ts": 50.0, "office_last_pump_on_ts": 60.0}}
+    migrated = _coordinator(hass)
+    migrated._load_warmups(None, SimpleNamespace(get=legacy.get))
+    assert (migrated.warmups["office"].start_ts, migrated.warmups["office"].last_on_ts) == (50.0, 60.0)
@@ -0,0 +1,50 @@
+"""Podział spalania na strefy i zasięg zasobnika."""
+import numpy as np
+import pytest
+
+from custom_components.stokercloud_v16.core import allocate, burn_horizon, range_estimate, split_rate
+
+
+def test_allocate_proportional_to_demand():
+    shares = allocate([2.0, 4.0], [[1.0, 3.0], [2.0, 2.0]])
+    np.testing.assert_allclose(shares, [[0.5, 1.5], [2.0, 2.0]])
+    np.testing.assert_allclose(shares.sum(axis=1), [2.0, 4.0])
+
+
+def test_allocate_empty_hour_uses_fallback_then_first_zone():
+    demand = [[0.0, 0.0], [0.0, 0.0]]
+    fallback = [[0.25, 0.75], [0.0, 0.0]]
+    np.testing.assert_allclose(allocate([4.0, 3.0], demand, fallback), [[1.0, 3.0], [3.0, 0.0]])
+    np.testing.assert_allclose(allocate([3.0], [[0.0, 0.0]]), [[3.0, 0.0]])
+
+
+def test_allocate_without_zones():
+    assert allocate([1.0], np.zeros((1, 0))).shape == (1, 0)
+
+
+def test_split_rate_without_burn_spreads_predictions_over_day():
+    assert split_rate(0.0, {"house": 24.0, "office": 12.0}) == {"house": 1.0, "office": 0.5}
+    assert split_rate(1.5, {"house": 2.0, "office": 1.0}) == pytest.approx({"house": 1.0, "office": 0.5})
+
+
+def test_range_estimate_constant_burn():
+    result = range_estimate(10.0, None, 1.0, 0.2, 48)
+    assert result["burn"].shape == (48,)
+    assert result["sim"] == {"early_h": 9, "expected_h": 10, "late_h": 13}
+
+
+def test_range_estimate_hopper_lasts_whole_horizon():
+    assert range_estimate(100.0, None, 1.0, 0.1, 24)["sim"]["expected_h"] is None
+
+
+def test_burn_horizon_repeats_last_forecast_day_and_uses_learned_profile():
+    profile = np.arange(24, dtype=float)
+    burn = burn_horizon(profile, 50, 9.0)
+    np.testing.assert_allclose(burn[24:48], profile)
+    learned = np.full(50, np.nan)
+    learned[30] = 7.0
+    learned[40] = -1.0
+    burn = burn_horizon(profile, 50, 9.0, learned)
+    assert burn[30] == 7.0
+    assert burn[40] == 0.0
+    assert burn[31] == profile[7]
@@ -0,0 +1,113 @@
+"""Model RLS: uczenie, strefy z wiatrem i migracja checkpointów."""
+import pytest
+
+from custom_components.stokercloud_v16.estimator import (
+    PRIOR_DHW_KG_24H,
+    PRIOR_WIND_RATIO,
+    EfficiencyLearner,
+    RecursiveLeastSquares,
+)
+
+ZONES = [("house", 0.62, True), ("office", 1.2, False)]
+
+
+def _learner():
+    learner = EfficiencyLearner(window_s=300.0)
+    learner.ensure_zones(ZONES)
+    return learner
+
+
+def test_rls_converges_to_exact_model():
+    rls = RecursiveLeastSquares([0.0, 0.0], forgetting=1.0)
+    for i in range(50):
+        x = (1.0 + i % 5, 2.0 - i % 3)
+        rls.update(x, 3.0 * x[0] + 0.5 * x[1])
+    assert rls.theta == pytest.approx([3.0, 0.5], abs=1e-3)
+
+
+def test_rls_insert_keeps_existing_parameters():
+    rls = RecursiveLeastSquares([1.0, 2.0], p0=5.0)
+    rls.insert(1, [9.0])
+    assert rls.theta == [1.0, 9.0, 2.0]
+    assert rls.n == 3
+    assert [row[1] for row in rls.P] == [0.0, 5.0, 0.0]
+
+
+def test_zone_priors_and_wind_mask():
+    learner = _learner()
+    assert learner.rls.theta == pytest.approx([0.62, 0.62 * PRIOR_WIND_RATIO, 1.2, 0.0, PRIOR_DHW_KG_24H])
+    x = learner.regressors({"house": 10.0, "office": 5.0}, {"house": 1.0, "office": 0.5}, 3.0)
+    assert x == (10.0, 30.0, 2.5, 0.0, 0.0)
+    index, wind = learner.zone_coefficients(["house", "office", "zone3"])
+    assert index == pytest.approx([0.62, 1.2, 0.0])
+    assert wind == pytest.approx([0.62 * PRIOR_WIND_RATIO, 0.0, 0.0])
+
+
+def test_feed_learns_only_in_full_windows_and_ignores_counter_reset():
+    learner = _learner()
+    x = learner.regressors({"house": 10.0, "office": 0.0}, {"house": 1.0}, 0.0)
+    assert not learner.feed(0.0, 100.0, x)
+    assert not learner.feed(100.0, 100.1, x)
+    assert learner.feed(300.0, 100.2, x)
+    assert learner.last_rate_kg_h == pytest.approx(2.4)
+    assert len(learner.samples) == 1
+    assert not learner.feed(600.0, 0.5, x)
+    assert learner.last_counter == 0.5
+
+
+def test_checkpoint_round_trip():
+    learner = _learner()
+    x = learner.regressors({"house": 10.0, "office": 8.0}, {"house": 1.0, "office": 1.0}, 2.0)
+    learner.feed(0.0, 10.0, x)
+    learner.feed(300.0, 10.2, x)
+    restored = EfficiencyLearner()
+    restored.load_dict(learner.as_dict())
+    restored.ensure_zones(ZONES)
+    assert restored.zones == learner.zones
+    assert restored.rls.theta == pytest.approx(learner.rls.theta)
+    assert restored.rls.P == learner.rls.P
+    assert len(restored.samples) == 1
+
+
+def test_legacy_four_parameter_checkpoint_migrates_to_zones():
+    learner = EfficiencyLearner()
+    learner.load_dict({"rls": {"theta": [0.6, 0.03, 1.1, 0.2], "updates": 7}, "last_counter": 4.0})
+    learner.ensure_zones(ZONES)
+    assert learner.zones == ["house", "office"]
+    assert learner.rls.theta == pytest.approx([0.6, 0.03, 1.1, 0.0, 0.2])
+    assert learner.rls.updates == 7
+    assert learner.last_counter == 4.0
+    assert learner.zone_index("office", wind_speed=10.0) == pytest.approx(1.1)
+
+
+def test_new_zone_extends_restored_model():
+    learner = EfficiencyLearner()
+    learner.load_dict({"zones": ["house"], "rls": {"theta": [0.7, 0.02, 0.1]}})
+    assert learner.ensure_zones(ZONES + [("zone3", 0.5, False)])
+    assert learner.zones == ["house", "office", "zone3"]
+    assert learner.rls.theta == pytest.approx([0.7, 0.02, 1.2, 0.0, 0.5, 0.0, 0.1])
+
+
+def test_corrupt_checkpoint_is_ignored():
+    learner = _learner()
+    learner.load_dict({"zones": "house"})
+    learner.load_dict(None)
+    assert learner.zones == ["house", "office"]
+
+
+def test_observed_index_is_the_raw_window_sample():
+    learner = _learner()
+    assert learner.observed_index("house") is None
+    x = learner.regressors({"house": 10.0, "office": 8.0}, {"house": 1.0, "office": 0.0}, 0.0)
+    learner.feed(0.0, 10.0, x)
+    learner.feed(300.0, 10.5, x)
+    ts, observed = learner.observed_index("house")
+    dhw = learner.rls.theta[-1] * x[-1]
+    # 0.5 kg w 5 min = 144 kg/24h przy ΔT 10°C, biuro wyłączone
+    assert ts == 300.0
+    assert observed == pytest.approx((144.0 - dhw) / 10.0)
+
+    # Pompa domu prawie nie pracowała w oknie - próbki brak
+    idle = learner.regressors({"house": 10.0, "office": 8.0}, {"house": 0.05, "office": 1.0}, 0.0)
+    learner.feed(600.0, 10.6, idle)
+    assert learner.observed_index("house") is None
@@ -0,0 +1,44 @@
+"""Siatka what-if usługi simulate: limity rozmiaru i wartości."""
+import numpy as np
+import pytest
+
+from custom_components.stokercloud_v16.forecast import axis_length, grid_axes, simulate_grid
+
+DEFAULTS = {"target_temp": 21.0, "outdoor_temp": 0.0, "insulation_factor": 0.6, "pellet_price": 1250.0}
+
+
+def test_axis_length_includes_end_despite_rounding():
+    assert axis_length({"min": 0.0, "max": 1.0, "step": 0.1}) == 11
+    assert axis_length({"min": 5.0, "max": -5.0, "step": 2.5}) == 5
+    assert axis_length([1.0, 2.0]) == 2
+    assert axis_length(None) == 1
+    assert axis_length(3.0) == 1
+
+
+def test_grid_axes_expands_specs_and_defaults():
+    axes = grid_axes({"target_temp": {"min": 22.0, "max": 20.0, "step": 1.0}}, DEFAULTS, 100, 1000)
+    np.testing.assert_allclose(axes["target_temp"], [20.0, 21.0, 22.0])
+    np.testing.assert_allclose(axes["pellet_price"], [1250.0])
+
+
+def test_oversized_axis_rejected_before_allocation():
+    spec = {"outdoor_temp": {"min": -1e6, "max": 1e6, "step": 0.001}}
+    with pytest.raises(ValueError, match="oś outdoor_temp"):
+        grid_axes(spec, DEFAULTS, 1000, 200_000)
+
+
+def test_cell_cap():
+    spec = {name: list(range(30)) for name in DEFAULTS}
+    with pytest.raises(ValueError, match="810000 > 200000"):
+        grid_axes(spec, DEFAULTS, 1000, 200_000)
+
+
+def test_non_finite_range_rejected():
+    with pytest.raises(ValueError):
+        grid_axes({"target_temp": {"min": 0.0, "max": float("inf"), "step": 1.0}}, DEFAULTS, 1000, 200_000)
+
+
+def test_simulate_grid_values():
+    result = simulate_grid([20.0, 22.0], [25.0, 0.0], [0.5], [1000.0, 2000.0])
+    np.testing.assert_allclose(result["kg"][:, :, 0], [[0.0, 10.0], [0.0, 11.0]])
+    np.testing.assert_allclose(result["cost"][1, 1, 0], [11.0, 22.0])
@@ -0,0 +1,120 @@
+"""Backfill historii: import dopiero po pobraniu wszystkich zakresów, ponowienia w sesji."""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("pytest_homeassistant_custom_component")
+
+from homeassistant.util import dt as dt_util  # noqa: E402
+from pytest_homeassistant_custom_component.common import async_fire_time_changed  # noqa: E402
+
+from custom_components.stokercloud_v16 import history as history_module  # noqa: E402
+from custom_components.stokercloud_v16.history import ConsumptionHistory  # noqa: E402
+
+NOW = datetime(2026, 3, 10, 12, 30, tzinfo=timezone.utc)
+
+
+def _page(starts, value):
+    return [{"data": [[int(s.timestamp() * 1000), value] for s in starts]}, {"data": []}]
+
+
+class FakeClient:
+    """Odpowiedzi get_consumption; zapytania z `failing` zawodzą `failures` razy."""
+
+    username = "user"
+
+    def __init__(self, failing=(), failures=1):
+        self.failing = {query: failures for query in failing}
+        self.calls = []
+
+    async def get_consumption(self, query):
+        self.calls.append(query)
+        if self.failing.get(query):
+            self.failing[query] -= 1
+            raise TimeoutError(query)
+        if query == "months=12":
+            return _page([datetime(2026, m, 1, tzinfo=timezone.utc) for m in (1, 2, 3)], 300.0)
+        if query == "days=62":
+            return _page([datetime(2026, 3, d, tzinfo=timezone.utc) for d in range(1, 11)], 10.0)
+        return _page([datetime(2026, 3, 10, h, tzinfo=timezone.utc) for h in range(12)], 0.5)
+
+
+@pytest.fixture
+def imports(monkeypatch):
+    rows = {}
+
+    def _add(hass, meta, batch):
+        rows.setdefault(meta["statistic_id"], []).extend(batch)
+
+    monkeypatch.setattr(history_module, "async_add_external_statistics", _add)
+    monkeypatch.setattr(history_module, "BACKFILL_REQUEST_DELAY", 0.0)
+    return rows
+
+
+async def _fire_retry(hass, freezer, seconds):
+    freezer.tick(timedelta(seconds=seconds))
+    async_fire_time_changed(hass, dt_util.utcnow())
+    await hass.async_block_till_done()
+    # Ponowienie działa jako zadanie w tle - async_block_till_done na nie nie czeka
+    await asyncio.gather(*hass._background_tasks)
+
+
+def _history(hass, client):
+    coordinator = SimpleNamespace(username="user", state_store=None, client=client)
+    return ConsumptionHistory(hass, coordinator)
+
+
+async def test_backfill_waits_for_every_query_and_retries_in_session(hass, freezer, imports):
+    freezer.move_to(NOW)
+    client = FakeClient(failing=("months=12",))
+    history = _history(hass, client)
+
+    await history.async_backfill()
+    assert not history.done
+    assert imports == {}
+    assert client.calls == ["months=12", "days=62", "hours=72"]
+
+    await _fire_retry(hass, freezer, 301)
+
+    assert history.done
+    # Ponowienie pobiera tylko brakujący zakres
+    assert client.calls[3:] == ["months=12"]
+    total = imports["stokercloud_v16:user_pellet_total"]
+    # Styczeń i luty z miesięcy, 1-9 marca z dni, godziny 10 marca do bieżącej (bez niej)
+    assert [r["start"].day for r in total[:2]] == [1, 1]
+    assert len(total) == 2 + 9 + 12
+    assert total[-1]["sum"] == pytest.approx(600.0 + 90.0 + 6.0)
+
+
+async def test_backfill_retry_backs_off_and_cancels(hass, freezer, imports):
+    freezer.move_to(NOW)
+    history = _history(hass, FakeClient(failing=("hours=72",), failures=5))
+
+    await history.async_backfill()
+    assert history._retry_s == 600
+    await _fire_retry(hass, freezer, 301)
+    assert not history.done
+    assert history._retry_s == 1200
+
+    history.async_cancel()
+    await _fire_retry(hass, freezer, 3600)
+    assert history._retry_s == 1200
+
+
+def test_gap_query_widens_range_after_long_outage(hass):
+    history = _history(hass, FakeClient())
+    day = [datetime(2026, 3, 10, h, tzinfo=timezone.utc) for h in range(12)]
+    payload = _page(day, 0.5)
+    assert history.gap_query(payload, NOW) is None
+
+    # Znak wodny tuż przed pierwszą godziną serii - bez dodatkowego zapytania
+    history.state["hourly"]["last_start"] = datetime(2026, 3, 9, 23, tzinfo=timezone.utc).isoformat()
+    assert history.gap_query(payload, NOW) is None
+
+    history.state["hourly"]["last_start"] = datetime(2026, 3, 8, 12, tzinfo=timezone.utc).isoformat()
+    assert history.gap_query(payload, NOW) == "hours=50"
+
+    history.state["hourly"]["last_start"] = datetime(2025, 1, 1, tzinfo=timezone.utc).isoformat()
+    assert history.gap_query(payload, NOW) == "hours=744"
@@ -0,0 +1,58 @@
+"""Profil tygodniowy kg/h: uczenie komórek, przedziały temperatury i zapis."""
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from custom_components.stokercloud_v16.profile import WeekHourProfile
+
+MONDAY = datetime(2026, 10, 19, 6, 0)
+
+
+def test_cell_known_after_min_weight():
+    profile = WeekHourProfile((-5.0, 5.0), half_life=6.0, min_weight=2.0)
+    profile.update(MONDAY, 2.0, temp=0.0)
+    assert np.isnan(profile.lookup([0], [6])[0])
+    profile.update(MONDAY + timedelta(days=7), 4.0, temp=0.0)
+    # Waga 1 * zanik + 1 < 2 - nadal nieznana
+    assert np.isnan(profile.lookup([0], [6])[0])
+    profile.update(MONDAY + timedelta(days=14), 4.0, temp=0.0)
+    assert 2.0 < profile.lookup([0], [6])[0] < 4.0
+    assert profile.coverage == pytest.approx(1 / 168)
+
+
+def test_temperature_layer_falls_back_to_common_layer():
+    profile = WeekHourProfile((-5.0, 5.0), min_weight=1.0)
+    profile.update(MONDAY, 3.0, temp=-10.0)
+    profile.update(MONDAY + timedelta(days=7), 1.0, temp=10.0)
+    cold, warm, mild = profile.lookup([0, 0, 0], [6, 6, 6], [-8.0, 12.0, 0.0])
+    assert (cold, warm) == (3.0, 1.0)
+    assert 1.0 < mild < 3.0
+
+
+def test_horizon_wraps_over_week_and_day_shape_needs_full_day():
+    profile = WeekHourProfile(min_weight=1.0)
+    sunday_23 = datetime(2026, 10, 25, 23, 30)
+    profile.update(sunday_23, 1.5)
+    profile.update(MONDAY.replace(hour=0), 0.5)
+    np.testing.assert_allclose(profile.horizon(sunday_23, 2), [1.5, 0.5])
+    assert profile.day_shape(0) is None
+    for hour in range(24):
+        profile.update(MONDAY.replace(hour=hour), 1.0 + (hour == 12))
+    shape = profile.day_shape(0)
+    assert shape.mean() == pytest.approx(1.0)
+    assert shape[12] == pytest.approx(2 * shape[5])
+
+
+def test_round_trip_and_bin_change_resets():
+    profile = WeekHourProfile((0.0,), min_weight=1.0)
+    profile.update(MONDAY, 2.5, temp=3.0)
+    restored = WeekHourProfile((0.0,), min_weight=1.0)
+    restored.load_dict(profile.as_dict())
+    np.testing.assert_allclose(restored.mean, profile.mean)
+    assert restored.updates == 1
+    other = WeekHourProfile((-5.0, 5.0))
+    other.load_dict(profile.as_dict())
+    assert other.updates == 0
+    restored.load_dict({"bins": [0.0], "mean": "???", "weight": ""})
+    assert restored.updates == 1
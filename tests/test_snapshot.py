@@ -0,0 +1,57 @@
+"""Przyrosty liczników między migawkami: zerowania i skoki danych."""
+import pytest
+
+from custom_components.stokercloud_v16.snapshot import Snapshot, TickDelta, counter_increment, diff
+
+LIMITS = {"pellet_total": 20.0}
+
+
+def _snap(ts, kg, pump=False):
+    return Snapshot(ts, {"pellet_total": kg}, {"house": pump})
+
+
+def test_first_snapshot_has_no_increments():
+    delta = diff(None, _snap(0.0, 5.0), 1, LIMITS, 60.0)
+    assert delta == TickDelta(1)
+    assert delta.increment("pellet_total") == 0.0
+
+
+def test_regular_increment_and_transition():
+    delta = diff(_snap(0.0, 5.0), _snap(300.0, 5.5, True), 2, LIMITS, 60.0)
+    assert delta.generation == 2
+    assert delta.elapsed_s == 300.0
+    assert delta.increment("pellet_total") == 0.5
+    assert delta.turned_on("house") and not delta.turned_off("house")
+
+
+def test_counter_reset_counts_new_value():
+    delta = diff(_snap(0.0, 12.0), _snap(300.0, 0.3), 2, LIMITS, 60.0)
+    assert delta.increment("pellet_total") == 0.3
+
+
+def test_jump_above_rate_limit_is_rejected():
+    # 20 kg/h przez 5 min to najwyżej 1.67 kg
+    delta = diff(_snap(0.0, 5.0), _snap(300.0, 9.0), 2, LIMITS, 60.0)
+    assert delta.increment("pellet_total") == 0.0
+
+
+def test_short_window_uses_minimum_window():
+    assert counter_increment(1.0, 1.3, 1.0, 20.0, 60.0) == pytest.approx(0.3)
+    assert counter_increment(1.0, 1.4, 1.0, 20.0, 60.0) == 0.0
+
+
+def test_missing_values_and_unlimited_counters():
+    assert counter_increment(None, 3.0, 60.0, 20.0, 60.0) == 0.0
+    assert counter_increment(3.0, None, 60.0, 20.0, 60.0) == 0.0
+    assert counter_increment(1.0, 500.0, 60.0, None, 60.0) == 499.0
+
+
+def test_clock_going_back_gives_no_elapsed():
+    delta = diff(_snap(300.0, 5.0), _snap(200.0, 5.0), 2, LIMITS, 60.0)
+    assert delta.elapsed_s is None
+
+
+def test_snapshot_round_trip():
+    snap = _snap(10.0, 1.5, True)
+    assert Snapshot.from_dict(snap.as_dict()) == snap
+    assert Snapshot.from_dict({"counters": {}}) is None
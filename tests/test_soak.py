@@ -0,0 +1,361 @@
+"""Test długiego działania: 30 symulowanych dni prawdziwego koordynatora w Home Assistant.
+
+Syntetyczny kocioł (pompy stref i CWU, licznik pelletu, kody info/stany, serie
+get_consumption) odpowiada jako klient API. Koordynator, StokerStateStore i platformy
+encji (sensor, binary_sensor, number, switch) działają na prawdziwym HA
+z pytest-homeassistant-custom-component; czas przesuwa freezer, więc odświeżenia,
+dławione zapisy i ponowienia backfillu planuje sam HA. Wpis jest dwukrotnie
+przeładowywany. Po nasyceniu buforów (od połowy symulacji) nie mogą rosnąć: pamięć
+(tracemalloc), rozmiar checkpointu, rozmiary struktur koordynatora ani liczby
+słuchaczy koordynatora, szyny zdarzeń, śledzenia stanów encji i zadań.
+
+Poza zakresem: `__init__.async_setup_entry` wymaga biblioteki klienta
+StokerCloud, więc kroki setupu/wyładowania wpisu odtwarza `EntryLifetime`
+(te same wywołania, w tej samej kolejności). Rekorder nie działa - import
+statystyk zbiera atrapa `async_add_external_statistics`. Czasu cyklu test nie
+ocenia (zegar ściany na współdzielonej maszynie jest zawodny); śledzi go
+`footprint` sensora diagnostycznego na żywym systemie.
+
+Test jest wolny (ok. 25 minut dla 30 dni) i uruchamiany na żądanie:
+    STOKER_SOAK=1 python -m pytest -s tests/test_soak.py
+STOKER_SOAK_DAYS skraca symulację (trend oceniany od połowy, min. 20 dni).
+"""
+import asyncio
+import gc
+import json
+import logging
+import math
+import os
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytestmark = [
+    pytest.mark.slow,
+    pytest.mark.skipif(os.environ.get("STOKER_SOAK") != "1", reason="test długiego działania: STOKER_SOAK=1"),
+]
+
+pytest.importorskip("pytest_homeassistant_custom_component")
+
+from homeassistant.helpers import entity_platform  # noqa: E402
+from homeassistant.helpers.dispatcher import async_dispatcher_send  # noqa: E402
+from homeassistant.helpers.event import TRACK_STATE_CHANGE_CALLBACKS  # noqa: E402
+from homeassistant.helpers.storage import Store  # noqa: E402
+from homeassistant.util import dt as dt_util  # noqa: E402
+from pytest_homeassistant_custom_component.common import MockConfigEntry, async_fire_time_changed  # noqa: E402
+
+from custom_components.stokercloud_v16 import binary_sensor, number, sensor, switch  # noqa: E402
+from custom_components.stokercloud_v16 import history as history_module  # noqa: E402
+from custom_components.stokercloud_v16.const import (  # noqa: E402
+    DHW_CYCLE_KEEP,
+    DHW_PUMP_OUTPUT,
+    DOMAIN,
+    EVENT_JOURNAL_KEEP,
+    HOURLY_ACTIVITY_KEEP,
+    SNAPSHOT_COUNTERS,
+    STORAGE_KEY,
+)
+from custom_components.stokercloud_v16.coordinator import StokerCloudV16Coordinator  # noqa: E402
+from custom_components.stokercloud_v16.services import async_register_services, async_unload_services  # noqa: E402
+from custom_components.stokercloud_v16.storage import StokerStateStore  # noqa: E402
+from custom_components.stokercloud_v16.websocket import async_register_websocket, signal_entry_unloaded  # noqa: E402
+
+TICK_S = 60
+DAYS = int(os.environ.get("STOKER_SOAK_DAYS", "30"))
+# Nasycenie buforów w połowie symulacji; przeładowania wpisu w pierwszej jej części
+BASELINE_DAY = DAYS // 2
+RELOAD_DAYS = (DAYS // 6, DAYS // 3)
+START = datetime(2026, 1, 5, tzinfo=timezone.utc)
+PLATFORMS = {"sensor": sensor, "binary_sensor": binary_sensor, "number": number, "switch": switch}
+# Maks. tempo licznika z konfiguracji integracji - kocioł testowy nie może go przekraczać
+MAX_KG_H = SNAPSHOT_COUNTERS["pellet_total"][1]
+HOUR_KEEP = 31 * 24
+
+
+def _ms(moment: datetime) -> int:
+    return int(moment.timestamp() * 1000)
+
+
+class FakeBoiler:
+    """Deterministyczny kocioł: ogrzewanie zależne od temperatury, biuro w dni robocze, CWU co godzinę.
+
+    Częste cykle CWU nasycają bufor dziennika (DHW_CYCLE_KEEP) przed połową symulacji.
+    """
+
+    def __init__(self) -> None:
+        self.total = 1000.0
+        self.last = None
+        self.hours: dict[datetime, list[float]] = {}  # początek godziny -> [kg razem, kg CWU]
+
+    def payload(self, now: datetime) -> dict:
+        hour = now.hour + now.minute / 60.0
+        temp_ext = 2.0 + 6.0 * math.sin((hour - 9.0) / 24.0 * 2 * math.pi)
+        wind = 3.0 + 2.0 * math.sin(now.timestamp() / 7200.0)
+        house = (now.minute // 15) % 2 == 0 or temp_ext < 0
+        office = now.weekday() < 5 and 7 <= now.hour < 16 and now.minute < 40
+        dhw = now.minute < 10
+
+        elapsed_h = (now - self.last).total_seconds() / 3600.0 if self.last else 0.0
+        self.last = now
+        rate = (0.9 * house + 0.6 * office + 1.5 * dhw) * (1.0 + max(0.0, 8.0 - temp_ext) / 20.0)
+        assert rate < MAX_KG_H
+        kg = rate * elapsed_h
+        self.total += kg
+        bucket = self.hours.setdefault(now.replace(minute=0, second=0, microsecond=0), [0.0, 0.0])
+        bucket[0] += kg
+        bucket[1] += kg if dhw else 0.0
+        for old in [h for h in self.hours if h < now - timedelta(hours=HOUR_KEEP)]:
+            del self.hours[old]
+
+        def out(on):
+            return {"val": "ON" if on else "OFF"}
+
+        return {
+            "hopperdata": {"4": round(self.total, 3), "1": 150.0},
+            "frontdata": {"dhw": 45.0 - 10.0 * dhw, "boilertemp": 65.0, "dhwwanted": 50.0},
+            "weatherdata": {"1": round(temp_ext, 1), "2": round(wind, 1)},
+            "weathercomp": {"zone1active": "1", "zone2active": "1" if office else "0"},
+            "leftoutput": {"output-4": out(house), "output-9": out(office), DHW_PUMP_OUTPUT: out(dhw)},
+            "miscdata": {
+                "state": {"value": "lng_state_5" if house or office or dhw else "lng_state_14"},
+                "alarm": {"value": ""},
+            },
+            "infomessages": ["0"] if now.hour % 7 else [str(10 + now.day % 5)],
+            "menus": {},
+        }
+
+    def _buckets(self, starts) -> list:
+        sums = []
+        for start, end in starts:
+            if end - start == timedelta(hours=1):
+                sums.append(self.hours.get(start, [0.0, 0.0]))
+            else:
+                rows = [v for h, v in self.hours.items() if start <= h < end]
+                sums.append([sum(v[0] for v in rows), sum(v[1] for v in rows)])
+        return [
+            {"data": [[_ms(start), round(kg[i], 3)] for (start, _), kg in zip(starts, sums)]}
+            for i in (0, 1)
+        ]
+
+    def consumption(self, query: str, now: datetime) -> list:
+        """Serie get_consumption (najnowszy kubełek pierwszy, jak w API)."""
+        unit, count = query.split("=")
+        count = int(count)
+        hour = now.replace(minute=0, second=0, microsecond=0)
+        if unit == "hours":
+            starts = [(hour - timedelta(hours=i), hour - timedelta(hours=i - 1)) for i in range(count)]
+        elif unit == "days":
+            day = hour.replace(hour=0)
+            starts = [(day - timedelta(days=i), day - timedelta(days=i - 1)) for i in range(min(count, 40))]
+        else:
+            # months/years: jeden kubełek od najstarszej znanej godziny
+            starts = [(min(self.hours, default=hour), hour + timedelta(hours=1))]
+        return self._buckets(starts)
+
+
+class StubClient:
+    """Klient API na kotle testowym (te same metody, których używa koordynator i historia)."""
+
+    username = "Soak"
+
+    def __init__(self, boiler: FakeBoiler) -> None:
+        self.boiler = boiler
+
+    async def fetch_data(self) -> dict:
+        return self.boiler.payload(dt_util.utcnow())
+
+    async def get_consumption(self, query: str) -> list:
+        return self.boiler.consumption(query, dt_util.utcnow())
+
+
+class EntryLifetime:
+    """Setup i wyładowanie wpisu w kolejności `__init__.async_setup_entry` / `async_unload_entry`."""
+
+    def __init__(self, hass, entry, client) -> None:
+        self.hass = hass
+        self.entry = entry
+        self.client = client
+        self.coordinator = None
+        self.platforms = []
+
+    async def async_setup(self) -> None:
+        hass, entry = self.hass, self.entry
+        state_store = StokerStateStore(hass, entry.entry_id)
+        await state_store.async_load()
+        coordinator = self.coordinator = StokerCloudV16Coordinator(hass, self.client, state_store)
+        await coordinator.async_refresh()
+        assert coordinator.last_update_success
+
+        state_store.async_listen_final_write()
+        entry.async_on_unload(coordinator.async_add_listener(state_store.async_schedule_save))
+        entry.async_on_unload(coordinator.async_start_listeners())
+        hass.data.setdefault(DOMAIN, {})[entry.entry_id] = coordinator
+
+        for domain, module in PLATFORMS.items():
+            platform = entity_platform.EntityPlatform(
+                hass=hass, logger=logging.getLogger(module.__name__), domain=domain, platform_name=DOMAIN,
+                platform=module, scan_interval=timedelta(seconds=30), entity_namespace=None,
+            )
+            platform.config_entry = entry
+            await module.async_setup_entry(hass, entry, platform._async_schedule_add_entities)
+            self.platforms.append(platform)
+        await hass.async_block_till_done()
+
+        async_register_services(hass)
+        async_register_websocket(hass)
+        if coordinator.history and not coordinator.history.done:
+            entry.async_on_unload(coordinator.history.async_cancel)
+            entry.async_create_background_task(
+                hass, coordinator.history.async_backfill(), f"{DOMAIN}_backfill_{entry.entry_id}"
+            )
+        await _settle(hass)
+
+    async def async_unload(self) -> None:
+        hass, entry = self.hass, self.entry
+        for platform in self.platforms:
+            await platform.async_reset()
+        self.platforms.clear()
+        await entry._async_process_on_unload(hass)
+        coordinator = hass.data[DOMAIN].pop(entry.entry_id)
+        await coordinator.state_store.async_close()
+        async_dispatcher_send(hass, signal_entry_unloaded(entry.entry_id))
+        if not hass.data[DOMAIN]:
+            async_unload_services(hass)
+        # HA robi to sam dla koordynatora utworzonego w kontekście wpisu
+        await coordinator.async_shutdown()
+        await _settle(hass)
+        assert not coordinator._listeners
+
+
+async def _settle(hass) -> None:
+    await hass.async_block_till_done()
+    # Backfill i ponowienia działają jako zadania w tle - async_block_till_done na nie nie czeka
+    if hass._background_tasks:
+        await asyncio.gather(*hass._background_tasks)
+
+
+def _hass_counts(hass) -> dict:
+    """Liczby słuchaczy i zadań po stronie HA (wycieki subskrypcji i zadań)."""
+    return {
+        "bus_listeners": sum(hass.bus.async_listeners().values()),
+        "state_trackers": sum(map(len, hass.data.get(TRACK_STATE_CHANGE_CALLBACKS, {}).values())),
+        "tasks": len(asyncio.all_tasks()),
+        "states": len(hass.states.async_all()),
+    }
+
+
+async def _flush_delayed_saves(hass, freezer) -> None:
+    """Odroczone zapisy Store (rejestry HA) trzymają słuchacza final_write do czasu zapisu."""
+    freezer.tick(timedelta(seconds=TICK_S))
+    async_fire_time_changed(hass, dt_util.utcnow())
+    await _settle(hass)
+
+
+def _sample(hass, hass_storage, lifetime, day: int) -> dict:
+    coordinator = lifetime.coordinator
+    # Atrapa Store (hass_storage) pamięta argumenty każdego zapisu - to nie pamięć integracji
+    for name in ("_async_load", "_async_write_data", "async_remove"):
+        getattr(Store, name).reset_mock()
+    gc.collect()
+    footprint = coordinator.footprint()
+    stored = hass_storage.get(f"{STORAGE_KEY}.{lifetime.entry.entry_id}", {})
+    return {
+        "day": day,
+        "memory_kib": round(tracemalloc.get_traced_memory()[0] / 1024.0, 1),
+        "checkpoint_bytes": len(json.dumps(stored, default=str)),
+        "coordinator_listeners": footprint["listeners"],
+        "pump_transitions": footprint["pump_transitions"],
+        "learner_samples": footprint["learner_samples"],
+        "dhw_cycles": footprint["dhw_cycles"],
+        "event_codes": footprint["event_codes"],
+        "activity_hours": footprint["activity_hours"],
+        "generation": coordinator.generation,
+        **_hass_counts(hass),
+    }
+
+
+@pytest.fixture
+def recorder_imports(monkeypatch):
+    """Rekorder nie działa w teście - import statystyk tylko liczony."""
+    rows = {"count": 0}
+
+    def _add(hass, meta, batch):
+        rows["count"] += len(batch)
+
+    monkeypatch.setattr(history_module, "async_add_external_statistics", _add)
+    monkeypatch.setattr(history_module, "BACKFILL_REQUEST_DELAY", 0.0)
+    return rows
+
+
+async def test_thirty_days_bounded_growth(hass, hass_storage, freezer, recorder_imports):
+    assert DAYS >= 20
+    freezer.move_to(START)
+    boiler = FakeBoiler()
+    boiler.payload(dt_util.utcnow())
+    client = StubClient(boiler)
+    entry = MockConfigEntry(domain=DOMAIN, data={"username": "soak", "password": "x"}, entry_id="soak")
+    entry.add_to_hass(hass)
+    # Tryb debug pętli (fixture HA) ostrzega przy każdym skoku zegara o cykl i spowalnia symulację
+    hass.loop.set_debug(False)
+    await _flush_delayed_saves(hass, freezer)
+    before_setup = _hass_counts(hass)
+
+    lifetime = EntryLifetime(hass, entry, client)
+    await lifetime.async_setup()
+
+    samples = []
+    ticks_per_day = 86400 // TICK_S
+    gc.collect()
+    tracemalloc.start()
+    try:
+        for day in range(1, DAYS + 1):
+            for _ in range(ticks_per_day):
+                freezer.tick(timedelta(seconds=TICK_S))
+                async_fire_time_changed(hass, dt_util.utcnow())
+                await hass.async_block_till_done()
+            samples.append(_sample(hass, hass_storage, lifetime, day))
+            if day in RELOAD_DAYS:
+                await lifetime.async_unload()
+                lifetime = EntryLifetime(hass, entry, client)
+                await lifetime.async_setup()
+    finally:
+        tracemalloc.stop()
+
+    columns = list(samples[0])
+    print("\n" + "\t".join(columns))
+    for row in samples:
+        print("\t".join(str(row[c]) for c in columns))
+
+    # Koordynator odświeża się co cykl (zegar HA, nie ręczne wywołania)
+    assert samples[-1]["generation"] >= ticks_per_day * (DAYS - RELOAD_DAYS[-1]) * 0.99
+    assert lifetime.coordinator.history.done and recorder_imports["count"] > 0
+    assert samples[-1]["learner_samples"] > 0
+
+    # Słuchacze i encje stałe przez całą symulację - także po przeładowaniach wpisu
+    for key in ("coordinator_listeners", "bus_listeners", "state_trackers", "states"):
+        assert len({s[key] for s in samples}) == 1, (key, [s[key] for s in samples])
+    assert max(s["tasks"] for s in samples) <= min(s["tasks"] for s in samples) + 2
+
+    # Bufory z limitem z konfiguracji integracji - nasycone i nie większe niż limit
+    learner_keep = lifetime.coordinator.learner.samples.maxlen
+    assert all(s["learner_samples"] <= learner_keep for s in samples)
+    assert all(s["event_codes"] <= EVENT_JOURNAL_KEEP for s in samples)
+    assert all(s["activity_hours"] <= HOURLY_ACTIVITY_KEEP for s in samples)
+    assert max(s["dhw_cycles"] for s in samples) == DHW_CYCLE_KEEP
+
+    # Po nasyceniu buforów struktury (dziennik pomp przycinany wg czasu) i checkpoint nie rosną
+    steady = samples[BASELINE_DAY - 1:]
+    assert steady[0]["dhw_cycles"] == DHW_CYCLE_KEEP
+    assert max(s["pump_transitions"] for s in steady) <= max(s["pump_transitions"] for s in samples[:BASELINE_DAY]) * 1.1
+    base, last = steady[0], samples[-1]
+    assert last["checkpoint_bytes"] <= base["checkpoint_bytes"] * 1.05
+    # Pamięć: najwyżej 512 KiB przyrostu przez drugą połowę symulacji (całe HA, nie tylko integracja)
+    assert last["memory_kib"] - base["memory_kib"] < 512, (base["memory_kib"], last["memory_kib"])
+
+    # Wyładowanie zwraca HA do stanu sprzed setupu (poza stanami encji w maszynie stanów)
+    await lifetime.async_unload()
+    await _flush_delayed_saves(hass, freezer)
+    final = _hass_counts(hass)
+    for key in ("bus_listeners", "state_trackers"):
+        assert final[key] == before_setup[key], (key, before_setup, final)
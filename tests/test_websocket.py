@@ -0,0 +1,66 @@
+"""Subskrypcja telemetrii: jednokrotna rejestracja i zamknięcie po wyładowaniu wpisu."""
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("pytest_homeassistant_custom_component")
+
+from homeassistant.components import websocket_api  # noqa: E402
+from homeassistant.helpers.dispatcher import async_dispatcher_send  # noqa: E402
+
+from custom_components.stokercloud_v16.const import DOMAIN  # noqa: E402
+from custom_components.stokercloud_v16.coordinator import StokerCloudV16Coordinator  # noqa: E402
+from custom_components.stokercloud_v16.websocket import (  # noqa: E402
+    WS_SUBSCRIBE,
+    async_register_websocket,
+    signal_entry_unloaded,
+    ws_subscribe,
+)
+
+
+class FakeConnection:
+    """Połączenie websocket zapisujące wysłane wiadomości (bez serwera HTTP)."""
+
+    def __init__(self):
+        self.subscriptions = {}
+        self.sent = []
+
+    def send_result(self, msg_id, result=None):
+        self.sent.append(("result", msg_id))
+
+    def send_message(self, message):
+        self.sent.append(("event", message["id"]))
+
+    def send_error(self, msg_id, code, message):
+        self.sent.append(("error", msg_id, code))
+
+
+def test_websocket_command_registered_once(hass, monkeypatch):
+    calls = []
+    monkeypatch.setattr(websocket_api, "async_register_command", lambda hass, handler: calls.append(handler))
+    async_register_websocket(hass)
+    async_register_websocket(hass)
+    assert calls == [ws_subscribe]
+
+
+async def test_subscription_ends_with_error_when_entry_unloads(hass):
+    coordinator = StokerCloudV16Coordinator(hass, SimpleNamespace(username="user"))
+    hass.data[DOMAIN] = {"entry": coordinator}
+    connection = FakeConnection()
+
+    ws_subscribe(hass, connection, {"id": 1, "type": WS_SUBSCRIBE})
+    assert connection.sent == [("result", 1), ("event", 1)]
+    assert len(coordinator._listeners) == 1
+
+    async_dispatcher_send(hass, signal_entry_unloaded("entry"))
+    assert connection.sent[-1] == ("error", 1, websocket_api.ERR_NOT_FOUND)
+    assert connection.subscriptions == {}
+    assert not coordinator._listeners
+
+    # Klient sam zamknął subskrypcję - późniejsze wyładowanie nic nie wysyła
+    ws_subscribe(hass, connection, {"id": 2, "type": WS_SUBSCRIBE})
+    connection.subscriptions.pop(2)()
+    sent = len(connection.sent)
+    async_dispatcher_send(hass, signal_entry_unloaded("entry"))
+    assert len(connection.sent) == sent
+    assert not coordinator._listeners